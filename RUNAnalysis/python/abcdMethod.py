@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+
+'''
+File: abcdMethod.py
+Description: Background estimation with the ABCD method. For two cuts x < cutX and y < cutY,
+	     A passes both, B only the first, C only the second and D none, and the background
+	     in A is predicted as B*C/D. The prediction is done per bin on arrays ( or TH1 through
+	     histoArrays ), and for many cut values at once from the cumulative sums of the 2D
+	     distribution of x and y ( the *_Bkg TH2F of RUNMiniBoostedAnalyzer ).
+'''
+
+import numpy as np
+from histoArrays import toArrays, fromArrays, rebinArray
+
+def projectArrays( B, C, D, sumw2B=None, sumw2C=None, sumw2D=None, errors='sumw2' ):
+	"""Prediction B*C/D and its sumw2 per bin.
+	errors='sumw2': propagation of the sumw2 of B, C and D, the same as TH1::Multiply followed by TH1::Divide.
+	errors='poisson': relative error sqrt( 1/B + 1/C + 1/D ) from the contents.
+	Bins with D = 0 are 0 with no error, in poisson mode also the bins with an empty ( or negative ) region"""
+
+	B, C, D = [ np.asarray( x, dtype=np.float64 ) for x in [ B, C, D ] ]
+	valid = ( D != 0 )
+	safeD = np.where( valid, D, 1. )
+	prediction = np.where( valid, B * C / safeD, 0. )
+	if errors == 'poisson':
+		valid &= ( B > 0 ) & ( C > 0 ) & ( D > 0 )
+		relative2 = 1. / np.where( valid, B, 1. ) + 1. / np.where( valid, C, 1. ) + 1. / np.where( valid, D, 1. )
+		return prediction, np.where( valid, prediction**2 * relative2, 0. )
+	sumw2B, sumw2C, sumw2D = [ ( np.abs( x ) if s is None else np.asarray( s, dtype=np.float64 ) ) for x, s in [ ( B, sumw2B ), ( C, sumw2C ), ( D, sumw2D ) ] ]
+	sumw2 = ( sumw2B * C**2 + sumw2C * B**2 ) / safeD**2 + sumw2D * ( B * C )**2 / safeD**4
+	return prediction, np.where( valid, sumw2, 0. )
+
+def projectHistos( hB, hC, hD, hProj, rebin=1, errors='sumw2', hBC=None ):
+	"""Fill the 1D histogram hProj with B*C/D of hB, hC and hD rebinned by rebin first ( hProj must have the rebinned binning ).
+	hBC gets the product B*C if given. Returns hProj"""
+
+	arrays = [ toArrays( h ) for h in [ hB, hC, hD ] ]
+	( B, sumw2B ), ( C, sumw2C ), ( D, sumw2D ) = [ ( rebinArray( x, rebin ), rebinArray( s, rebin ) ) for x, s in arrays ]
+	if hBC is not None: fromArrays( hBC, B * C, sumw2B * C**2 + sumw2C * B**2 )
+	return fromArrays( hProj, *projectArrays( B, C, D, sumw2B, sumw2C, sumw2D, errors ) )
+
+def regionYields( contents, nx, ny ):
+	"""Yields of A, B, C and D for every pair of boundaries from the 2D cumulative sum of a TH2 ( global bin order, with under/overflow ).
+	Boundary i of x keeps the bins 0 to i ( x < upper edge of bin i ), the same for j of y. Arrays of shape ( ny-1, nx-1 ) for i = 1..nx-1, j = 1..ny-1"""
+
+	cumulative = np.cumsum( np.cumsum( np.reshape( contents, ( ny+2, nx+2 ) ), axis=0 ), axis=1 )
+	total = cumulative[ -1, -1 ]
+	A = cumulative[ 1:ny, 1:nx ]
+	passX = cumulative[ -1, 1:nx ][ np.newaxis, : ]
+	passY = cumulative[ 1:ny, -1 ][ :, np.newaxis ]
+	B = passX - A
+	C = passY - A
+	D = total - A - B - C
+	return A, B, C, D
+
+def scanBoundaries( histo2D, errors='sumw2' ):
+	"""ABCD closure for all the cut values of a TH2 of x ( first cut ) and y ( second cut ).
+	Returns cutsX, cutsY ( inner bin edges ), and arrays of shape ( len(cutsY), len(cutsX) ): A, its sumw2, the prediction B*C/D and its sumw2"""
+
+	nx = histo2D.GetXaxis().GetNbins()
+	ny = histo2D.GetYaxis().GetNbins()
+	contents, sumw2 = toArrays( histo2D )
+	A, B, C, D = regionYields( contents, nx, ny )
+	sumw2A, sumw2B, sumw2C, sumw2D = regionYields( sumw2, nx, ny )
+	prediction, sumw2Prediction = projectArrays( B, C, D, sumw2B, sumw2C, sumw2D, errors )
+	cutsX = np.array( [ histo2D.GetXaxis().GetBinUpEdge( i ) for i in range( 1, nx ) ] )
+	cutsY = np.array( [ histo2D.GetYaxis().GetBinUpEdge( j ) for j in range( 1, ny ) ] )
+	return cutsX, cutsY, A, sumw2A, prediction, sumw2Prediction
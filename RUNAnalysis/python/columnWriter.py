@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+
+'''
+File: columnWriter.py
+Description: Output trees kept as chunks of numpy columns while the events are processed
+	     and written at once at the end, either as a TTree or as a directory with one .npy
+	     file per branch. loadColumns reads both back as a dict of arrays, the .npy files
+	     memory-mapped so only the parts of the columns that are used are read.
+'''
+
+import sys, os, json
+import numpy as np
+from collections import OrderedDict
+from array import array
+from ROOT import TTree
+from commonFunctions import atomicWrite
+
+class ColumnWriter(object):
+	"""Columns of the selected events, same branches (all of the same type) as the tree they are written to"""
+
+	def __init__( self, branches, dtype=np.float32 ):
+		self.branches = list( branches )
+		self.dtype = np.dtype( dtype )
+		self.chunks = []
+
+	def append( self, columns ):
+		"""Add a chunk of events, columns is a dict of arrays with all the branches"""
+		chunk = [ np.asarray( columns[ name ], dtype=self.dtype ) for name in self.branches ]
+		if len( set( len(c) for c in chunk ) ) > 1: raise ValueError( 'Columns of different length: '+str( [ len(c) for c in chunk ] ) )
+		if len(chunk[0]) > 0: self.chunks.append( chunk )
+
+	def extend( self, other ):
+		"""Add the chunks of another writer with the same branches, keeping their order"""
+		if other.branches != self.branches: raise ValueError( 'Different branches' )
+		self.chunks += other.chunks
+
+	def __len__( self ): return sum( len(chunk[0]) for chunk in self.chunks )
+
+	def columns( self ):
+		"""All the chunks joined, dict of arrays by branch"""
+		result = OrderedDict()
+		for i, name in enumerate( self.branches ): result[ name ] = ( np.concatenate( [ chunk[i] for chunk in self.chunks ] ) if self.chunks else np.zeros( 0, dtype=self.dtype ) )
+		return result
+
+	def toROOT( self, treeName, title=None ):
+		"""Create the TTree in the current directory (root_numpy if available, one Fill per event otherwise)"""
+
+		tmpColumns = self.columns()
+		try:
+			from root_numpy import array2tree
+			tmpArray = np.empty( len(self), dtype=[ ( name, self.dtype ) for name in self.branches ] )
+			for name in self.branches: tmpArray[ name ] = tmpColumns[ name ]
+			tree = array2tree( tmpArray, name=treeName )
+			tree.SetTitle( treeName if title is None else title )
+		except ImportError:
+			tree = TTree( treeName, ( treeName if title is None else title ) )
+			typeCode = { 'f4': ( 'f', 'F' ), 'f8': ( 'd', 'D' ), 'i4': ( 'i', 'I' ) }[ self.dtype.str[1:] ]
+			buffers = [ array( typeCode[0], [ 0 ] ) for name in self.branches ]
+			for name, tmpBuffer in zip( self.branches, buffers ): tree.Branch( name, tmpBuffer, name+'/'+typeCode[1] )
+			rows = np.array( tmpColumns.values() ).T.tolist()
+			for row in rows:
+				for tmpBuffer, value in zip( buffers, row ): tmpBuffer[0] = value
+				tree.Fill()
+		return tree
+
+	def toNPY( self, directory ):
+		"""One .npy file per branch in directory and branches.json with their order. Written with atomicWrite,
+		an interrupted job never leaves half the columns"""
+		def write( tmpDirectory ):
+			for name, column in self.columns().items(): np.save( os.path.join( tmpDirectory, name+'.npy' ), column )
+			with open( os.path.join( tmpDirectory, 'branches.json' ), 'w' ) as indexFile: json.dump( self.branches, indexFile )
+		atomicWrite( directory, write, directory=True )
+
+def loadColumns( fileName, treeName, branches=None ):
+	"""Dict of arrays of a tree written by ColumnWriter, from the directory of .npy files ( read-only memory maps )
+	or from the TTree treeName of a root file"""
+
+	if os.path.isdir( fileName ):
+		if branches is None: 
+			with open( os.path.join( fileName, 'branches.json' ) ) as indexFile: branches = [ str( name ) for name in json.load( indexFile ) ]
+		return OrderedDict( ( name, np.load( os.path.join( fileName, name+'.npy' ), mmap_mode='r' ) ) for name in branches )
+	from ROOT import TFile
+	from commonFunctions import getArrays
+	inputFile = TFile( fileName, 'read' )
+	if not inputFile.IsOpen():
+		print "** can't open file %s" % fileName
+		sys.exit()
+	tree = inputFile.Get( treeName )
+	if tree == None:
+		print "** can't find tree %s" % treeName
+		sys.exit()
+	if branches is None: branches = [ branch.GetName() for branch in tree.GetListOfBranches() ]
+	columns = getArrays( tree, branches )
+	inputFile.Close()
+	return columns
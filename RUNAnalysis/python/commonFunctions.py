@@ -1,11 +1,13 @@
 #!/usr/bin/env python
 
-import sys,os,time, re
+import sys,os,time, re, shutil
 from math import *
 from string import *
 from array import array
 from ROOT import * 
 import numpy as np
+from collections import OrderedDict
+from multiprocessing import Pool
 
 ##### Support functions
 def checkLumi( Run, Lumi, NumEvent):
@@ -23,7 +25,12 @@ def find_nearest(array,value):
 	idx = (np.abs(array-value)).argmin()
 	return idx
 
-def getTree(filename, treename):
+def getTree(filename, treename, branches=None, cacheSize=30000000, learnEntries=100, prefetch=True, perfStats=False):
+	"""Open filename and return (file, tree, entries). With a list of branches (wildcards allowed) all the other ones are disabled.
+	A TTreeCache of cacheSize bytes is set: with branches it holds them from the start, without it learns the used branches in the first learnEntries entries.
+	prefetch only applies to this cache (the previous TFile.AsyncPrefetching is restored), with perfStats a TTreePerfStats counts the reads for printBytesRead."""
+	previousPrefetch = gEnv.GetValue( 'TFile.AsyncPrefetching', 0 )
+	if prefetch: gEnv.SetValue( 'TFile.AsyncPrefetching', 1 )
 	hfile = TFile(filename)
 	if not hfile.IsOpen():
 		print "** can't open file %s" % filename
@@ -32,6 +39,89 @@ def getTree(filename, treename):
 	if tree == None:
 		print "** can't find tree %s" % treename
 		sys.exit()
+	if branches is not None:
+		tree.SetBranchStatus( '*', 0 )
+		for b in branches: 
+			if ( '*' in b ) or tree.GetBranch( b ): tree.SetBranchStatus( b, 1 )
+			else: print "** can't find branch %s in tree %s" % ( b, treename )
+	if cacheSize > 0:
+		tree.SetCacheSize( cacheSize )
+		if branches is None: tree.SetCacheLearnEntries( learnEntries )
+		else:
+			tree.AddBranchToCache( '*', True )
+			tree.StopCacheLearningPhase()
+	gEnv.SetValue( 'TFile.AsyncPrefetching', previousPrefetch )
+	if perfStats: tree.perfStats = TTreePerfStats( 'ioperf', tree )
 	entries = tree.GetEntriesFast()
 	return (hfile, tree, entries)
 
+#### files whose branch sizes were already printed
+printedSizes = set()
+
+def printBytesRead( hfile, tree ):
+	"""Bytes read from hfile so far and, for a tree of getTree with perfStats, the baskets of each branch that were read
+	(TTreePerfStats::PrintBasketInfo). Without it (or with an older ROOT) the compressed size in the file of each active branch,
+	what a full pass reads, is printed once per file."""
+	print '------> Bytes read from '+hfile.GetName()+': '+str( hfile.GetBytesRead() )+' in '+str( hfile.GetReadCalls() )+' calls'
+	perfStats = getattr( tree, 'perfStats', None )
+	if perfStats is not None and hasattr( perfStats, 'PrintBasketInfo' ):
+		perfStats.Finish()
+		perfStats.PrintBasketInfo()
+	elif hfile.GetName() not in printedSizes:
+		printedSizes.add( hfile.GetName() )
+		print '------> Compressed size of the active branches in '+hfile.GetName()+' (read by a full pass):'
+		for branch in tree.GetListOfBranches():
+			if tree.GetBranchStatus( branch.GetName() ): print '\t'+branch.GetName()+': '+str( branch.GetZipBytes( '*' ) )
+
+def getArrays( tree, branches, selection='', start=None, stop=None ):
+	"""Read branches of a tree into a dict of float64 numpy arrays (root_numpy if available, TTree::Draw otherwise)."""
+	arrays = OrderedDict()
+	try:
+		from root_numpy import tree2array
+		tmpArray = tree2array( tree, branches=branches, selection=selection, start=start, stop=stop )
+		for b in branches: arrays[ b ] = ( tmpArray[ b ] if tmpArray[ b ].dtype == object else tmpArray[ b ].astype( np.float64 ) )
+	except ImportError:
+		first = ( 0 if start is None else start )
+		last = ( tree.GetEntries() if stop is None else min( stop, tree.GetEntries() ) )
+		tree.SetEstimate( max( last - first, 0 ) + 1 )
+		for i in range( 0, len(branches), 4 ):
+			tmpBranches = branches[ i:i+4 ]
+			numEntries = tree.Draw( ':'.join( tmpBranches ), selection, 'goff', last - first, first )
+			for j in range( len(tmpBranches) ):
+				buf = getattr( tree, 'GetV'+str(j+1) )()
+				arrays[ tmpBranches[j] ] = ( np.frombuffer( buf, dtype=np.float64, count=numEntries ).copy() if numEntries > 0 else np.zeros( 0 ) )
+	return arrays
+
+def sequentialSum( values ):
+	"""Sum added one value at a time, like += in an event loop (np.sum uses pairwise summation)."""
+	return ( float( np.cumsum( values )[-1] ) if len(values) > 0 else 0. )
+
+def entryRanges( numEntries, chunkSize ):
+	"""Fixed size [start, stop) entry ranges, an empty tree gives one empty range. They do not depend on the number of workers, so the merged result does not either."""
+	return ( [ ( start, min( start + chunkSize, numEntries ) ) for start in xrange( 0, numEntries, chunkSize ) ] or [ ( 0, 0 ) ] )
+
+def atomicWrite( name, write, directory=False ):
+	"""write( tmpName ) writes a temporary file ( or fills a new temporary directory with directory=True ) that is then renamed to name,
+	other processes never read half of it and an interrupted job leaves only the temporary one."""
+	name = name.rstrip( '/' )
+	tmpName = name+'.'+str( os.getpid() )+'.tmp'
+	if os.path.isdir( tmpName ): shutil.rmtree( tmpName )
+	if directory: os.makedirs( tmpName )
+	write( tmpName )
+	if directory and os.path.isdir( name ): shutil.rmtree( name )
+	os.rename( tmpName, name )
+
+def runChunks( function, tasks, workers=1, initializer=None, initargs=(), maxtasksperchild=None ):
+	"""Yield function( task ) for each task in the order of tasks, in a pool of processes if workers > 1.
+	initializer( *initargs ) runs once in each worker. With maxtasksperchild=1 every task gets a new process, also with workers=1 ( e.g. TMVA keeps global state ).
+	The workers are forked when the pool is created, so function can read module globals set before ( e.g. a list of jobs sent by index )."""
+	if workers < 2 and maxtasksperchild is None:
+		for task in tasks: yield function( task )
+		return
+	pool = Pool( max( min( workers, len(tasks) ), 1 ), initializer, initargs, maxtasksperchild )
+	try: 
+		for result in pool.imap( function, tasks ): yield result
+	finally: 
+		pool.close()
+		pool.join()
+
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+
+'''
+File: cutGrid.py
+Description: Scan of all the threshold combinations of a few variables. Signal and background
+	     are filled once in N-dimensional histograms with one bin per threshold step, the
+	     yields passing every combination of cuts are then the cumulative sums along each
+	     axis (forward for var < cut, backward for var > cut).
+'''
+
+import numpy as np
+from collections import OrderedDict
+from histoStore import findBin
+
+#### largest number of cells of the N-dimensional histograms
+maxCells = 20000000
+
+def gridShape( listVars ): return tuple( var[1]+2 for var in listVars )
+
+def gridHistogram( values, weights, listVars ):
+	"""Weighted N-dimensional histogram of the variables [ name, steps, min, max, lowerThan ], with underflow and overflow in each axis"""
+
+	shape = gridShape( listVars )
+	if np.prod( shape, dtype=np.float64 ) > maxCells: raise ValueError( 'Cut grid of '+'x'.join( str(k) for k in shape )+' cells, use fewer variables or steps' )
+	if len(weights) == 0: return np.zeros( shape )
+	index = np.ravel_multi_index( [ findBin( values[ var[0] ], *var[1:4] ) for var in listVars ], shape )
+	return np.bincount( index, weights=weights, minlength=int( np.prod( shape ) ) ).reshape( shape )
+
+def passedYields( histo, listVars ):
+	"""Yield passing the cuts at each grid point: along a var < cut axis, point k keeps the bins 0 to k, along a var > cut axis the bins k to the overflow"""
+
+	passed = histo
+	for axis, var in enumerate( listVars ):
+		if var[4]: passed = np.cumsum( passed, axis=axis )
+		else: passed = np.flip( np.cumsum( np.flip( passed, axis ), axis=axis ), axis )
+	return passed
+
+def thresholds( var ):
+	"""Cut value of each grid point of one axis: upper edge of bin k for var < cut, lower edge for var > cut. The first/last point is no cut"""
+
+	edges = np.linspace( var[2], var[3], var[1]+1 )
+	if var[4]: return np.concatenate( [ edges, [ np.inf ] ] )
+	else: return np.concatenate( [ [ -np.inf ], edges ] )
+
+def significance( S, B, method, sigTotal=1., punziSigma=2. ):
+	"""S/sqrt(B), Punzi ( eff_S / ( a/2 + sqrt(B) ) ) or Asimov ( sqrt( 2( (S+B) ln(1+S/B) - S ) ) ), 0 where there is no background"""
+
+	S = np.asarray( S, dtype=np.float64 )
+	B = np.asarray( B, dtype=np.float64 )
+	positive = B > 0
+	safeB = np.where( positive, B, 1. )
+	if method == 'Punzi': value = ( S / sigTotal ) / ( punziSigma / 2. + np.sqrt( safeB ) )
+	elif method == 'Asimov': value = np.sqrt( np.maximum( 2 * ( ( S + safeB ) * np.log1p( S / safeB ) - S ), 0 ) )
+	else: value = S / np.sqrt( safeB )
+	return np.where( positive, value, 0. )
+
+def bestCuts( sigHisto, bkgHisto, listVars, method='SsqrtB', minBkg=0., numBest=5 ):
+	"""The numBest grid points with the largest significance and at least minBkg background.
+	Returns [ significance, S, B, OrderedDict( var: cut ) ] sorted by significance, ties keep the grid order"""
+
+	S = passedYields( sigHisto, listVars )
+	B = passedYields( bkgHisto, listVars )
+	values = significance( S, B, method, sigTotal=sigHisto.sum() )
+	values = np.where( B > minBkg, values, -np.inf ).ravel()
+	order = np.argsort( -values, kind='mergesort' )[ :numBest ]
+	listThresholds = [ thresholds( var ) for var in listVars ]
+	results = []
+	for index in order:
+		if not np.isfinite( values[ index ] ): break
+		point = np.unravel_index( index, S.shape )
+		results.append( [ values[ index ], S[ point ], B[ point ], OrderedDict( ( var[0], listThresholds[i][ point[i] ] ) for i, var in enumerate( listVars ) ) ] )
+	return results
+
+def formatSelection( name, cuts, listVars ):
+	"""Cuts as an entry of cuts.py. cuts.py only has var < cut, so var > cut and the axes without a cut are written as comments"""
+
+	lowerThan = dict( ( var[0], var[4] ) for var in listVars )
+	listCuts = [ "[ '"+var+"', "+str( round( cuts[ var ], 3 ) )+" ]" for var in cuts if lowerThan[ var ] and np.isfinite( cuts[ var ] ) ]
+	comments = [ var+' > '+str( round( cuts[ var ], 3 ) ) for var in cuts if not lowerThan[ var ] and np.isfinite( cuts[ var ] ) ]
+	return "selection[ '"+name+"' ] = [ \n\t\t"+', '.join( listCuts )+( '  # '+', '.join( comments ) if comments else '' )+"\n\t\t]"
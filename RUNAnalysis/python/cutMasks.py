@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+
+'''
+File: cutMasks.py
+Description: One bit per cut of a cut list from cuts.py. Every event gets an integer
+	     with bit i set when it passes cut i ( var < threshold ), cut flow, n-1 and ABCD
+	     selections are then just masks on these bits.
+'''
+
+import numpy as np
+from collections import OrderedDict
+
+def cutBits( values, listCuts ):
+	"""Bitmask of listCuts. values can be a tree entry (returns an int) or a dict of arrays (returns an array)"""
+
+	if isinstance( values, dict ):
+		bits = np.zeros( len( values[ listCuts[0][0] ] ), dtype=np.int64 )
+		for i, cut in enumerate( listCuts ): bits |= ( values[ cut[0] ] < cut[1] ).astype( np.int64 ) << i
+	else:
+		bits = 0
+		for i, cut in enumerate( listCuts ):
+			if getattr( values, cut[0] ) < cut[1]: bits |= 1 << i
+	return bits
+
+def passMask( bits, mask ):
+	"""True if all the cuts in mask are passed, works for an int or an array of bits"""
+	return ( bits & mask ) == mask
+
+def cutFlowMasks( listCuts ):
+	"""Cumulative masks: cut i and all the cuts before it"""
+	return [ ( 1 << ( i+1 ) ) - 1 for i in range( len(listCuts) ) ]
+
+def nMinusOneMasks( listCuts ):
+	"""All the cuts except the one of the variable, the same cut on the other jet (jet1X/jet2X) is also removed"""
+
+	allBits = ( 1 << len(listCuts) ) - 1
+	masks = OrderedDict()
+	for var in listCuts:
+		partners = [ var[0], var[0].replace( 'jet1', 'jet2' ), var[0].replace( 'jet2', 'jet1' ) ]
+		groupBits = sum( [ 1 << i for i, cut in enumerate( listCuts ) if cut[0] in partners ] )
+		masks[ var[0] ] = allBits & ~groupBits
+	return masks
+
+def cutPairs( listCuts ):
+	"""Indices of all the pairs of cuts, for the 2D plots"""
+	return [ [ j,k] for j in range(len(listCuts)-1) for k in range(1, len(listCuts) ) if k > j ]
+
+def maskABCD( listCuts ):
+	"""Mask of the cuts applied before the ABCD method (all but the last two)"""
+	return ( 1 << max( len(listCuts) - 2, 0 ) ) - 1
+
+def regionsABCD( listCuts ):
+	"""Value of the last two bits in each region: A passes both cuts, B only the first, C only the second and D none"""
+
+	first = 1 << ( len(listCuts) - 2 )
+	second = 1 << ( len(listCuts) - 1 )
+	regions = OrderedDict()
+	regions[ 'A' ] = first | second
+	regions[ 'B' ] = first
+	regions[ 'C' ] = second
+	regions[ 'D' ] = 0
+	return regions, first | second
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+
+'''
+File: dijetPairing.py
+Description: Pairing of four jets into two dijets and the dijet variables of the resolved
+	     analysis, for N events at once. Inputs are (N,4) arrays of pt, eta, phi and E,
+	     four vectors are (px, py, pz, E) arrays like a TLorentzVector. The helpers follow
+	     the names of interface/CommonVariablesStructure.h.
+'''
+
+import numpy as np
+from collections import OrderedDict
+
+#### same order as the keys of DeltaRPairing/MassAsyming in RUNMiniResolvedAnalyzer
+pairings = [ '1234', '1324', '1423' ]
+pairingIndices = np.array( [ [ 0, 1, 2, 3 ], [ 0, 2, 1, 3 ], [ 0, 3, 1, 2 ] ] )
+#### same order as the list returned by dijetVar
+dijetVarNames = [ 'massAve', 'deltaEtaDijet1', 'deltaEtaDijet2', 'deltaEtaAveDijets', 'deltaEtaDijets', 'massAsymmetry', 'cosThetaStarDijet1', 'cosThetaStarDijet2', 
+		'deltaDijet1', 'deltaDijet2', 'xi1', 'xi2', 'deltaRDijet1', 'deltaRDijet2' ]
+
+def fourVector( pt, eta, phi, E ):
+	"""( px, py, pz, E ) as TLorentzVector::SetPtEtaPhiE"""
+	return np.array( [ pt * np.cos( phi ), pt * np.sin( phi ), pt * np.sinh( eta ), E ], dtype=np.float64 )
+
+def transverseMomentum( p ): return np.hypot( p[0], p[1] )
+
+def invariantMass( p ):
+	"""As TLorentzVector::M, negative for space-like vectors"""
+	mm = p[3]*p[3] - p[0]*p[0] - p[1]*p[1] - p[2]*p[2]
+	return np.sign( mm ) * np.sqrt( np.abs( mm ) )
+
+def pseudoRapidity( p ): return np.arcsinh( p[2] / transverseMomentum( p ) )
+
+def deltaPhi( p1, p2 ):
+	"""Difference in phi between -pi and pi"""
+	dPhi = np.arctan2( p1[1], p1[0] ) - np.arctan2( p2[1], p2[0] )
+	return ( dPhi + np.pi ) % ( 2 * np.pi ) - np.pi
+
+def deltaR( p1, p2 ): return np.hypot( pseudoRapidity( p1 ) - pseudoRapidity( p2 ), deltaPhi( p1, p2 ) )
+
+def massAverage( m1, m2 ): return ( m1 + m2 ) / 2.
+
+def massAsymmetry( m1, m2 ): return np.abs( ( m1 - m2 ) / ( m1 + m2 ) )
+
+def deltaValue( p1, p2 ): return np.abs( p1 - p2 )
+
+def cosThetaStar( p1, p2 ):
+	"""|cos(theta)| of p1 boosted to the rest frame of p1+p2 (TLorentzVector::Boost)"""
+
+	cm = p1 + p2
+	beta = -cm[:3] / cm[3]
+	beta2 = ( beta * beta ).sum( axis=0 )
+	gamma = 1. / np.sqrt( 1. - beta2 )
+	betaP = ( beta * p1[:3] ).sum( axis=0 )
+	gamma2 = np.where( beta2 > 0, ( gamma - 1. ) / np.where( beta2 > 0, beta2, 1. ), 0. )
+	boosted = p1[:3] + gamma2 * betaP * beta + gamma * beta * p1[3]
+	return np.abs( boosted[2] / np.sqrt( ( boosted * boosted ).sum( axis=0 ) ) )
+
+def deltaRPairing( jets, offset ):
+	"""Index in pairings of the pairing with the smallest |dR1-offset| + |dR2-offset|, and this value.
+	jets are the four vectors of the four jets, shape (4,4,N). Ties go to the first pairing."""
+
+	values = np.array( [ deltaValue( deltaR( jets[:,i], jets[:,j] ), offset ) + deltaValue( deltaR( jets[:,k], jets[:,l] ), offset ) for i, j, k, l in pairingIndices ] )
+	choice = np.argmin( values, axis=0 )
+	return choice, values[ choice, np.arange( len(choice) ) ]
+
+def massAsymPairing( jets ):
+	"""Same as deltaRPairing with |m_i-m_j|/|m_k-m_l| (inf when the denominator is 0)"""
+
+	masses = invariantMass( jets )
+	with np.errstate( divide='ignore', invalid='ignore' ):
+		values = np.array( [ deltaValue( masses[i], masses[j] ) / deltaValue( masses[k], masses[l] ) for i, j, k, l in pairingIndices ] )
+	choice = np.argmin( np.where( np.isnan( values ), np.inf, values ), axis=0 )
+	return choice, values[ choice, np.arange( len(choice) ) ]
+
+def assignDijets( jets, choice ):
+	"""Order of the jets for each pairing choice: the dijet with the largest dR goes first. Returns the ordered jets and the indices"""
+
+	order = pairingIndices[ choice ]
+	events = np.arange( len(choice) )
+	firstFirst = ( deltaR( jets[ :, order[:,0], events ], jets[ :, order[:,1], events ] ) > deltaR( jets[ :, order[:,2], events ], jets[ :, order[:,3], events ] ) )
+	order = np.where( firstFirst[:,None], order, order[:, [ 2, 3, 0, 1 ] ] )
+	return jets[ :, order.T, events ], order
+
+def dijetVariables( jets ):
+	"""Same variables as dijetVar, jets are the ordered four vectors (4,4,N)"""
+
+	j1, j2, j3, j4 = jets[:,0], jets[:,1], jets[:,2], jets[:,3]
+	dijet1 = j1 + j2
+	dijet2 = j3 + j4
+	dijet1Mass = invariantMass( dijet1 )
+	dijet2Mass = invariantMass( dijet2 )
+	variables = OrderedDict()
+	variables[ 'massAve' ] = massAverage( dijet1Mass, dijet2Mass )
+	variables[ 'deltaEtaDijet1' ] = deltaValue( pseudoRapidity( j1 ), pseudoRapidity( j2 ) )
+	variables[ 'deltaEtaDijet2' ] = deltaValue( pseudoRapidity( j3 ), pseudoRapidity( j4 ) )
+	variables[ 'deltaEtaAveDijets' ] = ( variables[ 'deltaEtaDijet1' ] + variables[ 'deltaEtaDijet2' ] ) / 2
+	variables[ 'deltaEtaDijets' ] = deltaValue( pseudoRapidity( dijet1 ), pseudoRapidity( dijet2 ) )
+	variables[ 'massAsymmetry' ] = massAsymmetry( dijet1Mass, dijet2Mass )
+	variables[ 'cosThetaStarDijet1' ] = cosThetaStar( j1, j2 )
+	variables[ 'cosThetaStarDijet2' ] = cosThetaStar( j3, j4 )
+	variables[ 'deltaDijet1' ] = ( transverseMomentum( j1 ) + transverseMomentum( j2 ) ) - variables[ 'massAve' ]
+	variables[ 'deltaDijet2' ] = ( transverseMomentum( j3 ) + transverseMomentum( j4 ) ) - variables[ 'massAve' ]
+	variables[ 'xi1' ] = ( np.maximum( invariantMass( j1 ), invariantMass( j2 ) ) / dijet1Mass ) * deltaR( j1, j2 )
+	variables[ 'xi2' ] = ( np.maximum( invariantMass( j3 ), invariantMass( j4 ) ) / dijet2Mass ) * deltaR( j3, j4 )
+	variables[ 'deltaRDijet1' ] = deltaR( j1, j2 )
+	variables[ 'deltaRDijet2' ] = deltaR( j3, j4 )
+	variables[ 'dijet1Mass' ] = dijet1Mass
+	variables[ 'dijet2Mass' ] = dijet2Mass
+	variables[ 'dijet1sPt' ] = transverseMomentum( j1 ) + transverseMomentum( j2 )
+	variables[ 'dijet2sPt' ] = transverseMomentum( j3 ) + transverseMomentum( j4 )
+	return variables
+
+def pairJets( pt, eta, phi, E, offset=0.8 ):
+	"""DeltaRPairing with offset and dijetVar for (N,4) arrays of jets. Returns a dict of arrays:
+	pairing (index in pairings), order (N,4 jet indices), mindR and the dijet variables"""
+
+	jets = fourVector( np.asarray( pt ).T, np.asarray( eta ).T, np.asarray( phi ).T, np.asarray( E ).T )
+	choice, mindR = deltaRPairing( jets, offset )
+	orderedJets, order = assignDijets( jets, choice )
+	result = OrderedDict()
+	result[ 'pairing' ] = choice
+	result[ 'order' ] = order
+	result[ 'mindR' ] = mindR
+	with np.errstate( divide='ignore', invalid='ignore' ): result.update( dijetVariables( orderedJets ) )
+	return result
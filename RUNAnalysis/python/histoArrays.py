@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+
+'''
+File: histoArrays.py
+Description: Contents and sumw2 of TH1/TH2 as numpy arrays and back. The arrays have all the
+	     bins in the global bin order of ROOT, underflow and overflow included, so a TH2 with
+	     nx, ny bins is an array that reshapes to ( ny+2, nx+2 ). Rebinning, normalization,
+	     ratios and efficiencies are then done on the arrays instead of looping over bins.
+'''
+
+import numpy as np
+
+#### type of the TArray a histogram class inherits from, from the last letter of its name
+arrayTypes = { 'F': np.float32, 'D': np.float64, 'I': np.int32, 'S': np.int16, 'C': np.int8 }
+
+def bufferArray( buf, size, dtype ):
+	"""Copy of a ROOT buffer ( e.g. TH1F::GetArray ) of size elements as a float64 array"""
+	if hasattr( buf, 'SetSize' ): buf.SetSize( size )
+	return np.frombuffer( buf, dtype=dtype, count=size ).astype( np.float64 )
+
+def toArrays( histo ):
+	"""( contents, sumw2 ) of all the bins. Without Sumw2 the sumw2 are the contents, as TH1::GetBinError does"""
+
+	size = histo.GetSize()
+	try:
+		contents = bufferArray( histo.GetArray(), size, arrayTypes[ histo.ClassName()[-1] ] )
+		sumw2 = ( bufferArray( histo.GetSumw2().GetArray(), size, np.float64 ) if histo.GetSumw2N() == size else np.abs( contents ) )
+	except ( TypeError, ValueError, AttributeError, KeyError ):
+		#### no buffer interface, one call per bin
+		contents = np.array( [ histo.GetBinContent( i ) for i in xrange( size ) ], dtype=np.float64 )
+		sumw2 = np.array( [ histo.GetBinError( i ) for i in xrange( size ) ], dtype=np.float64 )**2
+	return contents, sumw2
+
+def fromArrays( histo, contents, sumw2 ):
+	"""Set all the bins of histo, the statistics are recomputed from the new contents"""
+
+	if histo.GetSumw2N() == 0: histo.Sumw2()
+	histo.SetContent( np.asarray( contents, dtype=np.float64 ) )
+	histo.GetSumw2().Set( len(sumw2), np.asarray( sumw2, dtype=np.float64 ) )
+	histo.ResetStats()
+	return histo
+
+def rebinArray( values, ngroup, axis=-1 ):
+	"""TH1::Rebin of the contents ( or sumw2 ) along one axis of an array with underflow and overflow,
+	the last bins that do not make a full group go to the overflow"""
+
+	values = np.moveaxis( np.asarray( values, dtype=np.float64 ), axis, -1 )
+	if ngroup > 1:
+		nbins = values.shape[-1] - 2
+		newBins = nbins // ngroup
+		result = np.zeros( values.shape[:-1] + ( newBins+2, ) )
+		result[ ..., 0 ] = values[ ..., 0 ]
+		result[ ..., 1:newBins+1 ] = np.reshape( values[ ..., 1:newBins*ngroup+1 ], values.shape[:-1] + ( newBins, ngroup ) ).sum( axis=-1 )
+		result[ ..., newBins+1 ] = values[ ..., newBins*ngroup+1: ].sum( axis=-1 )
+		values = result
+	return np.moveaxis( values, -1, axis )
+
+############### 2D histograms, arrays of shape ( ny+2, nx+2 ) indexed [ y bin, x bin ]
+
+def toArrays2D( histo ):
+	"""( contents, sumw2 ) of a TH2 as 2D arrays"""
+	shape = ( histo.GetYaxis().GetNbins()+2, histo.GetXaxis().GetNbins()+2 )
+	return tuple( np.reshape( x, shape ) for x in toArrays( histo ) )
+
+def rebinned2D( histo, rebinx, rebiny ):
+	"""Copy of a TH2 ( fixed bins ) with rebinx x bins and rebiny y bins merged, as TH2::Rebin2D"""
+
+	contents, sumw2 = toArrays2D( histo )
+	contents, sumw2 = [ rebinArray( rebinArray( x, rebinx, axis=1 ), rebiny, axis=0 ) for x in [ contents, sumw2 ] ]
+	xaxis = histo.GetXaxis()
+	yaxis = histo.GetYaxis()
+	nx = contents.shape[1] - 2
+	ny = contents.shape[0] - 2
+	newHisto = histo.Clone( histo.GetName()+'_rebin' )
+	newHisto.SetDirectory( 0 )
+	newHisto.SetBins( nx, xaxis.GetXmin(), xaxis.GetBinUpEdge( nx*max( rebinx, 1 ) ), ny, yaxis.GetXmin(), yaxis.GetBinUpEdge( ny*max( rebiny, 1 ) ) )
+	return fromArrays( newHisto, contents.ravel(), sumw2.ravel() )
+
+def normalizeColumns( contents, sumw2 ):
+	"""Each x bin ( column ) divided by its sum over all the y bins, columns without entries are 0"""
+	total = contents.sum( axis=0 )[ np.newaxis, : ]
+	safeTotal = np.where( total != 0, total, 1. )
+	return np.where( total != 0, contents / safeTotal, 0. ), np.where( total != 0, sumw2 / safeTotal**2, 0. )
+
+def ratioArrays( numerator, sumw2Num, denominator, sumw2Den ):
+	"""numerator / denominator with the errors of TH1::Divide, 0 where the denominator is 0"""
+	valid = ( denominator != 0 )
+	safeDen = np.where( valid, denominator, 1. )
+	ratio = np.where( valid, numerator / safeDen, 0. )
+	return ratio, np.where( valid, ( sumw2Num * safeDen**2 + sumw2Den * numerator**2 ) / safeDen**4, 0. )
+
+def efficiencyArrays( passing, sumw2Pass, total, sumw2Total ):
+	"""passing / total with binomial errors, as TH1::Divide with option B, 0 where total is 0 and no error where passing is total"""
+	valid = ( total != 0 )
+	safeTotal = np.where( valid, total, 1. )
+	efficiency = np.where( valid, passing / safeTotal, 0. )
+	return efficiency, np.where( valid & ( passing != total ), np.abs( ( ( 1. - 2.*efficiency ) * sumw2Pass + efficiency**2 * sumw2Total ) / safeTotal**2 ), 0. )
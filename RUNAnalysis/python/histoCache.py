@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+
+'''
+File: histoCache.py
+Description: Input files and histograms shared by all the plots of a process. Each file
+	     is opened once, each histogram is read, rebinned and scaled once per
+	     ( file, name, rebin, scale ) and every call returns a copy of it, so the
+	     plots can normalize, style or add histograms without changing the cache.
+'''
+
+from ROOT import TFile
+
+openFiles = {}
+derivedHistos = {}
+#### [ file name, histogram name ] of every getHisto call, used by plotManifest
+readHistos = []
+
+def openFile( fileName ):
+	"""TFile.Open of fileName, the same TFile for every call"""
+	if fileName not in openFiles: openFiles[ fileName ] = TFile.Open( fileName )
+	return openFiles[ fileName ]
+
+def getHisto( inFile, name, rebin=1, scale=1, rebinFunction=None ):
+	"""Copy (not attached to any directory) of the histogram name of inFile ( a TFile or a file name ), rebinned and then scaled.
+	rebin is an integer for TH1::Rebin or a tuple of arguments of rebinFunction ( e.g. ( rebinx, rebiny ) for 2D )"""
+
+	if isinstance( inFile, str ): inFile = openFile( inFile )
+	key = ( inFile.GetName(), name, rebin, scale )
+	readHistos.append( [ inFile.GetName(), name ] )
+	if key not in derivedHistos:
+		tmpHisto = inFile.Get( name )
+		if not tmpHisto: raise KeyError( name+' not found in '+inFile.GetName() )
+		#### the TFile keeps the object it returns, it is never rebinned or scaled itself
+		tmpHisto = tmpHisto.Clone( name+'_cache'+str( len(derivedHistos) ) )
+		tmpHisto.SetDirectory( 0 )
+		if isinstance( rebin, tuple ): tmpHisto = rebinFunction( tmpHisto, *rebin )
+		elif rebin > 1: tmpHisto.Rebin( rebin )
+		if scale != 1: tmpHisto.Scale( scale )
+		derivedHistos[ key ] = tmpHisto
+	histo = derivedHistos[ key ].Clone( name )
+	histo.SetDirectory( 0 )
+	return histo
+
+def clear():
+	"""Forget the histograms and close the files"""
+	derivedHistos.clear()
+	for fileName in openFiles:
+		if openFiles[ fileName ]: openFiles[ fileName ].Close()
+	openFiles.clear()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+
+'''
+File: histoStore.py
+Description: Histograms kept as numpy arrays (sum of weights and sum of weights squared)
+	     while the events are processed. Histograms are booked once and used through
+	     the integer handle returned by book1D/book2D, fills are done in batches and the
+	     TH1F/TH2F are only created when the output file is written.
+'''
+
+import numpy as np
+from collections import OrderedDict
+from ROOT import TH1F, TH2F
+
+def findBin( x, nbins, xmin, xmax ):
+	"""Same bin as TAxis::FindBin for fixed bins: 0 is underflow, nbins+1 overflow (also for NaN)"""
+
+	x = np.asarray( x, dtype=np.float64 )
+	ibin = np.where( x < xmin, 0, nbins+1 ).astype( np.int64 )
+	inRange = ( x >= xmin ) & ( x < xmax )
+	ibin[ inRange ] = 1 + ( nbins * ( x[ inRange ] - xmin ) / ( xmax - xmin ) ).astype( np.int64 )
+	return ibin
+
+class HistoStore(object):
+	"""Array based histograms with the names and binning of the TH1F/TH2F they are converted to"""
+
+	def __init__( self, bufferSize=100000 ):
+		self.names = []
+		self.titles = []
+		self.axes = []
+		self.sumw = []
+		self.sumw2 = []
+		self.stats = []
+		self.entries = []
+		self.useSumw2 = []
+		self.buffers = []
+		self.labels = []
+		self.handles = OrderedDict()
+		self.bufferSize = bufferSize
+
+	def book( self, name, title, axes, sumw2 ):
+		"""Booking the same name again returns the same handle"""
+		if name in self.handles: return self.handles[ name ]
+		numCells = np.prod( [ axis[0]+2 for axis in axes ] )
+		self.names.append( name )
+		self.titles.append( title )
+		self.axes.append( axes )
+		self.sumw.append( np.zeros( numCells ) )
+		self.sumw2.append( np.zeros( numCells ) )
+		self.stats.append( np.zeros( 4 if len(axes) == 1 else 7 ) )
+		self.entries.append( 0 )
+		self.useSumw2.append( sumw2 )
+		self.buffers.append( [] )
+		self.labels.append( {} )
+		self.handles[ name ] = len(self.names) - 1
+		return self.handles[ name ]
+
+	def book1D( self, name, title, nbins, xmin, xmax, sumw2=True ):
+		"""Same arguments as TH1F, returns the handle used to fill"""
+		return self.book( name, title, [ ( nbins, float(xmin), float(xmax) ) ], sumw2 )
+
+	def book2D( self, name, title, nbinsx, xmin, xmax, nbinsy, ymin, ymax, sumw2=True ):
+		"""Same arguments as TH2F, returns the handle used to fill"""
+		return self.book( name, title, [ ( nbinsx, float(xmin), float(xmax) ), ( nbinsy, float(ymin), float(ymax) ) ], sumw2 )
+
+	def __getitem__( self, name ): return self.handles[ name ]
+
+	def binIndex( self, h, x, y=None ):
+		"""Global bin (as TH1::FindBin) of each entry, can be reused for histograms with the same binning"""
+		ibin = findBin( x, *self.axes[h][0] )
+		if y is not None: ibin = ibin + ( self.axes[h][0][0] + 2 ) * findBin( y, *self.axes[h][1] )
+		return ibin
+
+	def fillIndex( self, h, ibin, w, x, y=None ):
+		"""Fill with precomputed global bins, x (and y) are only used for the statistics"""
+
+		if len(self.buffers[h]) > 0: self.flushHisto( h )
+		w = np.asarray( w, dtype=np.float64 )
+		if len(w) == 0: return
+		self.sumw[h] += np.bincount( ibin, weights=w, minlength=len(self.sumw[h]) )
+		self.sumw2[h] += np.bincount( ibin, weights=w*w, minlength=len(self.sumw[h]) )
+		self.entries[h] += len(w)
+		if not self.useSumw2[h] and np.any( w != 1. ): self.useSumw2[h] = True
+
+		#### statistics (mean, rms) only with entries inside the axis range, as ROOT does
+		nx = self.axes[h][0][0]
+		if y is None: inRange = ( ibin > 0 ) & ( ibin <= nx )
+		else: inRange = ( ibin % ( nx+2 ) > 0 ) & ( ibin % ( nx+2 ) <= nx ) & ( ibin // ( nx+2 ) > 0 ) & ( ibin // ( nx+2 ) <= self.axes[h][1][0] )
+		w = w[ inRange ]
+		x = np.asarray( x, dtype=np.float64 )[ inRange ]
+		self.stats[h][:4] += [ w.sum(), (w*w).sum(), (w*x).sum(), (w*x*x).sum() ]
+		if y is not None:
+			y = np.asarray( y, dtype=np.float64 )[ inRange ]
+			self.stats[h][4:] += [ (w*y).sum(), (w*y*y).sum(), (w*x*y).sum() ]
+
+	def fill( self, h, x, w ):
+		"""Batched fill of a 1D histogram"""
+		self.fillIndex( h, self.binIndex( h, x ), w, x )
+
+	def fill2D( self, h, x, y, w ):
+		"""Batched fill of a 2D histogram"""
+		self.fillIndex( h, self.binIndex( h, x, y ), w, x, y )
+
+	def fillTable( self, plots, values, w, mask=None, binCache=None ):
+		"""Batched fill of several histograms from a dict of arrays, plots are [ handle, x variable, y variable or None ].
+		The bins of a variable on a given axis are computed once and kept in binCache, which can be shared by several masks of the same values"""
+
+		if binCache is None: binCache = {}
+		w = np.asarray( w, dtype=np.float64 )
+		for h, xVar, yVar in plots:
+			ibin = self.variableBins( binCache, values, xVar, self.axes[h][0] )
+			if yVar is not None: ibin = ibin + ( self.axes[h][0][0] + 2 ) * self.variableBins( binCache, values, yVar, self.axes[h][1] )
+			x = values[ xVar ]
+			y = ( None if yVar is None else values[ yVar ] )
+			if mask is None: self.fillIndex( h, ibin, w, x, y )
+			else: self.fillIndex( h, ibin[ mask ], w[ mask ], x[ mask ], ( None if y is None else y[ mask ] ) )
+
+	def variableBins( self, binCache, values, var, axis ):
+		"""findBin of values[ var ] for one axis, cached by variable and binning"""
+		if ( var, axis ) not in binCache: binCache[ ( var, axis ) ] = findBin( values[ var ], *axis )
+		return binCache[ ( var, axis ) ]
+
+	def push( self, h, x, w ):
+		"""Single entry fill, kept in a buffer and filled in batches"""
+		self.buffers[h].append( ( x, w ) )
+		if len(self.buffers[h]) >= self.bufferSize: self.flushHisto( h )
+
+	def push2D( self, h, x, y, w ):
+		"""Single entry fill of a 2D histogram, kept in a buffer and filled in batches"""
+		self.buffers[h].append( ( x, y, w ) )
+		if len(self.buffers[h]) >= self.bufferSize: self.flushHisto( h )
+
+	def flushHisto( self, h ):
+		"""Fill the buffered entries of one histogram"""
+		tmpBuffer = np.array( self.buffers[h], dtype=np.float64 )
+		self.buffers[h] = []
+		if len(self.axes[h]) == 1: self.fill( h, tmpBuffer[:,0], tmpBuffer[:,1] )
+		else: self.fill2D( h, tmpBuffer[:,0], tmpBuffer[:,1], tmpBuffer[:,2] )
+
+	def flush( self ):
+		"""Fill all the buffered entries"""
+		for h in range( len(self.names) ):
+			if len(self.buffers[h]) > 0: self.flushHisto( h )
+
+	def setBinContent( self, h, ibin, content ):
+		"""As TH1::SetBinContent: one more entry and the statistics are recomputed from the bins"""
+		if 0 <= ibin < len(self.sumw[h]): 
+			self.sumw[h][ ibin ] = content
+			self.entries[h] += 1
+			self.stats[h][:] = 0
+
+	def setBinLabel( self, h, ibin, label ):
+		"""As TAxis::SetBinLabel of the x axis, only for bins 1 to nbins"""
+		if 1 <= ibin <= self.axes[h][0][0]: self.labels[h][ ibin ] = label
+
+	def merge( self, other ):
+		"""Add the content of another store by name, histograms not booked here are booked first (same order as in other)"""
+		self.flush()
+		other.flush()
+		for i, name in enumerate( other.names ):
+			h = self.book( name, other.titles[i], other.axes[i], other.useSumw2[i] )
+			self.sumw[h] += other.sumw[i]
+			self.sumw2[h] += other.sumw2[i]
+			self.stats[h] += other.stats[i]
+			self.entries[h] += other.entries[i]
+			self.useSumw2[h] = self.useSumw2[h] or other.useSumw2[i]
+			self.labels[h].update( other.labels[i] )
+
+	def toROOT( self ):
+		"""Create the TH1F/TH2F in the current directory, returns them in a dict by name"""
+
+		self.flush()
+		histos = OrderedDict()
+		for h, name in enumerate( self.names ):
+			if len(self.axes[h]) == 1: tmpHisto = TH1F( name, self.titles[h], *self.axes[h][0] )
+			else: tmpHisto = TH2F( name, self.titles[h], *( self.axes[h][0] + self.axes[h][1] ) )
+			if self.useSumw2[h]: tmpHisto.Sumw2()
+			tmpHisto.SetContent( self.sumw[h] )
+			if self.useSumw2[h]: tmpHisto.GetSumw2().Set( len(self.sumw2[h]), self.sumw2[h] )
+			for ibin in self.labels[h]: tmpHisto.GetXaxis().SetBinLabel( ibin, self.labels[h][ibin] )
+			tmpHisto.SetEntries( self.entries[h] )
+			if self.entries[h] > 0: tmpHisto.PutStats( np.array( self.stats[h] ) )
+			histos[ name ] = tmpHisto
+		return histos
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+
+'''
+File: plotJobs.py
+Description: Independent plots of the DrawHistogram scripts run serially or in a pool of
+	     worker processes ( commonFunctions.runChunks ). A job is [ function, arguments, cost ],
+	     the jobs are sent to the workers by index and run longest (highest cost) first.
+	     With a manifest (see plotManifest) the jobs whose inputs, options and script
+	     did not change since the last run are skipped.
+'''
+
+import sys, time, traceback, hashlib
+from commonFunctions import runChunks
+from histoCache import readHistos
+from plotManifest import savedPlots, upToDate, newEntry, loadManifest, writeManifest
+
+pendingJobs = []
+styleSettings = []
+#### manifest, script version, force and dryRun of the current runPlotJobs
+manifestSettings = {}
+
+def moduleSettings( modules ):
+	"""Plain settings ( strings, numbers, booleans ) of the style modules, e.g. CMS_lumi"""
+	return [ ( module, dict( ( k, v ) for k, v in vars( module ).items() if not k.startswith( '_' ) and isinstance( v, ( str, int, float, bool ) ) ) ) for module in modules ]
+
+def restoreSettings( settings ):
+	"""Every job starts with the style of the main process, whatever the previous job of the worker changed"""
+	for module, values in settings:
+		for k in values: setattr( module, k, values[ k ] )
+
+def jobLabel( job ): return job[0].__name__+'( '+', '.join( str(a) for a in job[1] if isinstance( a, str ) and a )+' )'
+
+def jobKey( job ): return job[0].__name__+repr( job[1] )
+
+def jobOptions( job ): return hashlib.md5( manifestSettings[ 'version' ]+jobKey( job ) ).hexdigest()
+
+def runJob( index ):
+	"""Run one of pendingJobs, returns [ index, time, traceback or None, status, manifest entry ].
+	status is drawn, upToDate (skipped) or outdated (not drawn in a dry run). An exception in the manifest check
+	( e.g. an unreadable input ) is a failure of the job, as one in the plot"""
+
+	function, arguments = pendingJobs[ index ][:2]
+	startTime = time.time()
+	try:
+		entry = None
+		if manifestSettings:
+			options = jobOptions( pendingJobs[ index ] )
+			entry = manifestSettings[ 'manifest' ].get( jobKey( pendingJobs[ index ] ) )
+			if not manifestSettings[ 'force' ] and upToDate( entry, options ): return [ index, time.time() - startTime, None, 'upToDate', entry ]
+			if manifestSettings[ 'dryRun' ]: return [ index, time.time() - startTime, None, 'outdated', entry ]
+
+		restoreSettings( styleSettings )
+		del readHistos[:]
+		del savedPlots[:]
+		function( *arguments )
+		entry = ( newEntry( options ) if manifestSettings else None )
+		error = None
+	except Exception: 
+		entry = None
+		error = traceback.format_exc()
+	sys.stdout.flush()
+	return [ index, time.time() - startTime, error, 'drawn', entry ]
+
+def initWorker( setup ):
+	"""Batch mode and style of each worker"""
+	if setup is not None: setup()
+
+def runPlotJobs( listJobs, jobs=1, setup=None, styleModules=[], manifestName=None, version='', force=False, dryRun=False ):
+	"""Run all the jobs, in the given order with jobs=1 or in a pool of jobs processes ordered by cost.
+	A failed job is reported at the end and does not stop the others. Returns the labels of the failed jobs.
+	manifestName: skip the jobs up to date in this manifest ( all drawn with force ), dryRun only lists the jobs to draw"""
+
+	del pendingJobs[:]
+	pendingJobs.extend( listJobs )
+	del styleSettings[:]
+	styleSettings.extend( moduleSettings( styleModules ) )
+	manifestSettings.clear()
+	if manifestName: manifestSettings.update( { 'manifest': loadManifest( manifestName ), 'version': version, 'force': force, 'dryRun': dryRun } )
+
+	startTime = time.time()
+	if jobs > 1 and len(listJobs) > 1:
+		order = sorted( range( len(listJobs) ), key=lambda i: -listJobs[i][2] )
+		print '------> Running '+str( len(listJobs) )+' plots in '+str( jobs )+' processes'
+		results = list( runChunks( runJob, order, jobs, initWorker, ( setup, ) ) )
+	else: results = [ runJob( i ) for i in range( len(listJobs) ) ]
+
+	results = sorted( results )
+	if dryRun:
+		for r in results: 
+			if r[3] == 'outdated': print '------> To draw: '+jobLabel( listJobs[ r[0] ] )
+
+	if manifestName and not dryRun:
+		manifest = manifestSettings[ 'manifest' ]
+		for r in results:
+			if r[3] != 'drawn': continue
+			if r[4] is None: manifest.pop( jobKey( listJobs[ r[0] ] ), None )
+			else: manifest[ jobKey( listJobs[ r[0] ] ) ] = r[4]
+		writeManifest( manifestName, manifest )
+
+	failed = [ r for r in results if r[2] is not None ]
+	for r in failed: print '------> Failed '+jobLabel( listJobs[ r[0] ] )+'\n'+r[2]
+	numJobs = dict( ( status, len([ r for r in results if r[3] == status ]) ) for status in [ 'drawn', 'upToDate', 'outdated' ] )
+	summary = str( numJobs[ 'drawn' ] - len(failed) )+' plots drawn, '+str( len(failed) )+' failed, '+str( numJobs[ 'upToDate' ] )+' up to date'
+	if dryRun: summary += ', '+str( numJobs[ 'outdated' ] )+' to draw'
+	print '------> '+summary+' in '+str( round( time.time() - startTime, 1 ) )+' s'
+	return [ jobLabel( listJobs[ r[0] ] ) for r in failed ]
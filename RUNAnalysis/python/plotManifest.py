@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+
+'''
+File: plotManifest.py
+Description: Manifest of the plots drawn by the DrawHistogram scripts. For each plot job it
+	     keeps the input histograms read through histoCache, the plots saved with savePlot
+	     and a fingerprint of the inputs (binning, contents and sumw2), the job options and
+	     the version of the script. A job whose fingerprint did not change and whose plots
+	     exist is not drawn again.
+'''
+
+import os, sys, json, hashlib, inspect
+from histoArrays import toArrays
+from commonFunctions import atomicWrite
+from histoCache import openFile, readHistos
+
+savedPlots = []
+
+def savePlot( can, fileName ):
+	"""TCanvas::SaveAs, keeping the name of the plot for the manifest"""
+	can.SaveAs( fileName )
+	savedPlots.append( fileName )
+
+def scriptVersion( fileNames ):
+	"""md5 of the scripts and the modules they use, a new version of the code redraws everything"""
+	checksum = hashlib.md5()
+	for fileName in fileNames: checksum.update( open( fileName.replace( '.pyc', '.py' ), 'rb' ).read() )
+	return checksum.hexdigest()
+
+def sourceFiles( *objects ):
+	"""Files of modules, or of the modules of functions, e.g. the helpers a script imports, for scriptVersion"""
+	return [ ( x.__file__ if inspect.ismodule( x ) else sys.modules[ x.__module__ ].__file__ ) for x in objects ]
+
+def histoFingerprint( histo ):
+	"""md5 of the binning, contents and sumw2 ( with underflow and overflow ) of a TH1/TH2"""
+
+	checksum = hashlib.md5()
+	for axis in [ histo.GetXaxis(), histo.GetYaxis(), histo.GetZaxis() ]: checksum.update( repr( [ axis.GetBinLowEdge( i ) for i in range( 1, axis.GetNbins()+2 ) ] ) )
+	contents, sumw2 = toArrays( histo )
+	checksum.update( contents.tostring() )
+	checksum.update( sumw2.tostring() )
+	return checksum.hexdigest()
+
+def jobFingerprint( inputs, options ):
+	"""Fingerprint of the input histograms [ file name, histogram name ] and the options, None if an input is missing"""
+
+	checksum = hashlib.md5( options )
+	for fileName, name in inputs:
+		fileName, name = str( fileName ), str( name )
+		if not os.path.exists( fileName ): return None
+		histo = openFile( fileName ).Get( name )
+		if not histo: return None
+		checksum.update( fileName+'/'+name+':'+histoFingerprint( histo ) )
+	return checksum.hexdigest()
+
+def upToDate( entry, options ):
+	"""The plots of the entry exist and nothing they depend on changed. Jobs that read no histogram through histoCache are always drawn"""
+	if entry is None or not entry[ 'inputs' ] or not entry[ 'outputs' ]: return False
+	if not all( os.path.exists( plot ) for plot in entry[ 'outputs' ] ): return False
+	return jobFingerprint( entry[ 'inputs' ], options ) == entry[ 'fingerprint' ]
+
+def newEntry( options ):
+	"""Entry of the job that was just drawn, from the histograms it read and the plots it saved"""
+	inputs = sorted( set( tuple( x ) for x in readHistos ) )
+	return { 'inputs': [ list( x ) for x in inputs ], 'outputs': list( savedPlots ), 'fingerprint': jobFingerprint( inputs, options ) }
+
+def loadManifest( fileName ):
+	if not os.path.exists( fileName ): return {}
+	with open( fileName ) as manifestFile: return json.load( manifestFile )
+
+def writeManifest( fileName, manifest ):
+	"""Written with atomicWrite, an interrupted run never leaves half a manifest"""
+	def write( tmpName ):
+		with open( tmpName, 'w' ) as manifestFile: json.dump( manifest, manifestFile, indent=1, sort_keys=True )
+	atomicWrite( fileName, write )
@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+
+'''
+File: rocCurves.py
+Description: ROC points from the bin contents of a signal and a background histogram.
+	     All the integrals of a curve come from one cumulative sum, the bin ranges are
+	     the same as the TH1::Integral calls they replace in RUNOptimization.
+'''
+
+import numpy as np
+
+def integrals( contents, firstBins, lastBins ):
+	"""TH1::Integral( first, last ) for arrays of first and last bins. contents has the underflow and overflow,
+	ranges are clamped as ROOT does: first below 0 is 0, last out of range or below first is the overflow"""
+
+	cumulative = np.concatenate( [ [ 0. ], np.cumsum( contents ) ] )
+	firstBins = np.maximum( firstBins, 0 )
+	lastBins = np.where( ( lastBins >= len(contents) ) | ( lastBins < firstBins ), len(contents)-1, lastBins )
+	return cumulative[ lastBins+1 ] - cumulative[ firstBins ]
+
+def rocPoints( sigContents, bkgContents, lowerThan ):
+	"""Background rejection and signal efficiency for a cut at every bin between the first and the last bin with signal.
+	lowerThan: events below the cut pass. Returns [ bkg rejection, sig efficiency, bins ] as arrays"""
+
+	nbins = len(sigContents) - 2
+	withSignal = np.flatnonzero( sigContents[ 1:nbins+1 ] > 0 ) + 1
+	#### -1 when there is no signal, as TH1::FindFirstBinAbove/FindLastBinAbove
+	firstBin = ( withSignal[0] if len(withSignal) > 0 else -1 )
+	lastBin = ( withSignal[-1] if len(withSignal) > 0 else -1 ) + 1
+	bins = np.arange( firstBin, lastBin )
+	sigTotal = sigContents[ 1:nbins+1 ].sum()
+	bkgTotal = bkgContents[ 1:nbins+1 ].sum()
+
+	if lowerThan:
+		sigPassed = integrals( sigContents, np.full( len(bins), firstBin ), bins )
+		bkgPassed = integrals( bkgContents, np.full( len(bins), firstBin ), bins )
+	else:
+		sigPassed = integrals( sigContents, bins, np.full( len(bins), lastBin ) )
+		bkgPassed = integrals( bkgContents, bins, np.full( len(bins), lastBin ) )
+	effBkg = ( 1 - bkgPassed / bkgTotal if bkgTotal != 0 else np.ones( len(bins) ) )
+	effSig = ( sigPassed / sigTotal if sigTotal != 0 else np.zeros( len(bins) ) )
+	return effBkg, effSig, bins
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+
+'''
+File: skimCache.py
+Description: Preselected events of a RUNATree kept in a directory next to the input file,
+	     one .npy file per column, opened as read-only memory maps so a chunk of entries
+	     only reads its own part of the columns. The name of the cache has a key made of
+	     the size, mtime and a checksum of the input file, the tree name and the
+	     preselection, so a change in any of them creates a new cache instead of reading
+	     an old one ( the caches of the old keys are removed ).
+'''
+
+import os, glob, json, shutil, hashlib
+import numpy as np
+from collections import OrderedDict
+from commonFunctions import getTree, getArrays, entryRanges, atomicWrite
+
+#### same preselection as the mini analyzers: [ variable, '<' or '>', value ]
+preselection = [ [ 'HT', '>', 900 ], [ 'numJets', '>', 1 ] ]
+
+#### checksums by ( file, size, mtime ), the worker processes forked after the cache is created do not read the file again
+checksums = {}
+
+def fileChecksum( fileName, blockSize=1048576 ):
+	"""md5 of the first and last blockSize bytes, reading the whole file would cost as much as the skim itself"""
+
+	fileStat = os.stat( fileName )
+	statKey = ( os.path.abspath( fileName ), fileStat.st_size, int( fileStat.st_mtime ), blockSize )
+	if statKey not in checksums:
+		checksum = hashlib.md5()
+		with open( fileName, 'rb' ) as inputFile:
+			checksum.update( inputFile.read( blockSize ) )
+			inputFile.seek( max( fileStat.st_size - blockSize, 0 ) )
+			checksum.update( inputFile.read( blockSize ) )
+		checksums[ statKey ] = checksum.hexdigest()
+	return checksums[ statKey ]
+
+def skimKey( fileName, treeName, listCuts ):
+	"""Key of the cache: input file size, mtime and checksum, tree name and preselection"""
+	fileStat = os.stat( fileName )
+	return hashlib.sha1( repr( [ fileStat.st_size, int( fileStat.st_mtime ), fileChecksum( fileName ), treeName, listCuts ] ) ).hexdigest()[:16]
+
+def skimPrefix( fileName ): return os.path.splitext( fileName )[0]+'_skim_'
+
+def skimFileName( fileName, key ): return skimPrefix( fileName )+key
+
+def passCuts( values, listCuts ):
+	"""Mask of the entries passing all the cuts"""
+	mask = np.ones( len( values[ listCuts[0][0] ] ), dtype=bool )
+	for var, sign, value in listCuts: mask &= ( ( values[ var ] < value ) if sign == '<' else ( values[ var ] > value ) )
+	return mask
+
+def makeSkim( fileName, treeName, branches, weightBranches, weightScale, listCuts, chunkSize=1000000 ):
+	"""Read the input tree in chunks and keep the branches of the preselected entries, entry ( the index of each
+	preselected entry in the input tree ) and weight = weightScale * the product of weightBranches for every entry"""
+
+	readBranches = sorted( set( branches + weightBranches + [ cut[0] for cut in listCuts ] ) )
+	inputFile, tree, numEntries = getTree( fileName, treeName, readBranches )
+	skim = OrderedDict( ( b, [] ) for b in branches + [ 'entry' ] )
+	weights = []
+	for start, stop in entryRanges( numEntries, chunkSize ):
+		tmpEvents = getArrays( tree, readBranches, start=start, stop=stop )
+		if len( tmpEvents[ listCuts[0][0] ] ) == 0: continue
+		selected = passCuts( tmpEvents, listCuts )
+		for b in branches: skim[ b ].append( tmpEvents[ b ][ selected ] )
+		skim[ 'entry' ].append( start + np.flatnonzero( selected ) )
+		weight = weightScale
+		for b in weightBranches: weight = weight * tmpEvents[ b ]
+		weights.append( weight * np.ones( stop - start ) )
+	inputFile.Close()
+	for b in skim: skim[ b ] = ( np.concatenate( skim[ b ] ) if skim[ b ] else np.zeros( 0 ) )
+	skim[ 'entry' ] = skim[ 'entry' ].astype( np.int64 )
+	return skim, ( np.concatenate( weights ) if weights else np.zeros( 0 ) )
+
+def writeSkim( cacheName, skim, weights, weightDefinition ):
+	"""One .npy file per column and index.json with the branches and the definition of the weight.
+	Written with atomicWrite, other processes never read half a cache"""
+
+	def write( tmpName ):
+		for b in skim: np.save( os.path.join( tmpName, 'skim_'+b+'.npy' ), skim[ b ] )
+		np.save( os.path.join( tmpName, 'weight.npy' ), weights )
+		with open( os.path.join( tmpName, 'index.json' ), 'w' ) as indexFile: json.dump( { 'branches': list( skim ), 'weight': weightDefinition }, indexFile )
+	atomicWrite( cacheName, write, directory=True )
+
+def removeStale( fileName, cacheName ):
+	"""Remove the caches of the input file with other keys ( and the npz caches of older versions )"""
+	for oldName in glob.glob( skimPrefix( fileName )+'*' ):
+		if oldName == cacheName or oldName.endswith( '.tmp' ): continue
+		print '------> Removing old preselection cache '+oldName
+		try:
+			if os.path.isdir( oldName ): shutil.rmtree( oldName )
+			else: os.remove( oldName )
+		except OSError: pass
+
+def openSkim( cacheName ):
+	"""index.json and the memory-mapped columns of a cache, None if it is not there"""
+	try:
+		with open( os.path.join( cacheName, 'index.json' ) ) as indexFile: index = json.load( indexFile )
+	except ( IOError, OSError, ValueError ): return None
+	columns = dict( ( str( b ), np.load( os.path.join( cacheName, 'skim_'+b+'.npy' ), mmap_mode='r' ) ) for b in index[ 'branches' ] )
+	return index, columns, np.load( os.path.join( cacheName, 'weight.npy' ), mmap_mode='r' )
+
+def skimColumns( fileName, treeName, branches, weightBranches=[], weightScale=1., listCuts=preselection ):
+	"""Memory-mapped columns of the preselected entries ( branches and entry ) and the weight of all the entries,
+	weightScale * the product of weightBranches. Read from the cache when it has all the branches and the same weight,
+	otherwise the cache is (re)created with the branches of both"""
+
+	cacheName = skimFileName( fileName, skimKey( fileName, treeName, listCuts ) )
+	weightDefinition = [ weightScale, list( weightBranches ) ]
+	cache = ( openSkim( cacheName ) if os.path.isdir( cacheName ) else None )
+	cachedBranches = ( list( cache[1] ) if cache is not None else [] )
+	if cache is not None and set( branches + [ 'entry' ] ) <= set( cachedBranches ) and cache[0][ 'weight' ] == weightDefinition: return cache[1:]
+
+	print '------> Creating preselection cache '+cacheName
+	keptBranches = [ b for b in cachedBranches if b not in branches + [ 'entry' ] ]
+	skim, weights = makeSkim( fileName, treeName, branches + keptBranches, weightBranches, weightScale, listCuts )
+	writeSkim( cacheName, skim, weights, weightDefinition )
+	removeStale( fileName, cacheName )
+	return openSkim( cacheName )[1:]
+
+def loadSkim( fileName, treeName, branches, weightBranches=[], weightScale=1., listCuts=preselection, start=None, stop=None ):
+	"""Preselected entries in [start, stop) ( dict of arrays with branches and entry ) and the weight of all the entries in [start, stop).
+	The entries are in order, only the slice of the memory-mapped columns of the range is read"""
+
+	columns, weights = skimColumns( fileName, treeName, branches, weightBranches, weightScale, listCuts )
+	first, last = np.searchsorted( columns[ 'entry' ], [ ( 0 if start is None else start ), ( len(weights) if stop is None else stop ) ] )
+	return ( OrderedDict( ( b, np.array( columns[ b ][ first:last ] ) ) for b in branches + [ 'entry' ] ), np.array( weights[ start:stop ] ) )
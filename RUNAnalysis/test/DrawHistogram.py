@@ -10,12 +10,18 @@ Description: My Draw histograms. Check for options at the end.
 from ROOT import *
 import time, os, math, sys
 from array import array
+import numpy as np
 import argparse
 from collections import OrderedDict
 try:
 	from RUNA.RUNAnalysis.histoLabels import labels, labelAxis, finalLabels, setSelection
 	from RUNA.RUNAnalysis.scaleFactors import scaleFactor as SF
 	from RUNA.RUNAnalysis.cuts import selection 
+	from RUNA.RUNAnalysis.histoCache import getHisto
+	from RUNA.RUNAnalysis.plotJobs import runPlotJobs
+	from RUNA.RUNAnalysis.plotManifest import savePlot, scriptVersion, sourceFiles
+	from RUNA.RUNAnalysis.abcdMethod import projectHistos, scanBoundaries
+	from RUNA.RUNAnalysis.histoArrays import fromArrays, rebinned2D
 	import RUNA.RUNAnalysis.CMS_lumi as CMS_lumi 
 	import RUNA.RUNAnalysis.tdrstyle as tdrstyle
 except ImportError:
@@ -23,15 +29,24 @@ except ImportError:
 	from histoLabels import labels, labelAxis, finalLabels
 	from scaleFactors import scaleFactor as SF
 	from cuts import selection 
+	from histoCache import getHisto
+	from plotJobs import runPlotJobs
+	from plotManifest import savePlot, scriptVersion, sourceFiles
+	from abcdMethod import projectHistos, scanBoundaries
+	from histoArrays import fromArrays, rebinned2D
 	import CMS_lumi as CMS_lumi 
 	import tdrstyle as tdrstyle
 
 
+def setupStyle():
+	"""Batch mode and styles, also run in each worker of --jobs"""
+	gROOT.SetBatch()
+	gROOT.ForceStyle()
+	tdrstyle.setTDRStyle()
+	gStyle.SetOptStat(0)
+
 gROOT.Reset()
-gROOT.SetBatch()
-gROOT.ForceStyle()
-tdrstyle.setTDRStyle()
-gStyle.SetOptStat(0)
+setupStyle()
 
 xline = array('d', [0,2000])
 yline = array('d', [1,1])
@@ -58,9 +73,7 @@ def plotSignalBkg( signalFiles, bkgFiles, Groom, nameInRoot, name, xmin, xmax, r
 		for sigSamples in signalFiles:
 			#if 'mini' in process: signalHistos[ sigSamples ] = allHistosFile.Get( nameInRoot+'_RPVStopStopToJets_'+args.decay+'_M-'+str(mass) )
 			#else: signalHistos[ sigSamples ] = signalFiles[ sigSamples ][0].Get( nameInRoot )
-			signalHistos[ sigSamples ] = signalFiles[ sigSamples ][0].Get(  nameInRoot+'_RPVStopStopToJets_'+args.decay+'_M-'+str(mass))
-			if rebinX > 1: signalHistos[ sigSamples ].Rebin( rebinX )
-			if signalFiles[ sigSamples ][1] != 1: signalHistos[ sigSamples ].Scale( signalFiles[ sigSamples ][1] ) 
+			signalHistos[ sigSamples ] = getHisto( signalFiles[ sigSamples ][0], nameInRoot+'_RPVStopStopToJets_'+args.decay+'_M-'+str(mass), rebinX, signalFiles[ sigSamples ][1] )
 			legend.AddEntry( signalHistos[ sigSamples ], signalFiles[ sigSamples ][2], 'l' if Norm else 'f' )
 			if Norm:
 				signalHistos[ sigSamples ].SetLineColor( signalFiles[ sigSamples ][3] )
@@ -79,9 +92,7 @@ def plotSignalBkg( signalFiles, bkgFiles, Groom, nameInRoot, name, xmin, xmax, r
 			dummy += 1
 			#if 'mini' in process: bkgHistos[ bkgSamples ] = allHistosFile.Get( nameInRoot+'_'+bkgSamples )
 			#else: bkgHistos[ bkgSamples ] = bkgFiles[ bkgSamples ][0].Get( nameInRoot )
-			bkgHistos[ bkgSamples ] = bkgFiles[ bkgSamples ][0].Get( nameInRoot+'_'+bkgSamples )
-			if rebinX > 1: bkgHistos[ bkgSamples ].Rebin( rebinX )
-			if bkgFiles[ bkgSamples ][1] != 1: bkgHistos[ bkgSamples ].Scale( bkgFiles[ bkgSamples ][1] ) 
+			bkgHistos[ bkgSamples ] = getHisto( bkgFiles[ bkgSamples ][0], nameInRoot+'_'+bkgSamples, rebinX, bkgFiles[ bkgSamples ][1] )
 			legend.AddEntry( bkgHistos[ bkgSamples ], bkgFiles[ bkgSamples ][2], 'l' if Norm else 'f' )
 			if Norm:
 				bkgHistos[ bkgSamples ].SetLineColor( bkgFiles[ bkgSamples ][3] )
@@ -171,7 +182,7 @@ def plotSignalBkg( signalFiles, bkgFiles, Groom, nameInRoot, name, xmin, xmax, r
 		if xmax: hSignal.GetXaxis().SetRangeUser( xmin, xmax )
 		hSignal.Draw("hist")
 
-		can.SaveAs( 'Plots/'+outputFileName )
+		savePlot( can, 'Plots/'+outputFileName )
 		del can
 
 	else:
@@ -194,7 +205,7 @@ def plotSignalBkg( signalFiles, bkgFiles, Groom, nameInRoot, name, xmin, xmax, r
 		if not (labX and labY): labels( '', PU, camp )
 		else: labels( '', PU, camp, labX, labY )
 
-		can.SaveAs( 'Plots/'+outputFileName )
+		savePlot( can, 'Plots/'+outputFileName )
 		del can
 
 def plot2DSignalBkg( bkgFiles, Groom, nameInRoot, name, titleXAxis, titleXAxis2, Xmin, Xmax, rebinx, Ymin, Ymax, rebiny, legX, legY, PU, version ):
@@ -208,9 +219,7 @@ def plot2DSignalBkg( bkgFiles, Groom, nameInRoot, name, titleXAxis, titleXAxis2,
 	if len(bkgFiles) > 0:
 		for bkgSamples in bkgFiles:
 			tmpText = bkgSamples
-			bkgHistos[ bkgSamples ] =  bkgFiles[ bkgSamples ][0].Get( nameInRoot+'_'+bkgSamples+'_Bkg' )
-			bkgHistos[ bkgSamples ] = Rebin2D( bkgHistos[ bkgSamples ], rebinx, rebiny )
-			if bkgFiles[ bkgSamples ][1] != 1: bkgHistos[ bkgSamples ].Scale( bkgFiles[ bkgSamples ][1] ) 
+			bkgHistos[ bkgSamples ] = getHisto( bkgFiles[ bkgSamples ][0], nameInRoot+'_'+bkgSamples+'_Bkg', ( rebinx, rebiny ), bkgFiles[ bkgSamples ][1], rebinned2D )
 
 	CMS_lumi.extraText = "Preliminary Simulation"
 	if 'QCD' in tmpText: 
@@ -238,80 +247,20 @@ def plot2DSignalBkg( bkgFiles, Groom, nameInRoot, name, titleXAxis, titleXAxis2,
 	if not (legX and legY): labels( name, PU, camp )
 	else: labels( name, PU, camp, legX, legY )
 
-	can.SaveAs( 'Plots/'+outputFileName )
+	savePlot( can, 'Plots/'+outputFileName )
 	#can.SaveAs( 'Plots/'+outputFileName.replace(''+ext, 'gif') )
 	del can
 
-def Rebin2D( h1, rebinx, rebiny ):
-	"""docstring for Rebin2D"""
-
-	tmph1 = h1.Clone()
-	nbinsx = h1.GetXaxis().GetNbins()
-	nbinsy = h1.GetYaxis().GetNbins()
-	xmin  = h1.GetXaxis().GetXmin()
-	xmax  = h1.GetXaxis().GetXmax()
-	ymin  = h1.GetYaxis().GetXmin()
-	ymax  = h1.GetYaxis().GetXmax()
-	nx = nbinsx/rebinx
-	ny = nbinsy/rebiny
-	h1.SetBins( nx, xmin, xmax, ny, ymin, ymax )
-
-	for biny in range( 1, nbinsy):
-		for binx in range(1, nbinsx):
-			ibin1 = h1.GetBin(binx,biny)
-			h1.SetBinContent( ibin1, 0 )
-		
-	for biny in range( 1, nbinsy):
-		by = tmph1.GetYaxis().GetBinCenter( biny )
-		iy = h1.GetYaxis().FindBin(by)
-		for binx in range(1, nbinsx):
-			bx = tmph1.GetXaxis().GetBinCenter(binx)
-			ix  = h1.GetXaxis().FindBin(bx)
-			bin = tmph1.GetBin(binx,biny)
-			ibin= h1.GetBin(ix,iy)
-			cu  = tmph1.GetBinContent(bin)
-			h1.AddBinContent(ibin,cu)
-	return h1
-
 def plot2D( inFiles, sample, Groom, nameInRoot, name, titleXAxis, titleXAxis2, Xmin, Xmax, rebinx, Ymin, Ymax, rebiny, legX, legY, PU, version ):
 	"""docstring for plot"""
 
 	outputFileName = name+'_'+Groom+'_'+sample+'_'+camp+'_'+PU+'_'+version+'AnalysisPlots.'+ext 
 	print 'Processing.......', outputFileName
 	for samples in inFiles:
-		h1 = inFiles[ samples ][0].Get( nameInRoot )
+		h1 = getHisto( inFiles[ samples ][0], nameInRoot, ( rebinx, rebiny ), inFiles[ samples ][1], rebinned2D )
 	#h1 = inFile.Get( 'AnalysisPlots'+Groom+'/'+name )
 	#h1 = inFile.Get( 'TriggerEfficiency'+Groom+'/'+name )
-	tmph1 = h1.Clone()
-	
-	### Rebinning
-	nbinsx = h1.GetXaxis().GetNbins()
-	nbinsy = h1.GetYaxis().GetNbins()
-	xmin  = h1.GetXaxis().GetXmin()
-	xmax  = h1.GetXaxis().GetXmax()
-	ymin  = h1.GetYaxis().GetXmin()
-	ymax  = h1.GetYaxis().GetXmax()
-	nx = nbinsx/rebinx
-	ny = nbinsy/rebiny
-	h1.SetBins( nx, xmin, xmax, ny, ymin, ymax )
-
-	for biny in range( 1, nbinsy):
-		for binx in range(1, nbinsx):
-			ibin1 = h1.GetBin(binx,biny)
-			h1.SetBinContent( ibin1, 0 )
-		
-	for biny in range( 1, nbinsy):
-		by = tmph1.GetYaxis().GetBinCenter( biny )
-		iy = h1.GetYaxis().FindBin(by)
-		for binx in range(1, nbinsx):
-			bx = tmph1.GetXaxis().GetBinCenter(binx)
-			ix  = h1.GetXaxis().FindBin(bx)
-			bin = tmph1.GetBin(binx,biny)
-			ibin= h1.GetBin(ix,iy)
-			cu  = tmph1.GetBinContent(bin)
-			h1.AddBinContent(ibin,cu)
-
-	h1.Scale( inFiles[ samples ][1] )
+
 	h1.GetXaxis().SetTitle( titleXAxis )
 	h1.GetYaxis().SetTitleOffset( 1.0 )
 	h1.GetYaxis().SetTitle( titleXAxis2 )
@@ -332,7 +281,7 @@ def plot2D( inFiles, sample, Groom, nameInRoot, name, titleXAxis, titleXAxis2, X
 	if not (legX and legY): labels( name, PU, camp )
 	else: labels( name, PU, camp, legX, legY )
 
-	can.SaveAs( 'Plots/'+outputFileName )
+	savePlot( can, 'Plots/'+outputFileName )
 	#can.SaveAs( 'Plots/'+outputFileName.replace(''+ext, 'gif') )
 	del can
 
@@ -346,15 +295,13 @@ def plotCutFlow( signalFiles, bkgFiles, Groom, name, xmax, log, PU, Norm=False )
 	histos = {}
 	if len(signalFiles) > 0:
 		for samples in signalFiles:
-			histos[ samples ] = signalFiles[ samples ][0].Get(name+'_RPVStopStopToJets_'+args.decay+'_M-'+str(mass))
-			if signalFiles[ samples ][1] != 1: histos[ samples ].Scale( signalFiles[ samples ][1] ) 
+			histos[ samples ] = getHisto( signalFiles[ samples ][0], name+'_RPVStopStopToJets_'+args.decay+'_M-'+str(mass), scale=signalFiles[ samples ][1] )
 
 	dummy = 0
 	if len(bkgFiles) > 0:
 		for samples in bkgFiles:
 			dummy += 1
-			histos[ samples ] = bkgFiles[ samples ][0].Get(name+'_'+samples)
-			if bkgFiles[ samples ][1] != 1: histos[ samples ].Scale( bkgFiles[ samples ][1] ) 
+			histos[ samples ] = getHisto( bkgFiles[ samples ][0], name+'_'+samples, scale=bkgFiles[ samples ][1] )
 			if (dummy == 1): hBkg = histos[ samples ].Clone()
 
 	hSignal = histos[ 'Signal' ].Clone()
@@ -522,7 +469,7 @@ def plotCutFlow( signalFiles, bkgFiles, Groom, name, xmax, log, PU, Norm=False )
 	hSB.Sumw2()
 	hSB.Draw("hist")
 
-	can.SaveAs( 'Plots/'+outName )
+	savePlot( can, 'Plots/'+outName )
 	del can
 
 def plotSimple( inFile, sample, Groom, name, xmax, labX, labY, log, PU, Norm=False ):
@@ -562,7 +509,7 @@ def plotSimple( inFile, sample, Groom, name, xmax, labX, labY, log, PU, Norm=Fal
 	legend.Draw()
 	if not (labX and labY): labels( '', sample, PU )
 	else: labels( '', 'MC Truth', PU, labX, labY )
-	can.SaveAs( 'Plots/'+outName )
+	savePlot( can, 'Plots/'+outName )
 	del can
 
 def plotDiffSample( inFileSample1, inFileSample2, sample1, sample2, Groom, name, xmax, labX, labY, log, Diff , Norm=False):
@@ -631,7 +578,7 @@ def plotDiffSample( inFileSample1, inFileSample2, sample1, sample2, Groom, name,
 		hSample1.Sumw2()
 		hSample1.Draw("histe")
 
-		can.SaveAs( 'Plots/'+outName )
+		savePlot( can, 'Plots/'+outName )
 		del can
 	else:
 		histos[ 'Sample1' ].SetLineWidth(2)
@@ -659,7 +606,7 @@ def plotDiffSample( inFileSample1, inFileSample2, sample1, sample2, Groom, name,
 		if not (labX and labY): labels( name, '13 TeV - Scaled to '+lumi+' fb^{-1}', '' )
 		else: labels( name, '13 TeV - Scaled to '+lumi+' fb^{-1}', '', labX, labY )
 
-		can.SaveAs( 'Plots/'+outName )
+		savePlot( can, 'Plots/'+outName )
 		del can
 
 
@@ -670,13 +617,10 @@ def plotQuality( dataFile, bkgFiles, Groom, nameInRoot, name, xmin, xmax, rebinX
 	print 'Processing.......', outputFileName
 
 	histos = {}
-	histos[ 'Data' ] = dataFile.Get( nameInRoot+'_DATA' if 'qual' in process else nameInRoot )
-	if rebinX > 1: histos[ 'Data' ].Rebin( rebinX )
+	histos[ 'Data' ] = getHisto( dataFile, nameInRoot+'_DATA' if 'qual' in process else nameInRoot, rebinX )
 
 	for samples in bkgFiles:
-		histos[ samples ] = bkgFiles[ samples ][0].Get( nameInRoot+'_'+samples if 'qual' in process else nameInRoot )
-		if bkgFiles[ samples ][1] != 1: histos[ samples ].Scale( bkgFiles[ samples ][1] ) 
-		if rebinX > 1: histos[ samples ].Rebin( rebinX )
+		histos[ samples ] = getHisto( bkgFiles[ samples ][0], nameInRoot+'_'+samples if 'qual' in process else nameInRoot, rebinX, bkgFiles[ samples ][1] )
 		if samples in 'QCD'+qcd+'All': hBkg = histos[ 'QCD'+qcd+'All' ].Clone()
 		else: hBkg.Add( histos[ samples ].Clone() )
 
@@ -774,7 +718,7 @@ def plotQuality( dataFile, bkgFiles, Groom, nameInRoot, name, xmin, xmax, rebinX
 	if xmax: hRatio.GetXaxis().SetRangeUser( xmin, xmax )
 	hRatio.Draw('E')
 
-	can.SaveAs( 'Plots/'+ outputFileName )
+	savePlot( can, 'Plots/'+ outputFileName )
 	del can
 
 def plotSystematics( inFileSample, Groom, name, xmin, xmax, rebinX, labX, labY, log, version, proc):
@@ -786,15 +730,9 @@ def plotSystematics( inFileSample, Groom, name, xmin, xmax, rebinX, labX, labY,
 	print 'Processing.......', outputFileName
 
 	histos = {}
-	histos[ 'Nominal' ] = inFileSample[ 'Signal' ][0].Get( version+'AnalysisPlots'+Groom+'/'+name )
-	histos[ 'Nominal' ].Scale( inFileSample[ 'Signal' ][1] )
-	histos[ 'Up' ] = inFileSample[ 'Signal' ][0].Get( version+'AnalysisPlots'+Groom+typeSys+'Up/'+name )
-	histos[ 'Up' ].Scale( inFileSample[ 'Signal' ][1] )
-	histos[ 'Down' ] = inFileSample[ 'Signal' ][0].Get( version+'AnalysisPlots'+Groom+typeSys+'Down/'+name )
-	histos[ 'Down' ].Scale( inFileSample[ 'Signal' ][1] )
-
-	if rebinX > 1: 
-		for k in histos: histos[ k ].Rebin( rebinX )
+	histos[ 'Nominal' ] = getHisto( inFileSample[ 'Signal' ][0], version+'AnalysisPlots'+Groom+'/'+name, rebinX, inFileSample[ 'Signal' ][1] )
+	histos[ 'Up' ] = getHisto( inFileSample[ 'Signal' ][0], version+'AnalysisPlots'+Groom+typeSys+'Up/'+name, rebinX, inFileSample[ 'Signal' ][1] )
+	histos[ 'Down' ] = getHisto( inFileSample[ 'Signal' ][0], version+'AnalysisPlots'+Groom+typeSys+'Down/'+name, rebinX, inFileSample[ 'Signal' ][1] )
 
 	binWidth = histos['Nominal'].GetBinWidth(1)
 
@@ -831,71 +769,21 @@ def plotSystematics( inFileSample, Groom, name, xmin, xmax, rebinX, labX, labY,
 	if not (labX and labY): labels( name, '', '' )
 	else: labels( name, '', '', labX, labY )
 
-	can.SaveAs( 'Plots/'+outputFileName )
+	savePlot( can, 'Plots/'+outputFileName )
 	del can
 
-def listOfCont( histo ):
- 	"""docstring for listOfCont"""
-	tmpListContent = []
-	tmpListError = []
-	for ibin in range( histo.GetNbinsX() ): 
-		tmpListContent.append( histo.GetBinContent( ibin ) )
-		tmpListError.append( histo.GetBinError( ibin ) )
-	return tmpListContent, tmpListError
-
-def BCDHisto( tmpHisto, BList, CList, DList ):
-	"""docstring for BCDHisto"""
-
-	#tmpHisto.Reset()
-	for jbin in range( len( BList ) ):
-		Nominal_Side = BList[ jbin ]
-		Side_Side = CList[ jbin ]
-		Side_Nominal = DList[ jbin ]
-		if Side_Side != 0: 
-			Bkg = Nominal_Side*Side_Nominal/Side_Side
-			#BkgError = TMath.Sqrt( Bkg ) 
-			try: BkgError = Bkg * TMath.Sqrt( TMath.Power(( TMath.Sqrt( Nominal_Side ) / Nominal_Side ), 2) + TMath.Power(( TMath.Sqrt( Side_Nominal ) / Side_Nominal ), 2) + TMath.Power(( TMath.Sqrt( Side_Side ) / Side_Side ), 2) )
-			except ZeroDivisionError: BkgError = 0
-		else: 
-			Bkg = 0
-			BkgError = 0
-		tmpHisto.SetBinContent( jbin, Bkg )
-		tmpHisto.SetBinError( jbin, BkgError )
-	return tmpHisto
-
-def plotBkgEstimation( dataFile, bkgFiles, Groom, nameInRoot, xmin, xmax, rebinX, labX, labY, log, PU, version, Norm=False ):
-	"""docstring for plotBkgEstimation"""
+def plotBkgEstimation( dataFile, bkgFiles, Groom, nameInRoot, xmin, xmax, rebinX, labX, labY, log, PU, version, Norm=False, projectRebinned=False ):
+	"""docstring for plotBkgEstimation. With projectRebinned the data prediction is B*C/D of the rebinned B, C and D instead of the rebinned projection"""
 
 	SRHistos = {}
 	CRHistos = {}
 	for bkgSamples in bkgFiles:
-		SRHistos[ bkgSamples ] = bkgFiles[ bkgSamples ][0].Get( nameInRoot+'_'+bkgSamples+'_A' )
-		CRHistos[ bkgSamples ] = bkgFiles[ bkgSamples ][0].Get( nameInRoot+'_'+bkgSamples+'_ABCDProj' )
-		if rebinX > 1: 
-			SRHistos[ bkgSamples ].Rebin( rebinX )
-			CRHistos[ bkgSamples ].Rebin( rebinX )
-		if bkgFiles[ bkgSamples ][1] != 1: 
-			scale = bkgFiles[ bkgSamples ][1] 
-			SRHistos[ bkgSamples ].Scale( scale ) 
-			CRHistos[ bkgSamples ].Scale( scale )
+		SRHistos[ bkgSamples ] = getHisto( bkgFiles[ bkgSamples ][0], nameInRoot+'_'+bkgSamples+'_A', rebinX, bkgFiles[ bkgSamples ][1] )
+		CRHistos[ bkgSamples ] = getHisto( bkgFiles[ bkgSamples ][0], nameInRoot+'_'+bkgSamples+'_ABCDProj', rebinX, bkgFiles[ bkgSamples ][1] )
 
 	
-	hDataCR =  dataFile.Get( nameInRoot+'_DATA_ABCDProj' )
-	hDataCR.Rebin( rebinX )
-	'''
-	BsideData = dataFile.Get( nameInRoot+'_DATA_B' )
-	CsideData = dataFile.Get( nameInRoot+'_DATA_C' )
-	DsideData = dataFile.Get( nameInRoot+'_DATA_D' )
-	if rebinX > 1: 
-		#hDataCR.Rebin( rebinX )
-		BsideData.Rebin( rebinX )
-		CsideData.Rebin( rebinX )
-		DsideData.Rebin( rebinX )
-	BsideContentData, BsideErrorData  = listOfCont( BsideData )
-	CsideContentData, CsideErrorData  = listOfCont( CsideData )
-	DsideContentData, DsideErrorData  = listOfCont( DsideData )
-	hDataCR = BCDHisto( BsideData, BsideContentData, CsideContentData, DsideContentData ) 
-	'''
+	hDataCR = getHisto( dataFile, nameInRoot+'_DATA_ABCDProj', rebinX )
+	if projectRebinned: hDataCR = projectHistos( getHisto( dataFile, nameInRoot+'_DATA_B' ), getHisto( dataFile, nameInRoot+'_DATA_C' ), getHisto( dataFile, nameInRoot+'_DATA_D' ), hDataCR, rebinX, 'poisson' )
 
 	#hSR = allHistosFile.Get( nameInRoot+'_QCDHTAll_A' )
 	hSR = SRHistos[ 'QCD'+qcd+'All' ].Clone()
@@ -985,7 +873,7 @@ def plotBkgEstimation( dataFile, bkgFiles, Groom, nameInRoot, xmin, xmax, rebinX
 
 	outputFileName = nameInRoot+'_Bkg_'+Groom+'_'+args.RANGE+'_QCD'+qcd+'_bkgShapeEstimation'+version+'Plots.'+ext
 	print 'Processing.......', outputFileName
-	can.SaveAs( 'Plots/'+ outputFileName )
+	savePlot( can, 'Plots/'+ outputFileName )
 	del can
 
 	legend2=TLegend(0.55,0.75,0.90,0.87)
@@ -1035,7 +923,7 @@ def plotBkgEstimation( dataFile, bkgFiles, Groom, nameInRoot, xmin, xmax, rebinX
 
 	outputFileName = nameInRoot+'_DATA_Bkg_'+Groom+'_'+args.RANGE+'_QCD'+qcd+'_bkgShapeEstimation'+version+'Plots.'+ext
 	print 'Processing.......', outputFileName
-	can.SaveAs( 'Plots/'+ outputFileName )
+	savePlot( can, 'Plots/'+ outputFileName )
 	del can
 
 
@@ -1048,19 +936,19 @@ def plot2DBkgEstimation( rootFile, sample, Groom, nameInRoot, titleXAxis, titleX
 	bkgHistos = OrderedDict()
 	if 'QCDHTAll' in sample:
 		for bkgSamples in [ 'QCDHT500to700', 'QCDHT700to1000', 'QCDHT1000to1500', 'QCDHT1500to2000', 'QCDHT2000toInf' ]:
-			bkgHistos[ bkgSamples+'_A' ] = Rebin2D( rootFile.Get( nameInRoot+'_'+bkgSamples+'_A' ), rebinx, rebiny )
-			bkgHistos[ bkgSamples+'_B' ] = Rebin2D( rootFile.Get( nameInRoot+'_'+bkgSamples+'_B' ), rebinx, rebiny )
-			bkgHistos[ bkgSamples+'_C' ] = Rebin2D( rootFile.Get( nameInRoot+'_'+bkgSamples+'_C' ), rebinx, rebiny )
-			bkgHistos[ bkgSamples+'_D' ] = Rebin2D( rootFile.Get( nameInRoot+'_'+bkgSamples+'_D' ), rebinx, rebiny )
+			bkgHistos[ bkgSamples+'_A' ] = getHisto( rootFile, nameInRoot+'_'+bkgSamples+'_A', ( rebinx, rebiny ), 1, rebinned2D )
+			bkgHistos[ bkgSamples+'_B' ] = getHisto( rootFile, nameInRoot+'_'+bkgSamples+'_B', ( rebinx, rebiny ), 1, rebinned2D )
+			bkgHistos[ bkgSamples+'_C' ] = getHisto( rootFile, nameInRoot+'_'+bkgSamples+'_C', ( rebinx, rebiny ), 1, rebinned2D )
+			bkgHistos[ bkgSamples+'_D' ] = getHisto( rootFile, nameInRoot+'_'+bkgSamples+'_D', ( rebinx, rebiny ), 1, rebinned2D )
 
 		hBkg = bkgHistos[ 'QCDHT500to700_B' ].Clone()
 		for samples in bkgHistos:
 			if 'QCDHT500to700_B' not in samples: hBkg.Add( bkgHistos[ samples ].Clone() )
 	else: 
-		if not 'DATA' in sample: bkgHistos[ sample+'_A' ] = Rebin2D( rootFile.Get( nameInRoot+'_'+sample+'_A' ), rebinx, rebiny )
-		bkgHistos[ sample+'_B' ] = Rebin2D( rootFile.Get( nameInRoot+'_'+sample+'_B' ), rebinx, rebiny )
-		bkgHistos[ sample+'_C' ] = Rebin2D( rootFile.Get( nameInRoot+'_'+sample+'_C' ), rebinx, rebiny )
-		bkgHistos[ sample+'_D' ] = Rebin2D( rootFile.Get( nameInRoot+'_'+sample+'_D' ), rebinx, rebiny )
+		if not 'DATA' in sample: bkgHistos[ sample+'_A' ] = getHisto( rootFile, nameInRoot+'_'+sample+'_A', ( rebinx, rebiny ), 1, rebinned2D )
+		bkgHistos[ sample+'_B' ] = getHisto( rootFile, nameInRoot+'_'+sample+'_B', ( rebinx, rebiny ), 1, rebinned2D )
+		bkgHistos[ sample+'_C' ] = getHisto( rootFile, nameInRoot+'_'+sample+'_C', ( rebinx, rebiny ), 1, rebinned2D )
+		bkgHistos[ sample+'_D' ] = getHisto( rootFile, nameInRoot+'_'+sample+'_D', ( rebinx, rebiny ), 1, rebinned2D )
 
 		hBkg = bkgHistos[ sample+'_B' ].Clone()
 		for samples in bkgHistos:
@@ -1090,10 +978,48 @@ def plot2DBkgEstimation( rootFile, sample, Groom, nameInRoot, titleXAxis, titleX
 	CMS_lumi.relPosX = 0.13
 	CMS_lumi.CMS_lumi(can, 4, 0)
 
-	can.SaveAs( 'Plots/'+outputFileName )
+	savePlot( can, 'Plots/'+outputFileName )
 	#can.SaveAs( 'Plots/'+outputFileName.replace(''+ext, 'gif') )
 	del can
 
+def plotABCDClosure( rootFile, sample, Groom, nameInRoot, titleXAxis, titleXAxis2, PU, version ):
+	"""ABCD closure ( A / B*C/D ) for all the cut values of the last two cuts, from the *_Bkg histogram of the sample"""
+
+	outputFileName = nameInRoot+'_'+sample+'_'+Groom+'_'+args.RANGE+'_ABCDClosure'+version+'Plots.'+ext
+	print 'Processing.......', outputFileName
+
+	hBkg = getHisto( rootFile, nameInRoot+'_'+sample+'_Bkg' )
+	cutsX, cutsY, A, sumw2A, prediction, sumw2Prediction = scanBoundaries( hBkg )
+	valid = ( A > 0 ) & ( prediction > 0 )
+	closure = np.where( valid, A / np.where( valid, prediction, 1. ), 0. )
+	closureSumw2 = np.where( valid, closure**2 * ( sumw2A / np.where( valid, A, 1. )**2 + sumw2Prediction / np.where( valid, prediction, 1. )**2 ), 0. )
+
+	#### one bin per cut value, centered on it
+	widthX = hBkg.GetXaxis().GetBinWidth( 1 )
+	widthY = hBkg.GetYaxis().GetBinWidth( 1 )
+	hClosure = TH2F( 'closure_'+nameInRoot+'_'+sample, 'closure_'+nameInRoot+'_'+sample, len(cutsX), cutsX[0]-widthX/2, cutsX[-1]+widthX/2, len(cutsY), cutsY[0]-widthY/2, cutsY[-1]+widthY/2 )
+	fromArrays( hClosure, np.pad( closure, 1, 'constant' ).ravel(), np.pad( closureSumw2, 1, 'constant' ).ravel() )
+	hClosure.GetXaxis().SetTitle( titleXAxis+' cut' )
+	hClosure.GetYaxis().SetTitleOffset( 0.9 )
+	hClosure.GetYaxis().SetTitle( titleXAxis2+' cut' )
+	hClosure.GetZaxis().SetTitle( 'A / (B #times C / D)' )
+
+	if 'DATA' in sample: CMS_lumi.extraText = "Preliminary"
+	else: CMS_lumi.extraText = "Preliminary Simulation"
+	tdrStyle.SetPadRightMargin(0.15)
+	can = TCanvas('c1', 'c1',  750, 500 )
+	gStyle.SetPaintTextFormat("4.2f")
+	hClosure.SetMinimum( 0 )
+	hClosure.SetMaximum( 2 )
+	hClosure.Draw('colz')
+	if len(cutsX)*len(cutsY) < 400: hClosure.Draw('same text')
+
+	CMS_lumi.relPosX = 0.13
+	CMS_lumi.CMS_lumi(can, 4, 0)
+
+	savePlot( can, 'Plots/'+outputFileName )
+	del can
+
 def tmpplotDiffSample( sample1, sample2, Groom, name, xmax, labX, labY, log, Diff , Norm=False):
 	"""docstring for plot"""
 
@@ -1145,7 +1071,7 @@ def tmpplotDiffSample( sample1, sample2, Groom, name, xmax, labX, labY, log, Dif
 	#if not (labX and labY): labels( name, '13 TeV - Scaled to '+lumi+' fb^{-1}', '' )
 	#else: labels( name, '13 TeV - Scaled to '+lumi+' fb^{-1}', '', labX, labY )
 
-	can.SaveAs( 'Plots/'+outputFileName )
+	savePlot( can, 'Plots/'+outputFileName )
 	del can
 
 
@@ -1165,6 +1091,10 @@ if __name__ == '__main__':
 	parser.add_argument('-l', '--lumi', action='store', type=float, default=149.9, help='Luminosity, example: 1.' )
 	parser.add_argument('-r', '--range', action='store', default='low', dest='RANGE', help='Trigger used, example PFHT800.' )
 	parser.add_argument('-e', '--extension', action='store', default='png', help='Extension of plots.' )
+	parser.add_argument('-j', '--jobs', action='store', type=int, default=1, help='Number of processes drawing plots, example: 4.' )
+	parser.add_argument('--force', action='store_true', default=False, help='Draw all the plots, also the ones that did not change.' )
+	parser.add_argument('--dryRun', action='store_true', default=False, help='Only list the plots that would be drawn.' )
+	parser.add_argument('--projectRebinned', action='store_true', default=False, help='Background estimation of data from the rebinned B, C and D instead of the rebinned ABCD projection.' )
 
 	try:
 		args = parser.parse_args()
@@ -1197,29 +1127,29 @@ if __name__ == '__main__':
 		bkgLabel='(w QCD madgraphMLM+pythia8)'
 		QCDSF = 1.05
 
-	if process in [ 'mini', '2Dmini', 'qual', 'bkgEst', '2DbkgEst', 'CF', 'Norm' ]:
-		dataFile = TFile.Open('Rootfiles/RUNMiniBoostedAnalysis_'+args.grooming+'_DATA_'+args.RANGE+'_v03.root')
-		signalFiles[ 'Signal' ] = [ TFile.Open('Rootfiles/RUNMiniBoostedAnalysis_'+args.grooming+'_RPVStopStopToJets_'+args.decay+'_M-'+str(mass)+'_v03.root'), 1, args.decay+' RPV #tilde{t} '+str(mass)+' GeV', kRed-4]
-		bkgFiles[ 'TTJets' ] = [ TFile.Open('Rootfiles/RUNMiniBoostedAnalysis_'+args.grooming+'_TTJets_'+args.RANGE+'_v03.root'),	1, 't #bar{t} + Jets', kGreen ]
+	if process in [ 'mini', '2Dmini', 'qual', 'bkgEst', '2DbkgEst', 'ABCDScan', 'CF', 'Norm' ]:
+		dataFile = 'Rootfiles/RUNMiniBoostedAnalysis_'+args.grooming+'_DATA_'+args.RANGE+'_v03.root'
+		signalFiles[ 'Signal' ] = [ 'Rootfiles/RUNMiniBoostedAnalysis_'+args.grooming+'_RPVStopStopToJets_'+args.decay+'_M-'+str(mass)+'_v03.root', 1, args.decay+' RPV #tilde{t} '+str(mass)+' GeV', kRed-4]
+		bkgFiles[ 'TTJets' ] = [ 'Rootfiles/RUNMiniBoostedAnalysis_'+args.grooming+'_TTJets_'+args.RANGE+'_v03.root',	1, 't #bar{t} + Jets', kGreen ]
 #		bkgFiles[ 'ZJetsToQQ' ] = [ TFile.Open('Rootfiles/RUNMiniResolvedAnalysis_ZJetsToQQ_HT600toInf_13TeV-madgraph_RunIISpring15MiniAODv03-74X_Asympt25ns_v09_v03.root'), 1., 'Z + Jets', kOrange ]
-		bkgFiles[ 'WJetsToQQ' ] = [ TFile.Open('Rootfiles/RUNMiniBoostedAnalysis_'+args.grooming+'_WJetsToQQ_'+args.RANGE+'_v03.root'), 1., 'W + Jets', kMagenta ]
-		bkgFiles[ 'WWTo4Q' ] = [ TFile.Open('Rootfiles/RUNMiniBoostedAnalysis_'+args.grooming+'_WWTo4Q_'+args.RANGE+'_v03.root'), 1 , 'WW (had)', kMagenta+2 ]
-		bkgFiles[ 'ZZTo4Q' ] = [ TFile.Open('Rootfiles/RUNMiniBoostedAnalysis_'+args.grooming+'_ZZTo4Q_'+args.RANGE+'_v03.root'), 1, 'ZZ (had)', kOrange+2 ]
-		bkgFiles[ 'WZ' ] = [ TFile.Open('Rootfiles/RUNMiniBoostedAnalysis_'+args.grooming+'_WZ_'+args.RANGE+'_v03.root'), 1, 'WZ', kCyan ]
-		bkgFiles[ 'QCD'+qcd+'All' ] = [ TFile.Open('Rootfiles/RUNMiniBoostedAnalysis_'+args.grooming+'_QCD'+qcd+'All_'+args.RANGE+'_v03.root'), QCDSF, 'QCD', kBlue-4 ]
+		bkgFiles[ 'WJetsToQQ' ] = [ 'Rootfiles/RUNMiniBoostedAnalysis_'+args.grooming+'_WJetsToQQ_'+args.RANGE+'_v03.root', 1., 'W + Jets', kMagenta ]
+		bkgFiles[ 'WWTo4Q' ] = [ 'Rootfiles/RUNMiniBoostedAnalysis_'+args.grooming+'_WWTo4Q_'+args.RANGE+'_v03.root', 1 , 'WW (had)', kMagenta+2 ]
+		bkgFiles[ 'ZZTo4Q' ] = [ 'Rootfiles/RUNMiniBoostedAnalysis_'+args.grooming+'_ZZTo4Q_'+args.RANGE+'_v03.root', 1, 'ZZ (had)', kOrange+2 ]
+		bkgFiles[ 'WZ' ] = [ 'Rootfiles/RUNMiniBoostedAnalysis_'+args.grooming+'_WZ_'+args.RANGE+'_v03.root', 1, 'WZ', kCyan ]
+		bkgFiles[ 'QCD'+qcd+'All' ] = [ 'Rootfiles/RUNMiniBoostedAnalysis_'+args.grooming+'_QCD'+qcd+'All_'+args.RANGE+'_v03.root', QCDSF, 'QCD', kBlue-4 ]
 		#bkgFiles[ 'QCDPtAll' ] = [ TFile.Open('Rootfiles/RUNMiniBoostedAnalysis_'+args.grooming+'_QCDPtAll_'+args.RANGE+'_v03.root'), QCDSF, 'QCD', kBlue-4 ]
 
 	else:
-		dataFile = TFile.Open('Rootfiles/RUNAnalysis_JetHT_Run2015D-16Dec2015-v1_v76x_v1p0_v03.root')
-		signalFiles[ 'Signal' ] = [ TFile.Open('Rootfiles/RUNAnalysis_RPVStopStopToJets_'+args.decay+'_M-'+str(mass)+'_RunIIFall15MiniAODv2_v76x_v1p0_v03.root'), lumi, args.decay+' RPV #tilde{t} '+str(mass)+' GeV', kRed-4]
+		dataFile = 'Rootfiles/RUNAnalysis_JetHT_Run2015D-16Dec2015-v1_v76x_v1p0_v03.root'
+		signalFiles[ 'Signal' ] = [ 'Rootfiles/RUNAnalysis_RPVStopStopToJets_'+args.decay+'_M-'+str(mass)+'_RunIIFall15MiniAODv2_v76x_v1p0_v03.root', lumi, args.decay+' RPV #tilde{t} '+str(mass)+' GeV', kRed-4]
 		#bkgFiles[ 'QCDHTAll' ] = [ TFile.Open('Rootfiles/RUNAnalysis_QCDHTAll_RunIIFall15MiniAODv2_v76x_v1p0_v03.root'), lumi*1.05, 'QCDHT', kBlue-4 ]
-		bkgFiles[ 'QCD'+qcd+'All' ] = [ TFile.Open('Rootfiles/RUNAnalysis_QCD'+qcd+'All_RunIIFall15MiniAODv2_v76x_v1p0_v03.root'), lumi*QCDSF, 'QCD'+qcd+'', kBlue-4 ]
-		bkgFiles[ 'TTJets' ] = [ TFile.Open('Rootfiles/RUNAnalysis_TTJets_RunIIFall15MiniAODv2_v76x_v1p0_v03.root'),	lumi, 't #bar{t} + Jets', kGreen ]
-		bkgFiles[ 'WJets' ] = [ TFile.Open('Rootfiles/RUNAnalysis_WJetsToQQ_HT-600ToInf_RunIIFall15MiniAODv2_v76x_v1p0_v03.root'), lumi , 'W + Jets', kMagenta ]
-		bkgFiles[ 'WWTo4Q' ] = [ TFile.Open('Rootfiles/RUNAnalysis_WWTo4Q_RunIIFall15MiniAODv2_v76x_v1p0_v03.root'), lumi , 'WW (had)', kMagenta+2 ]
+		bkgFiles[ 'QCD'+qcd+'All' ] = [ 'Rootfiles/RUNAnalysis_QCD'+qcd+'All_RunIIFall15MiniAODv2_v76x_v1p0_v03.root', lumi*QCDSF, 'QCD'+qcd+'', kBlue-4 ]
+		bkgFiles[ 'TTJets' ] = [ 'Rootfiles/RUNAnalysis_TTJets_RunIIFall15MiniAODv2_v76x_v1p0_v03.root',	lumi, 't #bar{t} + Jets', kGreen ]
+		bkgFiles[ 'WJets' ] = [ 'Rootfiles/RUNAnalysis_WJetsToQQ_HT-600ToInf_RunIIFall15MiniAODv2_v76x_v1p0_v03.root', lumi , 'W + Jets', kMagenta ]
+		bkgFiles[ 'WWTo4Q' ] = [ 'Rootfiles/RUNAnalysis_WWTo4Q_RunIIFall15MiniAODv2_v76x_v1p0_v03.root', lumi , 'WW (had)', kMagenta+2 ]
 		#bkgFiles[ 'ZJets' ] = [ TFile.Open('Rootfiles/RUNAnalysis_ZJetsToQQ_HT600toInf_13TeV-madgraph_RunIISpring15MiniAODv2-74X_Asympt25ns_v09_v03.root'), lumi, 'Z + Jets', kOrange ]
-		bkgFiles[ 'ZZTo4Q' ] = [ TFile.Open('Rootfiles/RUNAnalysis_ZZTo4Q_RunIIFall15MiniAODv2_v76x_v1p0_v03.root'), lumi, 'ZZ (had)', kOrange+2 ]
-		bkgFiles[ 'WZ' ] = [ TFile.Open('Rootfiles/RUNAnalysis_WZ_RunIIFall15MiniAODv2_v76x_v1p0_v03.root'), lumi, 'WZ', kCyan ]
+		bkgFiles[ 'ZZTo4Q' ] = [ 'Rootfiles/RUNAnalysis_ZZTo4Q_RunIIFall15MiniAODv2_v76x_v1p0_v03.root', lumi, 'ZZ (had)', kOrange+2 ]
+		bkgFiles[ 'WZ' ] = [ 'Rootfiles/RUNAnalysis_WZ_RunIIFall15MiniAODv2_v76x_v1p0_v03.root', lumi, 'WZ', kCyan ]
 			
 
 	dijetlabX = 0.85
@@ -1405,6 +1335,7 @@ if __name__ == '__main__':
 		[ '2Dmini', 'Boosted', 'deltaEtaDijetVsjet2Tau31', '| #eta_{j1} - #eta_{j2} |', '2nd Leading jet #tau_{31} |', 0, 5, 1, 0, 1, 1, jetMassHTlabX, jetMassHTlabY],
 		[ 'bkgEst', version, 'massAve', 0, massMaxX, 10, '', '', False],
 		[ '2DbkgEst', 'Boosted', 'prunedMassAsymVsdeltaEtaDijet', 'Mass Asymmetry', '| #eta_{j1} - #eta_{j2} |', 0, 1, 1, 0, 5, 1, jetMassHTlabX, jetMassHTlabY],
+		[ 'ABCDScan', 'Boosted', 'prunedMassAsymVsdeltaEtaDijet', 'Mass Asymmetry', '| #eta_{j1} - #eta_{j2} |' ],
 
 		]
 
@@ -1421,58 +1352,71 @@ if __name__ == '__main__':
 	#elif 'NO' in cut: listCuts = [ '_cutNOMassAsym', '_cutTau21_NOMA', '_cutCosTheta_NOMA', '_cutDEta_NOMA' ]
 	else: listCuts = [ cut ]
 
+	#### one job per ( plot, groomer, cut ), the cost is the number of input histograms
+	listJobs = []
 	if 'CF' in process:
-		plotCutFlow( signalFiles, bkgFiles, args.grooming, 'cutflow', 8, True, PU, True )
+		listJobs.append( [ plotCutFlow, ( signalFiles, bkgFiles, args.grooming, 'cutflow', 8, True, PU, True ), len(signalFiles)+len(bkgFiles) ] )
 	elif 'tmp' in process:
-		tmpplotDiffSample( '74X', '76X', '', 'massAve_deltaEtaDijet_TTJets', 500, '', '', False, '74Xvs76X' )
+		listJobs.append( [ tmpplotDiffSample, ( '74X', '76X', '', 'massAve_deltaEtaDijet_TTJets', 500, '', '', False, '74Xvs76X' ), 2 ] )
 
 	for i in Plots:
 		for optGroom in Groommers:
 			if process in '2D': 
-				plot2D( signalFiles, 'RPVSt'+str(mass), optGroom, version+'AnalysisPlots'+Groom+'/'+[0], i[0], i[1], i[2], i[3], i[4], i[5], i[6], i[7], i[8], i[9], i[10], PU, version )
-				plot2D( bkgFiles, 'QCD', optGroom, version+'AnalysisPlots'+Groom+'/'+[0], i[0], i[1], i[2], i[3], i[4], i[5], i[6], i[7], i[8], i[9], i[10], PU, version )
+				listJobs.append( [ plot2D, ( signalFiles, 'RPVSt'+str(mass), optGroom, version+'AnalysisPlots'+Groom+'/'+[0], i[0], i[1], i[2], i[3], i[4], i[5], i[6], i[7], i[8], i[9], i[10], PU, version ), len(signalFiles) ] )
+				listJobs.append( [ plot2D, ( bkgFiles, 'QCD', optGroom, version+'AnalysisPlots'+Groom+'/'+[0], i[0], i[1], i[2], i[3], i[4], i[5], i[6], i[7], i[8], i[9], i[10], PU, version ), len(bkgFiles) ] )
 				#plot2D( inputFileTTJets, 'TTJets', optGroom, i[0], i[1], i[2], i[3], i[4], i[5], i[6], i[7], i[8], i[9], i[10], PU, version )
 				#plot2D( inputFileWJetsToQQ, 'WJets', optGroom, i[0], i[1], i[2], i[3], i[4], i[5], i[6], i[7], i[8], i[9], i[10], PU, version )
 				#plot2D( inputFileZJetsToQQ, 'ZJets', optGroom, i[0], i[1], i[2], i[3], i[4], i[5], i[6], i[7], i[8], i[9], i[10], PU, version )
 
 			elif '1D' in process:
 				for cut1 in listCuts:
-					plotSignalBkg( signalFiles, bkgFiles, optGroom, version+'AnalysisPlots'+optGroom+'/'+i[0]+cut1, i[0]+cut1, i[1], i[2], i[3], i[4], i[5], i[6], PU, version )
+					listJobs.append( [ plotSignalBkg, ( signalFiles, bkgFiles, optGroom, version+'AnalysisPlots'+optGroom+'/'+i[0]+cut1, i[0]+cut1, i[1], i[2], i[3], i[4], i[5], i[6], PU, version ), len(signalFiles)+len(bkgFiles) ] )
 			
 			elif ( 'jetIDQual' in process ):
 				for cut1 in listCuts:
-					if 'Boosted' in version: plotQuality( dataFile, bkgFiles, optGroom, version+'AnalysisPlots/'+i[0]+cut1, i[0]+cut1, i[1], i[2], i[3], i[4], i[5], i[6], PU, version )
-					else: plotQuality( dataFile, bkgFiles, '', version+'AnalysisPlots/'+i[0]+cut1, i[0]+cut1, i[1], i[2], i[3], i[4], i[5], i[6], PU, version )
+					if 'Boosted' in version: listJobs.append( [ plotQuality, ( dataFile, bkgFiles, optGroom, version+'AnalysisPlots/'+i[0]+cut1, i[0]+cut1, i[1], i[2], i[3], i[4], i[5], i[6], PU, version ), 1+len(bkgFiles) ] )
+					else: listJobs.append( [ plotQuality, ( dataFile, bkgFiles, '', version+'AnalysisPlots/'+i[0]+cut1, i[0]+cut1, i[1], i[2], i[3], i[4], i[5], i[6], PU, version ), 1+len(bkgFiles) ] )
 			elif ( 'qual' in process ):
 				for cut1 in listCuts:
-					if 'Boosted' in version: plotQuality( dataFile, bkgFiles, optGroom, i[0]+cut1, i[0]+cut1, i[1], i[2], i[3], i[4], i[5], i[6], PU, version )
-					else: plotQuality( dataFile, bkgFiles, '', i[0]+cut1, i[0]+cut1, i[1], i[2], i[3], i[4], i[5], i[6], PU, version )
+					if 'Boosted' in version: listJobs.append( [ plotQuality, ( dataFile, bkgFiles, optGroom, i[0]+cut1, i[0]+cut1, i[1], i[2], i[3], i[4], i[5], i[6], PU, version ), 1+len(bkgFiles) ] )
+					else: listJobs.append( [ plotQuality, ( dataFile, bkgFiles, '', i[0]+cut1, i[0]+cut1, i[1], i[2], i[3], i[4], i[5], i[6], PU, version ), 1+len(bkgFiles) ] )
 			
 			elif 'mini' in process:
 				for cut1 in listCuts:
-					if '2D' in process: plot2DSignalBkg( signalFiles, bkgFiles, optGroom, i[0], i[0], i[1], i[2], i[3], i[4], i[5], i[6], i[7], i[8], i[9], i[10], PU, version )
-					else: plotSignalBkg( signalFiles, bkgFiles, optGroom, i[0]+cut1, i[0]+cut1, i[1], i[2], i[3], i[4], i[5], i[6], PU, version )
+					if '2D' in process: listJobs.append( [ plot2DSignalBkg, ( signalFiles, bkgFiles, optGroom, i[0], i[0], i[1], i[2], i[3], i[4], i[5], i[6], i[7], i[8], i[9], i[10], PU, version ), len(bkgFiles) ] )
+					else: listJobs.append( [ plotSignalBkg, ( signalFiles, bkgFiles, optGroom, i[0]+cut1, i[0]+cut1, i[1], i[2], i[3], i[4], i[5], i[6], PU, version ), len(signalFiles)+len(bkgFiles) ] )
 			
 			elif 'Norm' in process:
 				for cut1 in listCuts:
 					#plotSignalBkg( signalFiles, bkgFiles, optGroom, version+'AnalysisPlots'+optGroom+'/'+i[0]+cut1, i[0]+cut1, i[1], i[2], i[3], i[4], i[5], i[6], PU, version, True )
-					plotSignalBkg( signalFiles, bkgFiles, optGroom, i[0]+cut1, i[0]+cut1, i[1], i[2], i[3], i[4], i[5], i[6], PU, version, True )
+					listJobs.append( [ plotSignalBkg, ( signalFiles, bkgFiles, optGroom, i[0]+cut1, i[0]+cut1, i[1], i[2], i[3], i[4], i[5], i[6], PU, version, True ), len(signalFiles)+len(bkgFiles) ] )
 
 
 			elif 'simple' in process:
-				plotSimple( inputFileTTJets, 'TTJets', optGroom, i[0], i[1], i[2], i[3], i[4], PU )
-				plotSimple( inputFileWJetsToQQ, 'WJets', optGroom, i[0], i[1], i[2], i[3], i[4], PU )
-				plotSimple( inputFileZJetsToQQ, 'ZJets', optGroom, i[0], i[1], i[2], i[3], i[4], PU )
+				listJobs.append( [ plotSimple, ( inputFileTTJets, 'TTJets', optGroom, i[0], i[1], i[2], i[3], i[4], PU ), 1 ] )
+				listJobs.append( [ plotSimple, ( inputFileWJetsToQQ, 'WJets', optGroom, i[0], i[1], i[2], i[3], i[4], PU ), 1 ] )
+				listJobs.append( [ plotSimple, ( inputFileZJetsToQQ, 'ZJets', optGroom, i[0], i[1], i[2], i[3], i[4], PU ), 1 ] )
 			
 			elif 'sys' in process:
-				for cut in listCuts: plotSystematics( signalFiles, optGroom, i[0]+cut, i[1], i[2], i[3], i[4], i[5], i[6], version, process )
+				for cut in listCuts: listJobs.append( [ plotSystematics, ( signalFiles, optGroom, i[0]+cut, i[1], i[2], i[3], i[4], i[5], i[6], version, process ), 3 ] )
 			
+			elif 'ABCDScan' in process:
+				for bkg in bkgFiles: listJobs.append( [ plotABCDClosure, ( bkgFiles[ bkg ][0], bkg, optGroom, i[0], i[1], i[2], PU, version ), 1 ] )
+				listJobs.append( [ plotABCDClosure, ( dataFile, 'DATA', optGroom, i[0], i[1], i[2], PU, version ), 1 ] )
+
 			elif 'bkgEst' in process:
 				if '2D' in process: 
-					for bkg in bkgFiles: plot2DBkgEstimation( bkgFiles[ bkg ][0], bkg, optGroom, i[0], i[1], i[2], i[3], i[4], i[5], i[6], i[7], i[8], i[9], i[10], PU, version )
-					for bkg in signalFiles: plot2DBkgEstimation( signalFiles[ bkg ][0], bkg, optGroom, i[0], i[1], i[2], i[3], i[4], i[5], i[6], i[7], i[8], i[9], i[10], PU, version )
+					for bkg in bkgFiles: listJobs.append( [ plot2DBkgEstimation, ( bkgFiles[ bkg ][0], bkg, optGroom, i[0], i[1], i[2], i[3], i[4], i[5], i[6], i[7], i[8], i[9], i[10], PU, version ), ( 20 if 'QCDHTAll' in bkg else 4 ) ] )
+					for bkg in signalFiles: listJobs.append( [ plot2DBkgEstimation, ( signalFiles[ bkg ][0], bkg, optGroom, i[0], i[1], i[2], i[3], i[4], i[5], i[6], i[7], i[8], i[9], i[10], PU, version ), 4 ] )
 					#plot2DBkgEstimation( dataFile, 'DATA', optGroom, i[0], i[1], i[2], i[3], i[4], i[5], i[6], i[7], i[8], i[9], i[10], PU, version )
 				else: 
 					tmpListCuts = selection[ 'RPVStopStopToJets_'+args.decay+'_M-'+str(mass) ][-2:]
 					nameVarABCD = i[0]+'_'+tmpListCuts[0][0]+'Vs'+tmpListCuts[1][0]
-					plotBkgEstimation( dataFile, bkgFiles, optGroom, nameVarABCD, i[1], i[2], i[3], i[4], i[5], i[6], PU, version )
+					listJobs.append( [ plotBkgEstimation, ( dataFile, bkgFiles, optGroom, nameVarABCD, i[1], i[2], i[3], i[4], i[5], i[6], PU, version, False, args.projectRebinned ), 1+2*len(bkgFiles) ] )
+
+	#### plots whose inputs, options and script did not change since the last run are skipped
+	if not os.path.exists( 'Plots' ): os.makedirs( 'Plots' )
+	#### the plots also read options from globals: all the options but the ones that only control the run are part of the version
+	plotOptions = repr( [ ( k, v ) for k, v in sorted( vars( args ).items() ) if k not in [ 'jobs', 'force', 'dryRun' ] ] )
+	failedJobs = runPlotJobs( listJobs, args.jobs, setupStyle, [ CMS_lumi ], 'Plots/.plotManifest.json', scriptVersion( [ __file__ ] + sourceFiles( labels, SF, getHisto, fromArrays, scanBoundaries, runPlotJobs, savePlot, CMS_lumi, tdrstyle ) )+plotOptions, args.force, args.dryRun )
+	if failedJobs: sys.exit(1)
@@ -16,19 +16,26 @@ from array import array
 try: 
 	from RUNA.RUNAnalysis.commonFunctions import *
 	from RUNA.RUNAnalysis.cuts import selection
+	from RUNA.RUNAnalysis.cutMasks import *
+	from RUNA.RUNAnalysis.histoStore import HistoStore
+	from RUNA.RUNAnalysis.skimCache import skimColumns, loadSkim
+	from RUNA.RUNAnalysis.abcdMethod import projectHistos
 	from RUNA.RUNAnalysis.scaleFactors import scaleFactor
 except ImportError: 
 	sys.path.append('../python') 
 	from commonFunctions import *
 	from cuts import selection
+	from cutMasks import *
+	from histoStore import HistoStore
+	from skimCache import skimColumns, loadSkim
+	from abcdMethod import projectHistos
 	from scaleFactors import scaleFactor
 
 gROOT.SetBatch()
 ######################################
 def myAnalyzer( dictSamples, listCuts, signalName, RANGE ):
 
-	if (( len(dictSamples) == 1 ) and ( signalName not in ['RPVStopStopToJets_'+args.decay+'_M-'+str(mass)] )): outputFileName = 'Rootfiles/RUNMiniBoostedAnalysis_'+grooming+'_'+signalName+'_'+RANGE+'_v03p1.root' 
-	else: outputFileName = 'Rootfiles/RUNMiniBoostedAnalysis_'+grooming+'_'+signalName+'_v03p1.root' 
+	outputFileName = getOutputName( dictSamples, signalName, str(mass), RANGE )
 	outputFile = TFile( outputFileName, 'RECREATE' )
 
 	###################################### output Tree
@@ -38,295 +45,408 @@ def myAnalyzer( dictSamples, listCuts, signalName, RANGE ):
 	#Scale = array( 'f', [ 0. ] )
 	#tree.Branch( 'Scale', Scale, 'Scale/F' )
 
+	store = HistoStore()
+	bookHistos( allHistos, store, dictSamples, listCuts )
+	#print allHistos
+
+	################################################################################################## Running the Analysis
+	for sample in dictSamples:
+
+		inputFile, events, numEntries = getTree( dictSamples[ sample ], ('BoostedAnalysisPlotsPuppi/RUNATree' if 'Puppi' in args.grooming else 'BoostedAnalysisPlots/RUNATree' ), branches=[], cacheSize=0 )
+		inputFile.Close()
+		#### the preselection cache is created here once, the chunks only read it
+		if args.skimCache: skimColumns( dictSamples[ sample ], treeName(), columnarBranches( listCuts ), *skimWeight )
+		listTasks = [ ( sample, dictSamples[ sample ], listCuts, start, stop ) for start, stop in entryRanges( numEntries, args.chunkSize ) ]
+		cutFlowList = None
+		#### chunks are merged in entry order, the result does not depend on the number of workers
+		for tmpStore, tmpCutFlow in runChunks( processChunk, listTasks, args.workers ):
+			store.merge( tmpStore )
+			cutFlowList = addCutFlow( cutFlowList, tmpCutFlow )
+		fillCutFlow( allHistos, store, sample, cutFlowList )
+
+	#### TH1F/TH2F are only created now, in the output file
+	outputFile.cd()
+	rootHistos = store.toROOT()
+	for sample in dictSamples: projectABCD( rootHistos, sample, listCuts )
+
+	outputFile.Write()
+	##### Closing
+	print 'Writing output file: '+ outputFileName
+	outputFile.Close()
+
+
+def multiMassAnalyzer( dictSamples, massPoints ):
+	"""Columnar analysis of several mass points: each input file is read only once and the cut lists of all the mass points are applied to it.
+	massPoints[ massPoint ] = [ listCuts, signalName, RANGE, listSamples ]"""
+
+	listHistos = OrderedDict()
+	listStores = OrderedDict()
+	listOutputFiles = OrderedDict()
+	for massPoint in massPoints:
+		listCuts, signalName, RANGE, listSamples = massPoints[ massPoint ]
+		outputFileName = getOutputName( listSamples, signalName, massPoint, RANGE )
+		listOutputFiles[ massPoint ] = [ TFile( outputFileName, 'RECREATE' ), outputFileName ]
+		listHistos[ massPoint ] = {}
+		listStores[ massPoint ] = HistoStore()
+		bookHistos( listHistos[ massPoint ], listStores[ massPoint ], OrderedDict( ( sam, dictSamples[ sam ] ) for sam in listSamples ), listCuts )
+
+	for sample in dictSamples:
+		usedBy = [ massPoint for massPoint in massPoints if sample in massPoints[ massPoint ][3] ]
+		if len(usedBy) == 0: continue
+		branches = []
+		for massPoint in usedBy: branches += [ b for b in columnarBranches( massPoints[ massPoint ][0] ) if b not in branches ]
+
+		inputFile, events, numEntries = getTree( dictSamples[ sample ], ('BoostedAnalysisPlotsPuppi/RUNATree' if 'Puppi' in args.grooming else 'BoostedAnalysisPlots/RUNATree' ), branches=[], cacheSize=0 )
+		inputFile.Close()
+		if args.skimCache: skimColumns( dictSamples[ sample ], treeName(), branches, *skimWeight )
+		print '-'*40
+		print '------> ', sample, 'for mass points', ', '.join( usedBy )
+		print '------> Number of events: '+str(numEntries)
+
+		listTasks = [ ( sample, dictSamples[ sample ], [ ( massPoint, massPoints[ massPoint ][0] ) for massPoint in usedBy ], branches, start, stop ) for start, stop in entryRanges( numEntries, args.chunkSize ) ]
+		listCutFlows = OrderedDict( ( massPoint, None ) for massPoint in usedBy )
+		for tmpResults in runChunks( processMultiMassChunk, listTasks, args.workers ):
+			for massPoint in tmpResults:
+				listStores[ massPoint ].merge( tmpResults[ massPoint ][0] )
+				listCutFlows[ massPoint ] = addCutFlow( listCutFlows[ massPoint ], tmpResults[ massPoint ][1] )
+
+		for massPoint in usedBy: fillCutFlow( listHistos[ massPoint ], listStores[ massPoint ], sample, listCutFlows[ massPoint ] )
+
+	for massPoint in massPoints:
+		outputFile, outputFileName = listOutputFiles[ massPoint ]
+		outputFile.cd()
+		rootHistos = listStores[ massPoint ].toROOT()
+		for sample in massPoints[ massPoint ][3]: projectABCD( rootHistos, sample, massPoints[ massPoint ][0] )
+		outputFile.Write()
+		print 'Writing output file: '+ outputFileName
+		outputFile.Close()
+
+
+def processChunk( task ):
+	"""Histograms (in a new HistoStore) and cut flow of the entries [start, stop) of one sample, runs in the worker processes"""
+
+	sample, fileName, listCuts, start, stop = task
+	chunkHistos = {}
+	store = HistoStore()
+	bookHistos( chunkHistos, store, [ sample ], listCuts )
+	if args.columnar or args.skimCache: cutFlowList = columnarLoop( chunkHistos, store, sample, fileName, listCuts, start, stop )
+	else: cutFlowList = eventLoop( chunkHistos, store, sample, fileName, listCuts, start, stop )
+	store.flush()
+	return store, cutFlowList
+
+
+def processMultiMassChunk( task ):
+	"""Same as processChunk for several cut lists, the entries are read once. Returns [ store, cut flow ] by mass point"""
+
+	sample, fileName, listMassCuts, branches, start, stop = task
+	allEvents, processScale = readEvents( fileName, branches, start, stop )
+
+	results = OrderedDict()
+	for massPoint, listCuts in listMassCuts:
+		chunkHistos = {}
+		store = HistoStore()
+		bookHistos( chunkHistos, store, [ sample ], listCuts )
+		results[ massPoint ] = [ store, columnarFill( chunkHistos, store, sample, allEvents, listCuts, processScale ) ]
+	return results
+
+
+def addCutFlow( cutFlowList, tmpCutFlow ):
+	"""Add the cut flow of the next chunk, None is the empty cut flow"""
+
+	if cutFlowList is None: return tmpCutFlow
+	for k in tmpCutFlow: cutFlowList[ k ] += tmpCutFlow[ k ]
+	return cutFlowList
+
+
+def getOutputName( dictSamples, signalName, massPoint, RANGE ):
+	"""Name of the output file"""
+
+	if (( len(dictSamples) == 1 ) and ( signalName not in ['RPVStopStopToJets_'+args.decay+'_M-'+massPoint] )): outputFileName = 'Rootfiles/RUNMiniBoostedAnalysis_'+grooming+'_'+signalName+'_'+RANGE+'_v03p1.root' 
+	else: outputFileName = 'Rootfiles/RUNMiniBoostedAnalysis_'+grooming+'_'+signalName+'_v03p1.root' 
+	return outputFileName
+
+
+def getRange( massPoint ):
+	"""Same low/high split as in RUNCreateCards"""
+	try: return ( 'low' if float( massPoint ) < 150 else 'high' )
+	except ValueError: return 'low'
+
+
+def bookHistos( allHistos, store, dictSamples, listCuts ):
+	"""Book the histograms of one cut list in store, allHistos keeps the handles by name"""
 
 	################################################################################################## Histos
 	massBins = 500
 	massXmin = 0.
 	massXmax = 500.
-	listOfOptions = [ [ j,k] for j in range(len(listCuts)-1) for k in range(1, len(listCuts) ) if k > j ]
+	listOfOptions = cutPairs( listCuts )
+	cutVars = [ var[0] for var in listCuts ]
 
 	for sam in dictSamples:
-		allHistos[ "cutFlow_"+sam ] = TH1F( "cutflow_"+sam, "cutflow_"+sam, len(listCuts), 0., len(listCuts) )
-		allHistos[ "HT_"+sam ] = TH1F( "HT_"+sam, "HT_"+sam, 5000, 0., 5000 )
-		allHistos[ "HT_"+sam ].Sumw2()
-		allHistos[ "MET_"+sam ] = TH1F( "MET_"+sam, "MET_"+sam, 500, 0., 500 )
-		allHistos[ "MET_"+sam ].Sumw2()
-		allHistos[ "massAve_"+sam ] = TH1F( "massAve_"+sam, "massAve_"+sam, 500, 0., 500 )
-		allHistos[ "massAve_"+sam ].Sumw2()
-		allHistos[ "numJets_"+sam ] = TH1F( "numJets_"+sam, "numJets_"+sam, 20, 0., 20 )
-		allHistos[ "numJets_"+sam ].Sumw2()
-		allHistos[ "jet1Pt_"+sam ] = TH1F( "jet1Pt_"+sam, "jet1Pt_"+sam, 2000, 0., 2000 )
-		allHistos[ "jet1Pt_"+sam ].Sumw2()
-		allHistos[ "jet2Pt_"+sam ] = TH1F( "jet2Pt_"+sam, "jet2Pt_"+sam, 2000, 0., 2000 )
-		allHistos[ "jet2Pt_"+sam ].Sumw2()
-		allHistos[ "jet1CosThetaStar_"+sam ] = TH1F( "jet1CosThetaStar_"+sam, "jet1CosThetaStar_"+sam, 20, 0., 1 )
-		allHistos[ "jet1CosThetaStar_"+sam ].Sumw2()
-		allHistos[ "jet2CosThetaStar_"+sam ] = TH1F( "jet2CosThetaStar_"+sam, "jet2CosThetaStar_"+sam, 20, 0., 1 )
-		allHistos[ "jet2CosThetaStar_"+sam ].Sumw2()
-		allHistos[ "jet1Tau32_"+sam ] = TH1F( "jet1Tau32_"+sam, "jet1Tau32_"+sam, 20, 0., 1 )
-		allHistos[ "jet1Tau32_"+sam ].Sumw2()
-		allHistos[ "jet2Tau32_"+sam ] = TH1F( "jet2Tau32_"+sam, "jet2Tau32_"+sam, 20, 0., 1 )
-		allHistos[ "jet2Tau32_"+sam ].Sumw2()
-		if 'high' in args.RANGE:
-			allHistos[ "jet1Tau31_"+sam ] = TH1F( "jet1Tau31_"+sam, "jet1Tau31_"+sam, 20, 0., 1 )
-			allHistos[ "jet1Tau31_"+sam ].Sumw2()
-			allHistos[ "jet2Tau31_"+sam ] = TH1F( "jet2Tau31_"+sam, "jet2Tau31_"+sam, 20, 0., 1 )
-			allHistos[ "jet2Tau31_"+sam ].Sumw2()
-		allHistos[ "jet1SubjetPtRatio_"+sam ] = TH1F( "jet1SubjetPtRatio_"+sam, "jet1SubjetPtRatio_"+sam, 20, 0., 1 )
-		allHistos[ "jet1SubjetPtRatio_"+sam ].Sumw2()
-		allHistos[ "jet2SubjetPtRatio_"+sam ] = TH1F( "jet2SubjetPtRatio_"+sam, "jet2SubjetPtRatio_"+sam, 20, 0., 1 )
-		allHistos[ "jet2SubjetPtRatio_"+sam ].Sumw2()
-		allHistos[ "deltaEtaDijet_n-1_"+sam ] = TH1F( "deltaEtaDijet_n-1_"+sam, "deltaEtaDijet_n-1_"+sam, 50, 0., 5 )
-		allHistos[ "deltaEtaDijet_n-1_"+sam ].Sumw2()
-		allHistos[ "prunedMassAsym_n-1_"+sam ] = TH1F( "prunedMassAsym_n-1_"+sam, "prunedMassAsym_n-1_"+sam, 20, 0., 1 )
-		allHistos[ "prunedMassAsym_n-1_"+sam ].Sumw2()
-		allHistos[ "jet1Tau21_n-1_"+sam ] = TH1F( "jet1Tau21_n-1_"+sam, "jet1Tau21_n-1_"+sam, 20, 0., 1 )
-		allHistos[ "jet1Tau21_n-1_"+sam ].Sumw2()
-		allHistos[ "jet2Tau21_n-1_"+sam ] = TH1F( "jet2Tau21_n-1_"+sam, "jet2Tau21_n-1_"+sam, 20, 0., 1 )
-		allHistos[ "jet2Tau21_n-1_"+sam ].Sumw2()
-		if 'low' in args.RANGE:
-			allHistos[ "jet1Tau31_n-1_"+sam ] = TH1F( "jet1Tau31_n-1_"+sam, "jet1Tau31_n-1_"+sam, 20, 0., 1 )
-			allHistos[ "jet1Tau31_n-1_"+sam ].Sumw2()
-			allHistos[ "jet2Tau31_n-1_"+sam ] = TH1F( "jet2Tau31_n-1_"+sam, "jet2Tau31_n-1_"+sam, 20, 0., 1 )
-			allHistos[ "jet2Tau31_n-1_"+sam ].Sumw2()
+		allHistos[ "cutFlow_"+sam ] = store.book1D( "cutflow_"+sam, "cutflow_"+sam, len(listCuts), 0., len(listCuts), sumw2=False )
+		allHistos[ "HT_"+sam ] = store.book1D( "HT_"+sam, "HT_"+sam, 5000, 0., 5000 )
+		allHistos[ "MET_"+sam ] = store.book1D( "MET_"+sam, "MET_"+sam, 500, 0., 500 )
+		allHistos[ "massAve_"+sam ] = store.book1D( "massAve_"+sam, "massAve_"+sam, 500, 0., 500 )
+		allHistos[ "numJets_"+sam ] = store.book1D( "numJets_"+sam, "numJets_"+sam, 20, 0., 20 )
+		allHistos[ "jet1Pt_"+sam ] = store.book1D( "jet1Pt_"+sam, "jet1Pt_"+sam, 2000, 0., 2000 )
+		allHistos[ "jet2Pt_"+sam ] = store.book1D( "jet2Pt_"+sam, "jet2Pt_"+sam, 2000, 0., 2000 )
+		allHistos[ "jet1CosThetaStar_"+sam ] = store.book1D( "jet1CosThetaStar_"+sam, "jet1CosThetaStar_"+sam, 20, 0., 1 )
+		allHistos[ "jet2CosThetaStar_"+sam ] = store.book1D( "jet2CosThetaStar_"+sam, "jet2CosThetaStar_"+sam, 20, 0., 1 )
+		allHistos[ "jet1Tau32_"+sam ] = store.book1D( "jet1Tau32_"+sam, "jet1Tau32_"+sam, 20, 0., 1 )
+		allHistos[ "jet2Tau32_"+sam ] = store.book1D( "jet2Tau32_"+sam, "jet2Tau32_"+sam, 20, 0., 1 )
+		#### variables without a cut, the others are booked below
+		for var in [ 'jet1Tau31', 'jet2Tau31', 'prunedMassAsym', 'deltaEtaDijet' ]:
+			if var in cutVars: continue
+			allHistos[ var+"_"+sam ] = store.book1D( var+"_"+sam, var+"_"+sam, (50 if 'deltaEta' in var else 20 ), 0., (5. if 'deltaEta' in var else 1. ) )
+		allHistos[ "jet1SubjetPtRatio_"+sam ] = store.book1D( "jet1SubjetPtRatio_"+sam, "jet1SubjetPtRatio_"+sam, 20, 0., 1 )
+		allHistos[ "jet2SubjetPtRatio_"+sam ] = store.book1D( "jet2SubjetPtRatio_"+sam, "jet2SubjetPtRatio_"+sam, 20, 0., 1 )
+		for var in cutVars:
+			allHistos[ var+"_n-1_"+sam ] = store.book1D( var+"_n-1_"+sam, var+"_n-1_"+sam, (50 if 'deltaEta' in var else 20 ), 0., (5. if 'deltaEta' in var else 1. ) )
 
 		for var in listCuts:
 			if 'deltaEta' in var[0]: 
-				allHistos[ var[0]+'_'+sam ] = TH1F( var[0]+'_'+sam, var[0]+'_'+sam, 50, 0., 5. )
-				for var1 in listCuts: allHistos[ var[0]+'_'+var1[0]+"_"+sam ] = TH1F( var[0]+'_'+var1[0]+"_"+sam, var[0]+'_'+var1[0]+"_"+sam, 50, 0., 5. )
+				allHistos[ var[0]+'_'+sam ] = store.book1D( var[0]+'_'+sam, var[0]+'_'+sam, 50, 0., 5. )
+				for var1 in listCuts: allHistos[ var[0]+'_'+var1[0]+"_"+sam ] = store.book1D( var[0]+'_'+var1[0]+"_"+sam, var[0]+'_'+var1[0]+"_"+sam, 50, 0., 5., sumw2=False )
 			else: 
-				allHistos[ var[0]+'_'+sam ] = TH1F( var[0]+'_'+sam, var[0]+'_'+sam, 20, 0., 1. )
-				for var1 in listCuts: allHistos[ var[0]+'_'+var1[0]+"_"+sam ] = TH1F( var[0]+'_'+var1[0]+"_"+sam, var[0]+'_'+var1[0]+"_"+sam, 20, 0., 1. )
-			allHistos[ var[0]+'_'+sam ].Sumw2()
-			allHistos[ "massAve_"+var[0]+'_'+sam ] = TH1F( "massAve_"+var[0]+'_'+sam, "massAve_"+var[0]+'_'+sam, massBins, massXmin, massXmax )
-			allHistos[ "massAve_"+var[0]+'_'+sam ].Sumw2()
-
-			allHistos[ "HT_"+var[0]+"_"+sam ] = TH1F( "HT_"+var[0]+"_"+sam, "HT_"+var[0]+"_"+sam, 5000, 0., 5000 )
-			allHistos[ "HT_"+var[0]+"_"+sam ].Sumw2()
-			allHistos[ "MET_"+var[0]+"_"+sam ] = TH1F( "MET_"+var[0]+"_"+sam, "MET_"+var[0]+"_"+sam, 500, 0., 500 )
-			allHistos[ "MET_"+var[0]+"_"+sam ].Sumw2()
-			allHistos[ "numJets_"+var[0]+"_"+sam ] = TH1F( "numJets_"+var[0]+"_"+sam, "numJets_"+var[0]+"_"+sam, 20, 0., 20 )
-			allHistos[ "numJets_"+var[0]+"_"+sam ].Sumw2()
-			allHistos[ "jet1Pt_"+var[0]+"_"+sam ] = TH1F( "jet1Pt_"+var[0]+"_"+sam, "jet1Pt_"+var[0]+"_"+sam, 2000, 0., 2000 )
-			allHistos[ "jet1Pt_"+var[0]+"_"+sam ].Sumw2()
-			allHistos[ "jet2Pt_"+var[0]+"_"+sam ] = TH1F( "jet2Pt_"+var[0]+"_"+sam, "jet2Pt_"+var[0]+"_"+sam, 2000, 0., 2000 )
-			allHistos[ "jet2Pt_"+var[0]+"_"+sam ].Sumw2()
+				allHistos[ var[0]+'_'+sam ] = store.book1D( var[0]+'_'+sam, var[0]+'_'+sam, 20, 0., 1. )
+				for var1 in listCuts: allHistos[ var[0]+'_'+var1[0]+"_"+sam ] = store.book1D( var[0]+'_'+var1[0]+"_"+sam, var[0]+'_'+var1[0]+"_"+sam, 20, 0., 1., sumw2=False )
+			allHistos[ "massAve_"+var[0]+'_'+sam ] = store.book1D( "massAve_"+var[0]+'_'+sam, "massAve_"+var[0]+'_'+sam, massBins, massXmin, massXmax )
+
+			allHistos[ "HT_"+var[0]+"_"+sam ] = store.book1D( "HT_"+var[0]+"_"+sam, "HT_"+var[0]+"_"+sam, 5000, 0., 5000 )
+			allHistos[ "MET_"+var[0]+"_"+sam ] = store.book1D( "MET_"+var[0]+"_"+sam, "MET_"+var[0]+"_"+sam, 500, 0., 500 )
+			allHistos[ "numJets_"+var[0]+"_"+sam ] = store.book1D( "numJets_"+var[0]+"_"+sam, "numJets_"+var[0]+"_"+sam, 20, 0., 20 )
+			allHistos[ "jet1Pt_"+var[0]+"_"+sam ] = store.book1D( "jet1Pt_"+var[0]+"_"+sam, "jet1Pt_"+var[0]+"_"+sam, 2000, 0., 2000 )
+			allHistos[ "jet2Pt_"+var[0]+"_"+sam ] = store.book1D( "jet2Pt_"+var[0]+"_"+sam, "jet2Pt_"+var[0]+"_"+sam, 2000, 0., 2000 )
 
 		for ind in listOfOptions:
 			tmpName = listCuts[ind[0]][0]+'Vs'+listCuts[ind[1]][0]+'_'+sam
-			allHistos[ tmpName ] = TH2F( tmpName, tmpName, 
+			allHistos[ tmpName ] = store.book2D( tmpName, tmpName, 
 					(50 if 'deltaEta' in listCuts[ind[0]][0] else 20 ), 0., (5. if 'deltaEta' in listCuts[ind[0]][0] else 1. ),
 					(50 if 'deltaEta' in listCuts[ind[1]][0] else 20 ), 0., (5. if 'deltaEta' in listCuts[ind[1]][0] else 1. ) 
 					)
-			allHistos[ tmpName ].Sumw2()
 
 		tmpNameSam = listCuts[-2][0]+'Vs'+listCuts[-1][0]+'_'+sam
-		allHistos[ "massAve_"+tmpNameSam+'_ABCDProj' ] = TH1F( "massAve_"+tmpNameSam+'_ABCDProj', "massAve_"+tmpNameSam+'_ABCDProj', massBins, massXmin, massXmax )
-		allHistos[ "massAve_"+tmpNameSam+'_ABCDProj' ].Sumw2()
-		allHistos[ "massAve_"+tmpNameSam+'_BC' ] = TH1F( "massAve_"+tmpNameSam+'_BC', "massAve_"+tmpNameSam+'_BC', massBins, massXmin, massXmax )
-		allHistos[ "massAve_"+tmpNameSam+'_BC' ].Sumw2()
-		allHistos[ tmpNameSam+'_Bkg' ] = TH2F( tmpNameSam+'_Bkg', tmpNameSam+'_Bkg', 
+		allHistos[ "massAve_"+tmpNameSam+'_ABCDProj' ] = store.book1D( "massAve_"+tmpNameSam+'_ABCDProj', "massAve_"+tmpNameSam+'_ABCDProj', massBins, massXmin, massXmax )
+		allHistos[ "massAve_"+tmpNameSam+'_BC' ] = store.book1D( "massAve_"+tmpNameSam+'_BC', "massAve_"+tmpNameSam+'_BC', massBins, massXmin, massXmax )
+		allHistos[ tmpNameSam+'_Bkg' ] = store.book2D( tmpNameSam+'_Bkg', tmpNameSam+'_Bkg', 
 				(50 if 'deltaEta' in listCuts[-2][0] else 20 ), 0., (5. if 'deltaEta' in listCuts[-2][0] else 1. ),
 				(50 if 'deltaEta' in listCuts[-1][0] else 20 ), 0., (5. if 'deltaEta' in listCuts[-1][0] else 1. ) 
 				)
-		allHistos[ tmpNameSam+'_Bkg' ].Sumw2()
 
 		for k in [ 'A', 'B', 'C', 'D' ]:
-			allHistos[ "massAve_"+tmpNameSam+'_'+k ] = TH1F( "massAve_"+tmpNameSam+'_'+k, "massAve_"+tmpNameSam+'_'+k, massBins, massXmin, massXmax )
-			allHistos[ "massAve_"+tmpNameSam+'_'+k ].Sumw2()
-			allHistos[ tmpNameSam+'_'+k ] = TH2F( tmpNameSam+'_'+k, tmpNameSam+'_'+k, 
+			allHistos[ "massAve_"+tmpNameSam+'_'+k ] = store.book1D( "massAve_"+tmpNameSam+'_'+k, "massAve_"+tmpNameSam+'_'+k, massBins, massXmin, massXmax )
+			allHistos[ tmpNameSam+'_'+k ] = store.book2D( tmpNameSam+'_'+k, tmpNameSam+'_'+k, 
 					(50 if 'deltaEta' in listCuts[-2][0] else 20 ), 0., (5. if 'deltaEta' in listCuts[-2][0] else 1. ),
 					(50 if 'deltaEta' in listCuts[-1][0] else 20 ), 0., (5. if 'deltaEta' in listCuts[-1][0] else 1. ) 
 					)
-			allHistos[ tmpNameSam+'_'+k ].Sumw2()
-	#print allHistos
 
-	################################################################################################## Running the Analysis
-	for sample in dictSamples:
+	return allHistos
+
+
+def fillCutFlow( allHistos, store, sample, cutFlowList ):
+	"""Cut flow histogram from the ordered list of yields"""
+
+	dummy = 1
+	for q in cutFlowList: 
+		store.setBinContent( allHistos[ 'cutFlow_'+sample ], dummy, cutFlowList[q] )
+		store.setBinLabel( allHistos[ 'cutFlow_'+sample ], dummy, q )
+		dummy+=1
+
+
+def projectABCD( allHistos, sample, listCuts ):
+	"""Background prediction in region A from B*C/D, errors propagated from the sumw2 of B, C and D ( as TH1::Multiply and TH1::Divide )"""
+
+	nameABCD = 'massAve_'+listCuts[-2][0]+'Vs'+listCuts[-1][0]+'_'+sample
+	projectHistos( allHistos[ nameABCD+'_B' ], allHistos[ nameABCD+'_C' ], allHistos[ nameABCD+'_D' ], allHistos[ nameABCD+'_ABCDProj' ], hBC=allHistos[ nameABCD+'_BC' ] )
+
+
+def eventLoop( allHistos, store, sample, fileName, listCuts, start=0, stop=None ):
+	"""Event by event analysis of one sample, returns the cut flow. Single entries are buffered by the store"""
+
+	massAveName = (args.grooming+"MassAve").replace('Puppi','')
+	listVars = [ var for var in columnarBranches( listCuts ) if var not in [ massAveName, 'puWeight', 'lumiWeight' ] ]
+	listCutFlowMasks = cutFlowMasks( listCuts )
+	bkgMask = maskABCD( listCuts )
+	regions, lastTwoBits = regionsABCD( listCuts )
+	nameABCD = listCuts[-2][0]+'Vs'+listCuts[-1][0]+'_'+sample
+
+	#### histogram handles, resolved once per sample
+	preselHistos = [ ( allHistos[ var+'_'+sample ], var ) for var in [ 'HT', 'MET', 'massAve', 'numJets', 'jet1Pt', 'jet2Pt', 'prunedMassAsym', 'deltaEtaDijet', 'jet1CosThetaStar', 'jet2CosThetaStar', 
+		'jet1Tau21', 'jet2Tau21', 'jet1Tau31', 'jet2Tau31', 'jet1Tau32', 'jet2Tau32', 'jet1SubjetPtRatio', 'jet2SubjetPtRatio' ] ]
+	cutHistos = [ [ ( allHistos[ tmpVar+'_'+var[0]+'_'+sample ], tmpVar ) for tmpVar in [ 'massAve' ] + [ var1[0] for var1 in listCuts ] + [ 'HT', 'MET', 'massAve', 'numJets', 'jet1Pt', 'jet2Pt' ] ] for var in listCuts ]
+	nMinusOneHistos = [ ( mask, allHistos[ var+'_n-1_'+sample ], var ) for var, mask in nMinusOneMasks( listCuts ).items() ]
+	pairHistos = [ ( allHistos[ listCuts[Ind[0]][0]+'Vs'+listCuts[Ind[1]][0]+'_'+sample ], listCuts[Ind[0]][0], listCuts[Ind[1]][0] ) for Ind in cutPairs( listCuts ) ]
+	hBkg = allHistos[ nameABCD+'_Bkg' ]
+	regionHistos = [ ( regions[k], allHistos[ 'massAve_'+nameABCD+'_'+k ], allHistos[ nameABCD+'_'+k ] ) for k in regions ]
+
+	####### Get GenTree 
+	inputFile, events, numEntries = getTree( fileName, ('BoostedAnalysisPlotsPuppi/RUNATree' if 'Puppi' in args.grooming else 'BoostedAnalysisPlots/RUNATree' ), columnarBranches( listCuts ), perfStats=True )
+	if stop is None: stop = numEntries
+	print '-'*40
+	print '------> ', sample
+	print '------> Number of events: '+str(stop-start)+( '' if ( start == 0 and stop == numEntries ) else ' (entries '+str(start)+' to '+str(stop)+')' )
+	d = 0
+	cutFlowList = OrderedDict()
+	cutFlowList[ 'Process' ] = 0
+	cutFlowList[ 'Preselection' ] = 0
+	for k in listCuts: cutFlowList[ k[0] ] = 0
+
+	for i in xrange(start, stop):
+		events.GetEntry(i)
+
+		#---- progress of the reading --------
+		fraction = 10.*(i-start)/(1.*(stop-start))
+		if TMath.FloorNint(fraction) > d: print str(10*TMath.FloorNint(fraction))+'%' 
+		d = TMath.FloorNint(fraction)
+		#if ( i > 100000 ): break
+
+		puWeight	= events.puWeight
+		lumiWeight	= events.lumiWeight
+		HT		= events.HT
+		numJets		= events.numJets
+
+		if 'DATA' in sample: scale = 1
+		#elif 'RPV' in sample: scale = 2606 * puWeight * SF
+		else: scale = 2606 * puWeight * lumiWeight
+		#else: scale = puWeight 
+		cutFlowList[ 'Process' ] += scale
+
+		#### Pre-selection
+		HTCut = ( HT > 900 )
+		dijetCut =  ( numJets > 1 )
+		
+		if HTCut and dijetCut :
+			cutFlowList[ 'Preselection' ] += scale
+			values = dict( ( var, getattr( events, var ) ) for var in listVars )
+			values[ 'massAve' ] = getattr( events, massAveName )
+			bits = cutBits( events, listCuts )
 
-		####### Get GenTree 
-		inputFile, events, numEntries = getTree( dictSamples[ sample ], ('BoostedAnalysisPlotsPuppi/RUNATree' if 'Puppi' in args.grooming else 'BoostedAnalysisPlots/RUNATree' ) )
-		print '-'*40
-		print '------> ', sample
-		print '------> Number of events: '+str(numEntries)
-		d = 0
-		cutFlowList = OrderedDict()
-		cutFlowList[ 'Process' ] = 0
-		cutFlowList[ 'Preselection' ] = 0
-		for k in listCuts: cutFlowList[ k[0] ] = 0
-
-		for i in xrange(numEntries):
-			events.GetEntry(i)
-
-			#---- progress of the reading --------
-			fraction = 10.*i/(1.*numEntries)
-			if TMath.FloorNint(fraction) > d: print str(10*TMath.FloorNint(fraction))+'%' 
-			d = TMath.FloorNint(fraction)
-			#if ( i > 100000 ): break
-
-			Run      = events.run
-			Lumi     = events.lumi
-			NumEvent = events.event
-			puWeight	= events.puWeight
-			lumiWeight	= events.lumiWeight
-			HT		= events.HT
-			MET		= events.MET
-			numJets		= events.numJets
-			massAve		= getattr( events, (args.grooming+"MassAve").replace('Puppi','') )
-			jet1Pt          = events.jet1Pt
-			jet2Pt          = events.jet2Pt
-			jet1Eta          = events.jet1Eta
-			jet2Eta          = events.jet2Eta
-			jet1CosThetaStar	= events.jet1CosThetaStar
-			jet2CosThetaStar	= events.jet2CosThetaStar
-			#print 'Entry ', Run, ':', Lumi, ':', NumEvent
-
-			if 'DATA' in sample: scale = 1
-			#elif 'RPV' in sample: scale = 2606 * puWeight * SF
-			else: scale = 2606 * puWeight * lumiWeight
-			#else: scale = puWeight 
-			cutFlowList[ 'Process' ] += scale
-
-			#### test
-			#if ( jet1Mass > 400 ) or ( jet2Mass > 400 ): print 'Entry ', Run, ':', Lumi, ':', NumEvent
-			#if ( Lumi != tmpLumi ):
-			#	newLumi += Lumi
-			#	tmpLumi == Lumi
-			#print Run/float(Lumi), Run, Lumi, Run/float(newLumi)
-			
-			
-			#### Pre-selection
-			HTCut = ( HT > 900 )
-			dijetCut =  ( numJets > 1 )
-			jetPtCut =  ( jet1Pt > 500 ) and ( jet2Pt > 450 )
-			
-			#if HTCut and dijetCut and jetPtCut:
-			if HTCut and dijetCut :
-				cutFlowList[ 'Preselection' ] += scale
-				sigCutsList = []
-				allHistos[ "HT_"+sam ].Fill( HT, scale )
-				allHistos[ "MET_"+sam ].Fill( MET, scale )
-				allHistos[ "massAve_"+sam ].Fill( massAve, scale )
-				allHistos[ "numJets_"+sam ].Fill( numJets, scale )
-				allHistos[ "jet1Pt_"+sam ].Fill( jet1Pt, scale )
-				allHistos[ "jet2Pt_"+sam ].Fill( jet2Pt, scale )
-				allHistos[ "prunedMassAsym_"+sam ].Fill( events.prunedMassAsym, scale )
-				allHistos[ "deltaEtaDijet_"+sam ].Fill( events.deltaEtaDijet, scale )
-				allHistos[ "jet1CosThetaStar_"+sam ].Fill( jet1CosThetaStar, scale )
-				allHistos[ "jet2CosThetaStar_"+sam ].Fill( jet2CosThetaStar, scale )
-				allHistos[ "jet1Tau21_"+sam ].Fill( events.jet1Tau21, scale )
-				allHistos[ "jet2Tau21_"+sam ].Fill( events.jet2Tau21, scale )
-				allHistos[ "jet1Tau31_"+sam ].Fill( events.jet1Tau31, scale )
-				allHistos[ "jet2Tau31_"+sam ].Fill( events.jet2Tau31, scale )
-				allHistos[ "jet1Tau32_"+sam ].Fill( events.jet1Tau32, scale )
-				allHistos[ "jet2Tau32_"+sam ].Fill( events.jet2Tau32, scale )
-				allHistos[ "jet1SubjetPtRatio_"+sam ].Fill( events.jet1SubjetPtRatio, scale )
-				allHistos[ "jet2SubjetPtRatio_"+sam ].Fill( events.jet2SubjetPtRatio, scale )
-				for var in listCuts:
-					#allHistos[ var[0]+'_'+sample ].Fill( getattr( events, var[0] ), scale )
-					nextCut = False
-					if ( getattr( events, var[0] ) < var[1] ): nextCut = True 
-					else: nextCut = False
-					sigCutsList.append( nextCut )
-					if all(sigCutsList): 
-						allHistos[ 'massAve_'+var[0]+'_'+sample ].Fill( massAve, scale )
-						allHistos[ 'jet1Tau21_'+var[0]+'_'+sample ].Fill( events.jet1Tau21, scale )
-						allHistos[ 'jet2Tau21_'+var[0]+'_'+sample ].Fill( events.jet2Tau21, scale )
-						if 'low' in args.RANGE: allHistos[ 'jet1Tau31_'+var[0]+'_'+sample ].Fill( events.jet1Tau31, scale )
-						if 'low' in args.RANGE: allHistos[ 'jet2Tau31_'+var[0]+'_'+sample ].Fill( events.jet2Tau31, scale )
-						allHistos[ 'prunedMassAsym_'+var[0]+'_'+sample ].Fill( events.prunedMassAsym, scale )
-						allHistos[ 'deltaEtaDijet_'+var[0]+'_'+sample ].Fill( events.deltaEtaDijet, scale )
-						allHistos[ "HT_"+var[0]+"_"+sam ].Fill( HT, scale )
-						allHistos[ "MET_"+var[0]+"_"+sam ].Fill( MET, scale )
-						allHistos[ "massAve_"+var[0]+"_"+sam ].Fill( massAve, scale )
-						allHistos[ "numJets_"+var[0]+"_"+sam ].Fill( numJets, scale )
-						allHistos[ "jet1Pt_"+var[0]+"_"+sam ].Fill( jet1Pt, scale )
-						allHistos[ "jet2Pt_"+var[0]+"_"+sam ].Fill( jet2Pt, scale )
-						cutFlowList[ var[0] ] += scale
-				#### n-1 plots
-				if ( 'low' in args.RANGE ):
-					if ( getattr( events, listCuts[0][0] ) < listCuts[0][1] ) and (  getattr( events, listCuts[1][0] ) < listCuts[1][1] ) and ( getattr( events, listCuts[2][0] ) < listCuts[2][1] ) and ( getattr( events, listCuts[3][0] ) < listCuts[3][1] ) and ( getattr( events, listCuts[4][0] ) < listCuts[4][1] ): allHistos[ 'deltaEtaDijet_n-1_'+sample ].Fill( events.deltaEtaDijet, scale )
-					if ( getattr( events, listCuts[0][0] ) < listCuts[0][1] ) and (  getattr( events, listCuts[1][0] ) < listCuts[1][1] ) and ( getattr( events, listCuts[2][0] ) < listCuts[2][1] ) and ( getattr( events, listCuts[3][0] ) < listCuts[3][1] ) and ( getattr( events, listCuts[5][0] ) < listCuts[5][1] ): allHistos[ 'prunedMassAsym_n-1_'+sample ].Fill( events.prunedMassAsym, scale )
-					if ( getattr( events, listCuts[2][0] ) < listCuts[2][1] ) and ( getattr( events, listCuts[3][0] ) < listCuts[3][1] ) and ( getattr( events, listCuts[4][0] ) < listCuts[4][1] ) and ( getattr( events, listCuts[5][0] ) < listCuts[5][1] ): 
-						allHistos[ 'jet1Tau21_n-1_'+sample ].Fill( events.jet1Tau21, scale )
-						allHistos[ 'jet2Tau21_n-1_'+sample ].Fill( events.jet2Tau21, scale )
-					if ( getattr( events, listCuts[0][0] ) < listCuts[0][1] ) and ( getattr( events, listCuts[1][0] ) < listCuts[1][1] ) and ( getattr( events, listCuts[4][0] ) < listCuts[4][1] ) and ( getattr( events, listCuts[5][0] ) < listCuts[5][1] ): 
-						allHistos[ 'jet1Tau31_n-1_'+sample ].Fill( events.jet1Tau31, scale )
-						allHistos[ 'jet2Tau31_n-1_'+sample ].Fill( events.jet2Tau31, scale )
-				else:
-					if ( getattr( events, listCuts[0][0] ) < listCuts[0][1] ) and (  getattr( events, listCuts[1][0] ) < listCuts[1][1] ) and ( getattr( events, listCuts[3][0] ) < listCuts[3][1] ): allHistos[ 'prunedMassAsym_n-1_'+sample ].Fill( events.prunedMassAsym, scale )
-					if ( getattr( events, listCuts[0][0] ) < listCuts[0][1] ) and (  getattr( events, listCuts[1][0] ) < listCuts[1][1] ) and ( getattr( events, listCuts[2][0] ) < listCuts[2][1] ): allHistos[ 'deltaEtaDijet_n-1_'+sample ].Fill( events.deltaEtaDijet, scale )
-					if ( getattr( events, listCuts[2][0] ) < listCuts[2][1] ) and ( getattr( events, listCuts[3][0] ) < listCuts[3][1] ): 
-						allHistos[ 'jet1Tau21_n-1_'+sample ].Fill( events.jet1Tau21, scale )
-						allHistos[ 'jet2Tau21_n-1_'+sample ].Fill( events.jet2Tau21, scale )
-
-				##########
-
-				for Ind in listOfOptions:
-					allHistos[ listCuts[Ind[0]][0]+'Vs'+listCuts[Ind[1]][0]+'_'+sample ].Fill( getattr( events, listCuts[Ind[0]][0] ), getattr( events, listCuts[Ind[1]][0] ), scale )
-					tmpSigCutsList = [ x for i,x in enumerate(sigCutsList) if i not in Ind ]
-					
-				##### Bkg estimation/ABCD method
-				if all(sigCutsList[:-2]): 
-					allHistos[ listCuts[-2][0]+'Vs'+listCuts[-1][0]+'_'+sample+'_Bkg' ].Fill( getattr( events, listCuts[0][0] ), getattr( events, listCuts[1][0] ), scale )
-					plotABCD( [ ( getattr( events, listCuts[-2][0] ) < listCuts[-2][1] ), ( getattr( events, listCuts[-1][0] ) < listCuts[-1][1] ) ], [ listCuts[-2][0], listCuts[-1][0] ], events, massAve, scale, sample )
-
-						
-
-		dummy = 1
-		for q in cutFlowList: 
-			allHistos[ 'cutFlow_'+sample ].SetBinContent( dummy, cutFlowList[q] )
-			allHistos[ 'cutFlow_'+sample ].GetXaxis().SetBinLabel( dummy, q )
-			dummy+=1
+			for h, var in preselHistos: store.push( h, values[ var ], scale )
+			for k in range( len(listCuts) ):
+				if passMask( bits, listCutFlowMasks[k] ): 
+					for h, var in cutHistos[k]: store.push( h, values[ var ], scale )
+					cutFlowList[ listCuts[k][0] ] += scale
 
-	for sample in dictSamples:
-		nameABCD = listCuts[-2][0]+'Vs'+listCuts[-1][0]+'_'+sample
-		allHistos[ 'massAve_'+nameABCD+'_BC' ].Multiply( allHistos[ 'massAve_'+nameABCD+'_B' ], allHistos[ 'massAve_'+nameABCD+'_C' ], 1, 1, '')
-		allHistos[ 'massAve_'+nameABCD+'_ABCDProj' ].Divide( allHistos[ 'massAve_'+nameABCD+'_BC' ], allHistos[ 'massAve_'+nameABCD+'_D' ], 1, 1, '')
-		'''
-		### The two lines above are doing exactly the following:
-		for ibin in range( 0, allHistos[ 'massAve_'+nameABCD+'_B' ].GetNbinsX() ):
-			Bcont = allHistos[ 'massAve_'+nameABCD+'_B' ].GetBinContent( ibin )
-			Berr = allHistos[ 'massAve_'+nameABCD+'_B' ].GetBinError( ibin )
-			Ccont = allHistos[ 'massAve_'+nameABCD+'_C' ].GetBinContent( ibin )
-			Cerr = allHistos[ 'massAve_'+nameABCD+'_C' ].GetBinError( ibin )
-			Dcont = allHistos[ 'massAve_'+nameABCD+'_D' ].GetBinContent( ibin )
-			Derr = allHistos[ 'massAve_'+nameABCD+'_D' ].GetBinError( ibin )
-
-			try: Nbkg = ( Bcont * Ccont ) / Dcont
-			except ZeroDivisionError: Nbkg = 0
-			allHistos[ "massAve_"+nameABCD+'_ABCDProj' ].SetBinContent( ibin, Nbkg )
-			#try: NbkgErr = Nbkg * TMath.Sqrt( TMath.Power( Berr / Bcont, 2 ) + TMath.Power( Cerr / Ccont, 2 ) + TMath.Power( Derr / Dcont, 2 ) )
-			try: NbkgErr = Nbkg * TMath.Sqrt( TMath.Power( TMath.Sqrt(Bcont) / Bcont, 2 ) + TMath.Power( TMath.Sqrt(Ccont) / Ccont, 2 ) + TMath.Power( TMath.Sqrt(Dcont) / Dcont, 2 ) )
-			except ZeroDivisionError: NbkgErr = 0
-			allHistos[ "massAve_"+nameABCD+'_ABCDProj' ].SetBinError( ibin, NbkgErr )
-		'''
+			#### n-1 plots
+			for mask, h, var in nMinusOneHistos:
+				if passMask( bits, mask ): store.push( h, values[ var ], scale )
+
+			for h, varX, varY in pairHistos: store.push2D( h, values[ varX ], values[ varY ], scale )
+				
+			##### Bkg estimation/ABCD method
+			if passMask( bits, bkgMask ): 
+				store.push2D( hBkg, values[ listCuts[-2][0] ], values[ listCuts[-1][0] ], scale )
+				for region, hMass, h2D in regionHistos:
+					if ( bits & lastTwoBits ) == region: 
+						store.push( hMass, values[ 'massAve' ], scale )
+						store.push2D( h2D, values[ listCuts[-2][0] ], values[ listCuts[-1][0] ], scale )
+
+	printBytesRead( inputFile, events )
+	inputFile.Close()
+	return cutFlowList
+
+
+def eventScale( sample, allEvents ):
+	"""Weight of each event"""
+	if 'DATA' in sample: return np.ones( len( allEvents['puWeight'] ) )
+	else: return 2606 * allEvents['puWeight'] * allEvents['lumiWeight']
 
+#### weight of all the entries kept in the skim cache, the same product as eventScale for MC
+skimWeight = ( [ 'puWeight', 'lumiWeight' ], 2606 )
+
+
+def columnarBranches( listCuts ):
+	"""Branches needed by columnarFill"""
+
+	listVars = [ 'HT', 'MET', 'numJets', 'jet1Pt', 'jet2Pt', 'jet1CosThetaStar', 'jet2CosThetaStar', 'prunedMassAsym', 'deltaEtaDijet', 
+			'jet1Tau21', 'jet2Tau21', 'jet1Tau31', 'jet2Tau31', 'jet1Tau32', 'jet2Tau32', 'jet1SubjetPtRatio', 'jet2SubjetPtRatio' ]
+	return listVars + [ (args.grooming+"MassAve").replace('Puppi',''), 'puWeight', 'lumiWeight' ] + [ k[0] for k in listCuts if k[0] not in listVars ]
 
-	outputFile.Write()
-	##### Closing
-	print 'Writing output file: '+ outputFileName
-	outputFile.Close()
 
+def treeName(): return ('BoostedAnalysisPlotsPuppi/RUNATree' if 'Puppi' in args.grooming else 'BoostedAnalysisPlots/RUNATree' )
 
-def plotABCD( listSel, var, fromTree, massAve, scale, sample ):
-	"""docstring for plotABCD"""
 
-	nameABCD = var[0]+'Vs'+var[1]+'_'+sample
-	if listSel[0] and listSel[1]: 
-		allHistos[ 'massAve_'+nameABCD+'_A' ].Fill( massAve, scale )
-		allHistos[ nameABCD+'_A' ].Fill( getattr( fromTree, var[0] ), getattr( fromTree, var[1] ), scale )
-	elif listSel[0] and not listSel[1]: 
-		allHistos[ 'massAve_'+nameABCD+'_B' ].Fill( massAve, scale )
-		allHistos[ nameABCD+'_B' ].Fill( getattr( fromTree, var[0] ), getattr( fromTree, var[1] ), scale )
-	elif not listSel[0] and listSel[1]: 
-		allHistos[ 'massAve_'+nameABCD+'_C' ].Fill( massAve, scale )
-		allHistos[ nameABCD+'_C' ].Fill( getattr( fromTree, var[0] ), getattr( fromTree, var[1] ), scale )
-	else:
-		allHistos[ 'massAve_'+nameABCD+'_D' ].Fill( massAve, scale )
-		allHistos[ nameABCD+'_D' ].Fill( getattr( fromTree, var[0] ), getattr( fromTree, var[1] ), scale )
+def readEvents( fileName, branches, start=None, stop=None ):
+	"""Arrays of the entries [start, stop), from the tree or (with --skimCache) only the preselected ones from the cache.
+	Returns them and the MC scale of all the entries for the Process cut flow (None when the arrays have all the entries)"""
 
+	if args.skimCache:
+		skim, processScale = loadSkim( fileName, treeName(), branches, *skimWeight, start=start, stop=stop )
+		return OrderedDict( ( b, skim[ b ] ) for b in branches ), processScale
 
+	inputFile, events, numEntries = getTree( fileName, treeName(), branches, perfStats=True )
+	allEvents = getArrays( events, branches, start=start, stop=stop )
+	printBytesRead( inputFile, events )
+	inputFile.Close()
+	return allEvents, None
+
+
+def columnarLoop( allHistos, store, sample, fileName, listCuts, start=None, stop=None ):
+	"""Same analysis as eventLoop, but branches are read into arrays, cuts are boolean masks and histograms are filled with whole arrays"""
+
+	####### Get GenTree 
+	print '-'*40
+	print '------> ', sample
+	allEvents, processScale = readEvents( fileName, columnarBranches( listCuts ), start, stop )
+	print '------> Number of events: '+str(len(allEvents['HT']) if processScale is None else len(processScale))+( '' if start is None else ' (entries '+str(start)+' to '+str(stop)+')' )
+
+	return columnarFill( allHistos, store, sample, allEvents, listCuts, processScale )
+
+
+def columnarFill( allHistos, store, sample, allEvents, listCuts, processScale=None ):
+	"""Fill the histograms of one sample and one cut list from the arrays of getArrays, returns the cut flow.
+	processScale has the MC scale of all the entries when allEvents are only the preselected ones"""
+
+	massAveName = (args.grooming+"MassAve").replace('Puppi','')
+	branches = columnarBranches( listCuts )
+	cutFlowList = OrderedDict()
+
+	if processScale is None: processScale = eventScale( sample, allEvents )
+	elif 'DATA' in sample: processScale = np.ones( len(processScale) )
+	cutFlowList[ 'Process' ] = sequentialSum( processScale )
+	scale = eventScale( sample, allEvents )
+
+	#### Pre-selection
+	preselection = ( allEvents['HT'] > 900 ) & ( allEvents['numJets'] > 1 )
+	scale = scale[ preselection ]
+	ev = dict( ( b, allEvents[b][ preselection ] ) for b in branches )
+	ev[ 'massAve' ] = ev[ massAveName ]
+	cutFlowList[ 'Preselection' ] = sequentialSum( scale )
+
+	for var in [ 'HT', 'MET', 'massAve', 'numJets', 'jet1Pt', 'jet2Pt', 'prunedMassAsym', 'deltaEtaDijet', 'jet1CosThetaStar', 'jet2CosThetaStar', 
+			'jet1Tau21', 'jet2Tau21', 'jet1Tau31', 'jet2Tau31', 'jet1Tau32', 'jet2Tau32', 'jet1SubjetPtRatio', 'jet2SubjetPtRatio' ]:
+		store.fill( allHistos[ var+'_'+sample ], ev[ var ], scale )
+
+	bits = cutBits( ev, listCuts )
+	for k, mask in enumerate( cutFlowMasks( listCuts ) ):
+		passed = passMask( bits, mask )
+		w = scale[ passed ]
+		for tmpVar in [ var1[0] for var1 in listCuts ] + [ 'HT', 'MET', 'numJets', 'jet1Pt', 'jet2Pt' ]: 
+			store.fill( allHistos[ tmpVar+'_'+listCuts[k][0]+'_'+sample ], ev[ tmpVar ][ passed ], w )
+		#### eventLoop fills massAve_cut twice per event, keep the same filling order
+		store.fill( allHistos[ 'massAve_'+listCuts[k][0]+'_'+sample ], np.repeat( ev[ 'massAve' ][ passed ], 2 ), np.repeat( w, 2 ) )
+		cutFlowList[ listCuts[k][0] ] = sequentialSum( w )
+
+	#### n-1 plots
+	listNMinusOneMasks = nMinusOneMasks( listCuts )
+	for var in listNMinusOneMasks:
+		passed = passMask( bits, listNMinusOneMasks[ var ] )
+		store.fill( allHistos[ var+'_n-1_'+sample ], ev[ var ][ passed ], scale[ passed ] )
+
+	for Ind in cutPairs( listCuts ):
+		store.fill2D( allHistos[ listCuts[Ind[0]][0]+'Vs'+listCuts[Ind[1]][0]+'_'+sample ], ev[ listCuts[Ind[0]][0] ], ev[ listCuts[Ind[1]][0] ], scale )
+
+	##### Bkg estimation/ABCD method
+	bkgRegion = passMask( bits, maskABCD( listCuts ) )
+	nameABCD = listCuts[-2][0]+'Vs'+listCuts[-1][0]+'_'+sample
+	store.fill2D( allHistos[ nameABCD+'_Bkg' ], ev[ listCuts[-2][0] ][ bkgRegion ], ev[ listCuts[-1][0] ][ bkgRegion ], scale[ bkgRegion ] )
+	regions, lastTwoBits = regionsABCD( listCuts )
+	for k in regions:
+		region = bkgRegion & ( ( bits & lastTwoBits ) == regions[k] )
+		store.fill( allHistos[ 'massAve_'+nameABCD+'_'+k ], ev[ 'massAve' ][ region ], scale[ region ] )
+		store.fill2D( allHistos[ nameABCD+'_'+k ], ev[ listCuts[-2][0] ][ region ], ev[ listCuts[-1][0] ][ region ], scale[ region ] )
+
+	return cutFlowList
 
 
 #################################################################################
@@ -335,12 +455,16 @@ if __name__ == '__main__':
 	usage = 'usage: %prog [options]'
 	
 	parser = argparse.ArgumentParser()
-	parser.add_argument( '-m', '--mass', action='store', dest='mass', default=100, help='Mass of the Stop' )
+	parser.add_argument( '-m', '--mass', action='store', dest='mass', default='100', help='Mass of the Stop. A comma separated list or all (all the masses in cuts.py) runs all the mass points in one pass per file (columnar).' )
 	parser.add_argument( '-g', '--grooming', action='store',  dest='grooming', default='pruned', help='Jet Algorithm' )
 	parser.add_argument( '-p', '--process', action='store',  dest='process', default='single', help='Process: all or single.' )
 	parser.add_argument( '-d', '--decay', action='store',  dest='decay', default='UDD312', help='Decay: UDD312 or UDD323.' )
 	parser.add_argument( '-s', '--sample', action='store',   dest='samples', default='RPV', help='Type of sample' )
-	parser.add_argument( '-r', '--range', action='store',  dest='RANGE', default='low', help='Range: low, med, high.' )
+	parser.add_argument( '-r', '--range', action='store',  dest='RANGE', default='low', help='Range: low, med, high or auto (low below 150 GeV).' )
+	parser.add_argument( '--columnar', action='store_true',  dest='columnar', default=False, help='Read branches into arrays and fill histograms with masks instead of the event loop.' )
+	parser.add_argument( '--skimCache', action='store_true',  dest='skimCache', default=False, help='Columnar analysis reading the preselected events from a cache next to each input file, created in the first run.' )
+	parser.add_argument( '-w', '--workers', action='store', type=int, dest='workers', default=1, help='Number of processes, each one runs a chunk of entries.' )
+	parser.add_argument( '--chunkSize', action='store', type=int, dest='chunkSize', default=500000, help='Entries per chunk. Chunks do not depend on the number of workers, so neither does the output.' )
 
 	try:
 		args = parser.parse_args()
@@ -348,7 +472,8 @@ if __name__ == '__main__':
 		parser.print_help()
 		sys.exit(0)
 
-	mass = args.mass
+	listMass = ( [ k.split('_M-')[1] for k in selection if args.decay+'_M-' in k ] if 'all' in str(args.mass) else str(args.mass).split(',') )
+	mass = listMass[0]
 	process = args.process
 	grooming = args.grooming
 	samples = args.samples
@@ -357,7 +482,7 @@ if __name__ == '__main__':
 	allSamples = {}
 	allSamples[ 'DATA' ] = 'Rootfiles/RUNAnalysis_JetHT_Run2015D-16Dec2015-v1_v76x_v1p0_v03.root'
 	#if not 'Dibosons' in mass: allSamples[ 'RPVStopStopToJets_'+args.decay+'_M-'+str(mass) ] = 'Rootfiles/RUNAnalysis_RPVStopStopToJets_'+args.decay+'_M-'+str(mass)+'_RunIIFall15MiniAODv2_v76x_v1p0_v01.root'
-	allSamples[ 'RPVStopStopToJets_'+args.decay+'_M-'+str(mass) ] = 'Rootfiles/RUNAnalysis_RPVStopStopToJets_'+args.decay+'_M-'+str(mass)+'_RunIIFall15MiniAODv2_v76x_v1p0_v03.root'
+	for m in listMass: allSamples[ 'RPVStopStopToJets_'+args.decay+'_M-'+m ] = 'Rootfiles/RUNAnalysis_RPVStopStopToJets_'+args.decay+'_M-'+m+'_RunIIFall15MiniAODv2_v76x_v1p0_v03.root'
 	allSamples[ 'QCDHTAll' ] = 'Rootfiles/RUNAnalysis_QCDHTAll_RunIIFall15MiniAODv2_v76x_v1p0_v03.root'
 	allSamples[ 'QCDPtAll' ] = 'Rootfiles/RUNAnalysis_QCDPtAll_RunIIFall15MiniAODv2_v76x_v1p0_v03.root'
 	allSamples[ 'TTJets' ] = 'Rootfiles/RUNAnalysis_TTJets_RunIIFall15MiniAODv2_v76x_v1p0_v03.root'
@@ -367,22 +492,29 @@ if __name__ == '__main__':
 	allSamples[ 'ZZTo4Q' ] = 'Rootfiles/RUNAnalysis_ZZTo4Q_RunIIFall15MiniAODv2_v76x_v1p0_v03.root'
 	allSamples[ 'WZ' ] = 'Rootfiles/RUNAnalysis_WZ_RunIIFall15MiniAODv2_v76x_v1p0_v03.root'
 
-	cutList = ( 'Dibosons' if 'Dibosons' in mass else 'RPVStopStopToJets_'+args.decay+'_M-'+mass )
-	try: cuts = selection[ cutList ]
-	except KeyError: 
-		print 'Mass', mass, 'not in list.'
-		sys.exit(0)
-		
-	if 'single' in process: 
-		for q in allSamples:
-			if q in samples:
-				dictSamples = { q: allSamples[ q ] } 
-				signalSample = q
-	else: 
-		dictSamples = allSamples
-		signalSample = 'RPVStopStopToJets_'+args.decay+'_M-'+mass+'_All'
+	massPoints = OrderedDict()
+	for m in listMass:
+		cutList = ( 'Dibosons' if 'Dibosons' in m else 'RPVStopStopToJets_'+args.decay+'_M-'+m )
+		try: cuts = selection[ cutList ]
+		except KeyError: 
+			print 'Mass', m, 'not in list.'
+			sys.exit(0)
+		signal = 'RPVStopStopToJets_'+args.decay+'_M-'+m
+			
+		if 'single' in process: 
+			tmpSample = ( signal if 'RPV' in args.samples else samples )
+			listSamples = [ q for q in allSamples if q in tmpSample ]
+			signalSample = ( listSamples[0] if ( 'RPV' in args.samples or len(listMass) == 1 ) else listSamples[0]+'_M-'+m )
+		else: 
+			listSamples = [ q for q in allSamples if not q.startswith('RPV') or ( q == signal ) ]
+			signalSample = signal+'_All'
+		massPoints[ m ] = [ cuts, signalSample, ( getRange( m ) if 'auto' in args.RANGE else args.RANGE ), listSamples ]
 	allHistos = {}
 
-	p = Process( target=myAnalyzer, args=( dictSamples, cuts, signalSample, args.RANGE ) )
+	if len(massPoints) == 1:
+		cuts, signalSample, RANGE, listSamples = massPoints[ mass ]
+		dictSamples = dict( ( q, allSamples[ q ] ) for q in listSamples )
+		p = Process( target=myAnalyzer, args=( dictSamples, cuts, signalSample, RANGE ) )
+	else: p = Process( target=multiMassAnalyzer, args=( allSamples, massPoints ) )
 	p.start()
 	p.join()
@@ -18,10 +18,18 @@ import numpy as np
 try: 
 	import RUNA.RUNAnalysis.tdrstyle as tdrstyle
 	from RUNA.RUNAnalysis.commonFunctions import *
+	from RUNA.RUNAnalysis.histoStore import HistoStore
+	from RUNA.RUNAnalysis.rocCurves import rocPoints
+	from RUNA.RUNAnalysis.cutGrid import gridHistogram, bestCuts, formatSelection
+	from RUNA.RUNAnalysis.columnWriter import ColumnWriter
 except ImportError: 
 	sys.path.append('../python') 
 	import tdrstyle as tdrstyle
 	from commonFunctions import *
+	from histoStore import HistoStore
+	from rocCurves import rocPoints
+	from cutGrid import gridHistogram, bestCuts, formatSelection
+	from columnWriter import ColumnWriter
 
 
 TMVA.Tools.Instance()
@@ -35,117 +43,64 @@ gStyle.SetOptStat(0)
 #----------------------------------------------------------------------
 ### Main Optimization
 def calcROCs( BkgSamples, SigSamples, treename, varList, mass, window, cutsList ):
-	"""docstring for calcROCs"""
+	"""Signal and background histograms of each variable in the mass window after cutsList, and the ROC of each variable and background.
+	The columns of each file are read once, the ROC points come from cumulative sums of the histograms"""
 	
 	outputFile = TFile( 'test.root', "RECREATE" )
 	
+	store = HistoStore()
 	allHistos = {}
 	for var in varList: 
-		allHistos[ var[0]+"_Sig" ] = TH1F( var[0]+"_Sig", var[0]+"_Sig", var[1], var[2], var[3] )
+		allHistos[ var[0]+"_Sig" ] = store.book1D( var[0]+"_Sig", var[0]+"_Sig", var[1], var[2], var[3], sumw2=False )
 		for bkgSample in BkgSamples: 
-			allHistos[ var[0]+'_'+bkgSample ] = TH1F( var[0]+"_"+bkgSample, var[0]+"_"+bkgSample, var[1], var[2], var[3] )
-			allHistos[ var[0]+"_"+bkgSample+"_BkgROC"] = TH1F( var[0]+"_"+bkgSample+"_BkgROC", var[0]+"_"+bkgSample+"_BkgROC; "+var[0], var[1], var[2], var[3] )
-			allHistos[ var[0]+"_"+bkgSample+"_SigROC"] = TH1F( var[0]+"_"+bkgSample+"_SigROC", var[0]+"_"+bkgSample+"_SigROC; "+var[0], var[1], var[2], var[3] )
+			allHistos[ var[0]+'_'+bkgSample ] = store.book1D( var[0]+"_"+bkgSample, var[0]+"_"+bkgSample, var[1], var[2], var[3], sumw2=False )
+			allHistos[ var[0]+"_"+bkgSample+"_BkgROC"] = store.book1D( var[0]+"_"+bkgSample+"_BkgROC", var[0]+"_"+bkgSample+"_BkgROC; "+var[0], var[1], var[2], var[3], sumw2=False )
+			allHistos[ var[0]+"_"+bkgSample+"_SigROC"] = store.book1D( var[0]+"_"+bkgSample+"_SigROC", var[0]+"_"+bkgSample+"_SigROC; "+var[0], var[1], var[2], var[3], sumw2=False )
 
 	signalName = ''
 	for sigSample in SigSamples: 
-		SigFile, sigEvents, sigNumEntries = getTree( SigSamples[ sigSample ], treename )
 		signalName = sigSample
-		d = 0
 		print '-'*40
 		print '---- Signal ', signalName
-		for i in xrange(sigNumEntries):
-			sigEvents.GetEntry(i)
-			#---- progress of the reading --------
-			fraction = 10.*i/(1.*sigNumEntries)
-			if TMath.FloorNint(fraction) > d: print str(10*TMath.FloorNint(fraction))+'%' 
-			d = TMath.FloorNint(fraction)
-			#if i > 1000000: break
-			sigCutsList = []
-			sigMassAve = ( sigEvents.prunedMassAve if 'Boosted' in version else sigEvents.avgMass  )
-			if ( ( sigMassAve > int(mass)-window ) and ( sigMassAve < int(mass)+window  ) ): 
-				if len(cutsList) > 0:
-					for cutVar in cutsList: 
-						if cutVar[4]: sigCutsList.append( True ) if ( getattr( sigEvents, cutVar[0] ) < cutVar[5] ) else sigCutsList.append( False )
-						else: sigCutsList.append( True ) if ( getattr( sigEvents, cutVar[0] ) > cutVar[5] ) else sigCutsList.append( False )
-				if all( sigCutsList ): 
-					for sigVar in varList: allHistos[ sigVar[0]+"_Sig" ].Fill( getattr( sigEvents, sigVar[0] ) )
+		fillROCHistos( allHistos, store, SigSamples[ sigSample ], treename, ( 'prunedMassAve' if 'Boosted' in version else 'avgMass' ), varList, mass, window, cutsList, 'Sig' )
 		
 	allROCs = {}
 	for bkgSample in BkgSamples: 
 		print '-'*40
 		print '---- ', bkgSample
-		BkgFile, bkgEvents, bkgNumEntries = getTree( BkgSamples[ bkgSample ], treename )
-		print '---- ', bkgNumEntries
-		d = 0
-		for i in xrange(bkgNumEntries):
-			bkgEvents.GetEntry(i)
-			#---- progress of the reading --------
-			fraction = 10.*i/(1.*bkgNumEntries)
-			if TMath.FloorNint(fraction) > d: print str(10*TMath.FloorNint(fraction))+'%' 
-			d = TMath.FloorNint(fraction)
-			#if i > 1000000: break
-
-			bkgCutsList = []
-			bkgMassAve = ( bkgEvents.massAve if 'Boosted' in version else bkgEvents.avgMass  )
-			if ( ( bkgMassAve > int(mass)-window ) and ( bkgMassAve < int(mass)+window  ) ): 
-				if len(cutsList) > 0:
-					for cutVar in cutsList: 
-						if cutVar[4]: bkgCutsList.append( True ) if ( getattr( bkgEvents, cutVar[0] ) < cutVar[5] ) else bkgCutsList.append( False )
-						else: bkgCutsList.append( True ) if ( getattr( bkgEvents, cutVar[0] ) > cutVar[5] ) else bkgCutsList.append( False )
-				if all( bkgCutsList ): 
-					for bkgVar in varList: allHistos[ bkgVar[0]+'_'+bkgSample ].Fill( getattr( bkgEvents, bkgVar[0] ) )
+		fillROCHistos( allHistos, store, BkgSamples[ bkgSample ], treename, ( 'massAve' if 'Boosted' in version else 'avgMass' ), varList, mass, window, cutsList, bkgSample )
 
 		for var in varList:
-			BkgHisto = allHistos[ var[0]+"_"+bkgSample ]
-			BkgTotal = BkgHisto.Integral() 
-
-			SigHisto = allHistos[ var[0]+"_Sig" ]
-			SigTotal = SigHisto.Integral() 
-
-			ibinCut = 0
-			#if ( len( var ) > 2 ): ibinCut = SigHisto.GetXaxis().FindBin( var[2] )
-
-			BkgROCValues = []	
-			SigROCValues = []	
-			SigROCBins = []	
-			SigROCLowEdge = []	
-			firstBin =  SigHisto.FindFirstBinAbove( 0, 1 )
-			lastBin =  SigHisto.FindLastBinAbove( 0, 1 )+1 
-			for ibin in range( firstBin, lastBin ):
-				if var[4]:
-					#print ibin, SigHisto.GetXaxis().GetBinLowEdge(ibin), SigHisto.Integral( 0, ibin ), SigHisto.Integral( firstBin, ibin ) #, SigTotal, SigHisto.Integral( 0, ibin+1 ) / SigTotal,  BkgHisto.GetXaxis().GetBinLowEdge(ibin), BkgHisto.Integral( 0, ibin+1 ) , BkgTotal, BkgHisto.Integral( 0, ibin+1 ) / BkgTotal
-					try: effBkg = 1 - BkgHisto.Integral( firstBin, ibin ) / BkgTotal 
-					except ZeroDivisionError: effBkg = 1
-					allHistos[ var[0]+"_"+bkgSample+"_BkgROC" ].SetBinContent( ibin, effBkg )
-					BkgROCValues.append( effBkg )
-
-					try: effSig = SigHisto.Integral( firstBin, ibin ) / SigTotal 
-					except ZeroDivisionError: effSig = 0
-					allHistos[ var[0]+"_"+bkgSample+"_SigROC" ].SetBinContent( ibin, effSig )
-					SigROCValues.append( effSig )
-					SigROCBins.append( ibin )
-					SigROCLowEdge.append( SigHisto.GetXaxis().GetBinLowEdge(ibin+1) )
-
-				else:
-					effBkg = 1 - BkgHisto.Integral( ibin, lastBin ) / BkgTotal 
-					allHistos[ var[0]+"_"+bkgSample+"_BkgROC" ].SetBinContent( ibin, effBkg )
-					BkgROCValues.append( effBkg )
-
-					effSig = SigHisto.Integral( ibin, lastBin ) / SigTotal 
-					allHistos[ var[0]+"_"+bkgSample+"_SigROC" ].SetBinContent( ibin, effSig )
-					SigROCValues.append( effSig )
-					SigROCBins.append( ibin )
-					SigROCLowEdge.append( SigHisto.GetXaxis().GetBinLowEdge(ibin+1) )
-
-			allROCs[ var[0]+"_"+bkgSample+"_ROC" ] = [ BkgROCValues, SigROCValues, SigROCBins, SigROCLowEdge ]
+			BkgROCValues, SigROCValues, SigROCBins = rocPoints( store.sumw[ allHistos[ var[0]+"_Sig" ] ], store.sumw[ allHistos[ var[0]+"_"+bkgSample ] ], var[4] )
+			for ibin, effBkg, effSig in zip( SigROCBins, BkgROCValues, SigROCValues ):
+				store.setBinContent( allHistos[ var[0]+"_"+bkgSample+"_BkgROC" ], ibin, effBkg )
+				store.setBinContent( allHistos[ var[0]+"_"+bkgSample+"_SigROC" ], ibin, effSig )
+			#### low edge of the bin after the cut
+			SigROCLowEdge = var[2] + SigROCBins * ( ( var[3] - var[2] ) / float( var[1] ) )
+			allROCs[ var[0]+"_"+bkgSample+"_ROC" ] = [ BkgROCValues.tolist(), SigROCValues.tolist(), SigROCBins.tolist(), SigROCLowEdge.tolist() ]
 
 	outputTextFile = 'ROCfiles/ROC'+version+'Values_QCD'+qcd+'_'+signalName+'_cut'+str(len(cuts))+'.txt'
 	print '--- Creating ', outputTextFile 
 	print >> open(outputTextFile, 'w+'), allROCs
+	outputFile.cd()
+	store.toROOT()
 	outputFile.Write()
 	outputFile.Close()
 
+def fillROCHistos( allHistos, store, fileName, treename, massBranch, varList, mass, window, cutsList, name ):
+	"""Fill the var_name histograms with the events of fileName in the mass window passing cutsList ( cut[4]: var < cut[5], else var > cut[5] )"""
+
+	#### only the branches used are read
+	branches = list( OrderedDict.fromkeys( [ massBranch ] + [ cutVar[0] for cutVar in cutsList ] + [ var[0] for var in varList ] ) )
+	inputFile, events, numEntries = getTree( fileName, treename, branches )
+	allEvents = getArrays( events, branches )
+	inputFile.Close()
+	print '---- ', numEntries
+
+	passed = ( allEvents[ massBranch ] > int(mass)-window ) & ( allEvents[ massBranch ] < int(mass)+window )
+	for cutVar in cutsList: passed &= ( ( allEvents[ cutVar[0] ] < cutVar[5] ) if cutVar[4] else ( allEvents[ cutVar[0] ] > cutVar[5] ) )
+	for var in varList: store.fill( allHistos[ var[0]+'_'+name ], allEvents[ var[0] ][ passed ], np.ones( passed.sum() ) )
+
 def makeROCs( textFile, variables, bkgSamples, perVariable, cutsList, printValue, printVar ):
 	"""docstring for makeROCs"""
 
@@ -223,6 +178,42 @@ def plotROC( name, sample, dictROC, numCuts ):
 	can.SaveAs('Plots/'+name+'_'+version+signalName+'_QCD'+qcd+'_ROC_cut'+str(numCuts)+'.'+args.ext)
 	del can
 
+#----------------------------------------------------------------------
+def scanCuts( bkgSamples, sigSamples, treename, varList, window, method, numBest ):
+	"""Grid scan of the cuts on varList ( [ name, steps, min, max, lowerThan ] ) for each mass point in sigSamples.
+	Background columns are read once, each sample is filled once per mass point in an N-dimensional histogram."""
+
+	massBranch = ( 'prunedMassAve' if 'Boosted' in version else 'avgMass' )
+	branches = list( OrderedDict.fromkeys( [ massBranch, 'puWeight', 'lumiWeight' ] + [ var[0] for var in varList ] ) )
+	bkgEvents = OrderedDict()
+	for bkgSample in bkgSamples: 
+		inputFile, events, numEntries = getTree( bkgSamples[ bkgSample ], treename, branches )
+		bkgEvents[ bkgSample ] = getArrays( events, branches )
+		inputFile.Close()
+
+	listSelections = []
+	for massPoint in sigSamples:
+		inputFile, events, numEntries = getTree( sigSamples[ massPoint ], treename, branches )
+		sigEvents = getArrays( events, branches )
+		inputFile.Close()
+
+		tmpHistos = []
+		for allEvents in [ sigEvents ] + bkgEvents.values():
+			inWindow = ( allEvents[ massBranch ] > int(massPoint)-window ) & ( allEvents[ massBranch ] < int(massPoint)+window )
+			tmpEvents = dict( ( var[0], allEvents[ var[0] ][ inWindow ] ) for var in varList )
+			tmpHistos.append( gridHistogram( tmpEvents, 2606 * allEvents[ 'puWeight' ][ inWindow ] * allEvents[ 'lumiWeight' ][ inWindow ], varList ) )
+
+		print '-'*40
+		print '---- Mass point', massPoint, ', best', method, 'in a window of', window, 'GeV'
+		results = bestCuts( tmpHistos[0], np.sum( tmpHistos[1:], axis=0 ), varList, method, numBest=numBest )
+		for value, S, B, cuts in results: print round( value, 3 ), 'S =', round( S, 2 ), 'B =', round( B, 2 ), ', '.join( var+': '+str( round( cuts[ var ], 3 ) ) for var in cuts )
+		if results: listSelections.append( formatSelection( 'RPVStopStopToJets_UDD312_M-'+str(massPoint), results[0][3], varList ) )
+
+	outputTextFile = 'ROCfiles/cutScan'+version+'_'+method+'_QCD'+qcd+'.txt'
+	print '--- Creating ', outputTextFile
+	print >> open(outputTextFile, 'w+'), '\n'.join( listSelections )
+	print '\n'.join( listSelections )
+
 #----------------------------------------------------------------------
 def RUNTMVATraining( BkgSample, SigSample, treename, outputFileName, variables ):
 
@@ -233,8 +224,11 @@ def RUNTMVATraining( BkgSample, SigSample, treename, outputFileName, variables )
 	print "="*80
 
 	# get signal and background data for training/testing
-	sigFile, sigTree = getTree( SigSample, treename )
-	bkgFile, bkgTree = getTree( BkgSample, treename )
+	sigFile, sigTree, sigNumEntries = getTree( SigSample, treename )
+	bkgFile, bkgTree, bkgNumEntries = getTree( BkgSample, treename )
+
+	# weight files of each background in their own directory, trainings can run at the same time
+	TMVA.gConfig().GetIONames().fWeightFileDir = weightsDir( bkgName )
 
 	# everything is done via a TMVA factory
 	outputFile = TFile(outputFileName, "recreate")
@@ -323,6 +317,42 @@ def RUNTMVATraining( BkgSample, SigSample, treename, outputFileName, variables )
 	del factory
 
 
+def weightsDir( bkgName ): return 'weights/'+bkgName
+
+
+def weightsFile( bkgName, method='CutsGA' ): return weightsDir( bkgName )+'/TMVATraining'+version+bkgName+'_RPVSt'+str(mass)+'_'+method+'.weights.xml'
+
+
+def trainingJob( task ):
+	"""Run RUNTMVATraining for one background, returns [ background, seconds, status ]. Skipped when the weight file is newer than the inputs"""
+
+	BkgSample, SigSample, treename, outputFileName, variables, retrain = task
+	bkgName = outputFileName.split('_')[1].replace(".root",'')
+	xmlFile = weightsFile( bkgName )
+	missingInputs = [ fileName for fileName in [ BkgSample, SigSample ] if not os.path.isfile( fileName ) ]
+	if missingInputs: return [ bkgName, 0., 'failed: missing input '+', '.join( missingInputs ) ]
+	if not retrain and os.path.isfile( xmlFile ) and ( os.path.getmtime( xmlFile ) > max( os.path.getmtime( BkgSample ), os.path.getmtime( SigSample ) ) ): 
+		print ' ---> Weights of', bkgName, 'are up to date:', xmlFile
+		return [ bkgName, 0., 'skipped' ]
+	startTime = time.time()
+	try: 
+		RUNTMVATraining( BkgSample, SigSample, treename, outputFileName, variables )
+		status = ( 'done' if os.path.isfile( xmlFile ) else 'no weight file' )
+	except Exception as e: status = 'failed: '+str(e)
+	return [ bkgName, time.time() - startTime, status ]
+
+
+def runTrainings( listTasks, jobs ):
+	"""Trainings in a pool of jobs processes, one new process per training (TMVA keeps global state)"""
+
+	startTime = time.time()
+	results = list( runChunks( trainingJob, listTasks, jobs, maxtasksperchild=1 ) )
+	print "\n", "="*80
+	print ' ---> TMVA trainings, '+str(jobs)+' jobs, total time '+str( round( time.time() - startTime, 1 ) )+' s'
+	for bkgName, seconds, status in results: print '\t', bkgName, '\t', str( round( seconds, 1 ) )+' s', '\t', status
+	print "="*80
+
+
 def getOptimizeValues( variables, sample ):
 	"""docstring for getOptimizeValues"""
 
@@ -331,7 +361,7 @@ def getOptimizeValues( variables, sample ):
 	
 	reader = TMVA.Reader( "!Color:Silent" )
 	for k in variables: reader.AddVariable( k, dictVariables[k] )
-	reader.BookMVA( "CutsGA method", "weights/TMVATraining"+version+sample+"_RPVSt"+mass+"_CutsGA.weights.xml" )
+	reader.BookMVA( "CutsGA method", weightsFile( sample ) )
 	#passed = reader.EvaluateMVA( "CutsGA method", 0.9 )
 	mcuts = reader.FindMVA( "CutsGA method" )
 	cutsMin = array( 'd', [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0] )        
@@ -346,71 +376,73 @@ def getOptimizeValues( variables, sample ):
 	return finalValues
 
 
-def ApplicationCreateCombinedTree( variables, outputFileName, bkgSamples, SigSample, treename ):
-	"""docstring for ApplicationCreateCombinedTree"""
+#### one C++ call evaluates a whole chunk, values are the variables of each event one after the other
+mvaChunkCode = """
+void evaluateMVAChunk( TMVA::Reader* reader, const char* method, const float* values, int numVars, int numEvents, float* output ) {
+	std::vector<float> event( numVars );
+	for ( int i = 0; i < numEvents; i++ ) {
+		for ( int j = 0; j < numVars; j++ ) event[j] = values[ i*numVars + j ];
+		output[i] = reader->EvaluateMVA( event, method );
+	}
+}
+"""
+
+def ApplicationCreateCombinedTree( variables, outputFileName, bkgSamples, SigSample, treename, jobs=1, chunkSize=100000 ):
+	"""multiBkg tree with the variables, massAve, weight, classID and the BDT output of the classifier of each background (cls+bkg).
+	Signal and backgrounds are evaluated in parallel in chunks of entries, the tree is written at the end"""
+
+	outputBranches = variables + [ 'massAve', 'weight', 'classID' ] + [ 'cls'+bkg for bkg in bkgSamples ]
+	#### classID: 0 signal, then 1, 2, .. in the order of bkgSamples
+	listTasks = [ ( SigSample, treename, variables, bkgSamples.keys(), 0, chunkSize ) ]
+	listTasks += [ ( bkgSamples[ sample ], treename, variables, bkgSamples.keys(), dummyCls+1, chunkSize ) for dummyCls, sample in enumerate( bkgSamples ) ]
+
+	multiBkg = ColumnWriter( outputBranches )
+	for i, columns in enumerate( runChunks( applyMVA, listTasks, jobs, maxtasksperchild=1 ) ): 
+		multiBkg.append( columns )
+		print ' ---> End of', ( 'Signal' if i == 0 else bkgSamples.keys()[ i-1 ] ), 'Tree'
 
 	# Create a new root output file.
-	#outfileName = TString( "tmva_example_multiple_backgrounds__applied.root" )
 	outputFile = TFile( outputFileName, "RECREATE" )
-	outputTree = TTree("multiBkg","multiple backgrounds tree")
+	multiBkg.toROOT( "multiBkg", "multiple backgrounds tree" )
 
-	dictVariables = {}
-	for k in variables:
-		dictVariables[ k ] = array('f', [0.] )
-		outputTree.Branch( k, dictVariables[ k ], k+'/F' )
-	
-	MassAve = array( 'f', [ 0.] )
-	outputTree.Branch( 'massAve', MassAve, 'massAve/F' ) 
-	Weight = array( 'f', [ 0.] )
-	outputTree.Branch( 'weight', Weight, 'weight/F' ) 
-	ClassID = array( 'f', [ 0.] )
-	outputTree.Branch( 'classID', ClassID, 'classID/F' ) 
-	for bkg in bkgSamples:
-		dictVariables[ 'cls'+bkg ] = array('f', [0.] )
-		outputTree.Branch( 'cls'+bkg, dictVariables[ 'cls'+bkg ], 'cls'+bkg+'/F' )
-
-	# ===== create three readers for the three different signal/background classifications, .. one for each background
-	readers = {}
-	for bkg in bkgSamples:
-		readers[ 'reader'+bkg ] = TMVA.Reader( "!Color:!Silent" )
-		for k in variables: readers[ 'reader'+bkg ].AddVariable( k, dictVariables[k] )
-		readers[ 'reader'+bkg ].BookMVA( "BDT method", "weights/TMVATraining"+bkg+"_BDTG.weights.xml" )
-
-	sigFile, sigTree, sigNumEntries = getTree( SigSample, treename )
-	for k in variables: sigTree.SetBranchAddress( k, dictVariables[ k ] )
-	for i in xrange(sigNumEntries):
-		sigTree.GetEntry(i)
-		ClassID[0] = 0
-		MassAve[0] = sigTree.massAve
-		Weight[0] = sigTree.lumiWeight * sigTree.puWeight
-		for bkg in bkgSamples:
-			dictVariables[ 'cls'+bkg ][0] = readers[ 'reader'+bkg ].EvaluateMVA( 'BDT method' )
-		outputTree.Fill()
-	print ' ---> End of Signal Tree'
-
-
-	dummyCls = 0
-	for sample in bkgSamples: 
-		dummyCls += 1
-		bkgFile, bkgTree, bkgNumEntries  = getTree( bkgSamples[ sample ], treename )
-		for k in variables: bkgTree.SetBranchAddress( k, dictVariables[ k ] )
-		for i in xrange(bkgNumEntries):
-			bkgTree.GetEntry(i)
-			ClassID[0] = dummyCls 
-			MassAve[0] = bkgTree.massAve
-			Weight[0] = bkgTree.lumiWeight * bkgTree.puWeight
-			for bkg in bkgSamples:
-				dictVariables[ 'cls'+bkg ][0] = readers[ 'reader'+bkg ].EvaluateMVA( 'BDT method' )
-			outputTree.Fill()
-		print ' ---> End of', sample, 'Tree'
-		
 	#  write output tree
 	outputFile.Write()
 	outputFile.Close()
 
-	del readers
 	print "--- Created root file: ",  outputFileName, " containing the MVA output histograms."
 	print "==> Application of readers is done! combined tree created"
+
+def applyMVA( task ):
+	"""multiBkg columns of one input file, runs in a worker process"""
+
+	fileName, treename, variables, bkgNames, classID, chunkSize = task
+	import ROOT
+	if not hasattr( ROOT, 'evaluateMVAChunk' ): ROOT.gInterpreter.Declare( mvaChunkCode )
+
+	# ===== one reader for each signal/background classification
+	dictVariables = dict( ( k, array('f', [0.] ) ) for k in variables )
+	readers = {}
+	for bkg in bkgNames:
+		readers[ 'reader'+bkg ] = TMVA.Reader( "!Color:Silent" )
+		for k in variables: readers[ 'reader'+bkg ].AddVariable( k, dictVariables[k] )
+		readers[ 'reader'+bkg ].BookMVA( "BDT method", "weights/TMVATraining"+bkg+"_BDTG.weights.xml" )
+
+	inputFile, tree, numEntries = getTree( fileName, treename, variables + [ 'massAve', 'lumiWeight', 'puWeight' ] )
+	columns = OrderedDict( ( b, [] ) for b in variables + [ 'massAve', 'weight', 'classID' ] + [ 'cls'+bkg for bkg in bkgNames ] )
+	for start, stop in entryRanges( numEntries, chunkSize ):
+		tmpEvents = getArrays( tree, variables + [ 'massAve', 'lumiWeight', 'puWeight' ], start=start, stop=stop )
+		numEvents = len( tmpEvents[ 'massAve' ] )
+		values = np.ascontiguousarray( np.array( [ tmpEvents[ k ] for k in variables ], dtype=np.float32 ).T )
+		for k in variables: columns[ k ].append( tmpEvents[ k ] )
+		columns[ 'massAve' ].append( tmpEvents[ 'massAve' ] )
+		columns[ 'weight' ].append( tmpEvents[ 'lumiWeight' ] * tmpEvents[ 'puWeight' ] )
+		columns[ 'classID' ].append( np.full( numEvents, classID ) )
+		for bkg in bkgNames:
+			output = np.zeros( numEvents, dtype=np.float32 )
+			if numEvents > 0: ROOT.evaluateMVAChunk( readers[ 'reader'+bkg ], "BDT method", values, len(variables), numEvents, output )
+			columns[ 'cls'+bkg ].append( output )
+	inputFile.Close()
+	return OrderedDict( ( b, np.concatenate( columns[ b ] ) if columns[ b ] else np.zeros( 0 ) ) for b in columns )
 #----------------------------------------------------------------------
 
 #################################################################################
@@ -428,6 +460,12 @@ if __name__ == '__main__':
 	parser.add_argument( '-v', '--version', action='store',  dest='version', default='Boosted', help='Variable to optimize, as histogram in rootfile.' )
 	parser.add_argument( '-e', '--eff', action='store', dest='effS', type=int, default=0, help='Mass of the Stop' )
 	parser.add_argument('-Q', '--QCD', action='store', default='Pt', help='Type of QCD binning, example: HT.' )
+	parser.add_argument( '--window', action='store', type=int, dest='window', default=10, help='Half width of the mass window of the cut scan.' )
+	parser.add_argument( '--significance', action='store', dest='significance', default='SsqrtB', choices=[ 'SsqrtB', 'Punzi', 'Asimov' ], help='Figure of merit of the cut scan.' )
+	parser.add_argument( '--scanVars', action='store', dest='scanVars', default='', help='Comma separated variables of the cut scan, default the ones with a cut in var.' )
+	parser.add_argument( '--numBest', action='store', type=int, dest='numBest', default=5, help='Number of cut sets printed per mass point in the cut scan.' )
+	parser.add_argument( '-j', '--jobs', action='store', type=int, dest='jobs', default=2, help='Number of TMVA trainings running at the same time.' )
+	parser.add_argument( '--retrain', action='store_true', dest='retrain', default=False, help='Train again even when the weight file is newer than the inputs.' )
 	parser.add_argument('-E', '--extension', action='store', dest='ext', default='png', help='Extension of plots.' )
 
 	try:
@@ -519,14 +557,20 @@ if __name__ == '__main__':
 		if printValue: 	makeROCs( 'ROCfiles/ROC'+version+'Values_QCD'+qcd+'_'+signalName+'_QCD'+qcd+'_cut'+str(len(cuts)-1)+'.txt', cuts, bkgSamples, True if 'var' in typeROC else False, cuts, printValue, quantity )
 		else: makeROCs( 'ROCfiles/ROC'+version+'Values_QCD'+qcd+'_'+signalName+'_cut'+str(len(cuts))+'.txt', variables, bkgSamples, True if 'var' in typeROC else False, cuts, printValue, quantity )
 
+	elif 'cutScan' in process:
+		#### deterministic replacement of the TMVA CutsGA optimization, mass accepts a comma separated list
+		scanVars = [ x[1:6] for x in var if ( version in x[0] ) and ( ( x[1] in args.scanVars.split(',') ) if args.scanVars else ( x[6]!=x[3] ) ) ]
+		massSamples = OrderedDict( ( m, 'Rootfiles/RUNAnalysis_RPVStopStopToJets_UDD312_M-'+m+'_RunIIFall15MiniAODv2_v76x_v1p0_v03.root' ) for m in str(mass).split(',') )
+		p0 = Process( target=scanCuts, args=( bkgSamples, massSamples, treename, scanVars, args.window, args.significance, args.numBest ) )
+		p0.start()
+		p0.join()
+
 	elif 'TMVA' in process:
 		variables = [ x[1] for x in var if ( version in x[0] ) ]
-		for sample in bkgSamples: 
-			p0 = Process( target=RUNTMVATraining, args=( bkgSamples[ sample ], SigSample, treename, 'Rootfiles/RUNTMVATraining_'+bkgSamples[ sample ].split('_')[1]+'_RPVSt'+str(mass)+'.root', variables ) )
-			p0.start()
-			p0.join()
+		listTasks = [ ( bkgSamples[ sample ], SigSample, treename, 'Rootfiles/RUNTMVATraining_'+bkgSamples[ sample ].split('_')[1]+'_RPVSt'+str(mass)+'.root', variables, args.retrain ) for sample in bkgSamples ]
+		runTrainings( listTasks, args.jobs )
 		#outputFileName = 'Rootfiles/RUN'+version+'OptimizationStudiesTMP.root'
-		#p1 = Process( target=ApplicationCreateCombinedTree, args=( variables, outputFileName, bkgSamples, SigSample, treename ) )
+		#p1 = Process( target=ApplicationCreateCombinedTree, args=( variables, outputFileName, bkgSamples, SigSample, treename, args.jobs ) )
 		#p1.start()
 		#p1.join()
 	elif 'Print' in process:
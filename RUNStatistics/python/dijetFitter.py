@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+
+'''
+File: dijetFitter.py
+Description: Binned Poisson likelihood fit of the fit functions of RUNFitter ( P4, expoPoli,
+	     landau, gaus and P4Gaus ) on arrays of bin centers, contents and errors. The
+	     functions have analytic gradients, the normalization of the one-component
+	     functions is profiled out and the minimization starts from a fixed list of
+	     points, so the same input always gives the same result.
+'''
+
+import time
+import numpy as np
+from scipy.optimize import minimize
+
+sqrtS = 13000.
+
+############### fit functions, each returns the values at x and the jacobian ( len(x), len(p) )
+
+def p4Function( x, p ):
+	"""[0]*pow(1-x/13000,[1])/pow(x/13000,[2]+[3]*log(x/13000))"""
+	logZ = np.log( x/sqrtS )
+	log1Z = np.log1p( -x/sqrtS )
+	shape = np.exp( p[1]*log1Z - ( p[2] + p[3]*logZ )*logZ )
+	value = p[0]*shape
+	return value, np.column_stack( [ shape, value*log1Z, -value*logZ, -value*logZ**2 ] )
+
+def expoPoliFunction( x, p ):
+	"""exp([0]+[1]*x+[2]*x*x+[3]*x*x*x+[4]*x*x*x*x)"""
+	powers = x[ :, np.newaxis ]**np.arange( 5 )
+	value = np.exp( np.dot( powers, p ) )
+	return value, value[ :, np.newaxis ]*powers
+
+def gausFunction( x, p ):
+	"""gaus, [0]*exp(-0.5*((x-[1])/[2])**2)"""
+	shape = np.exp( -0.5*( ( x - p[1] )/p[2] )**2 )
+	value = p[0]*shape
+	return value, np.column_stack( [ shape, value*( x - p[1] )/p[2]**2, value*( x - p[1] )**2/p[2]**3 ] )
+
+#### coefficients of TMath::Landau ( CERNLIB DENLAN ), numerators and denominators of the rational approximations
+landauP = [ [ 0.4259894875, -0.1249762550, 0.03984243700, -0.006298287635, 0.001511162253 ],
+		[ 0.1788541609, 0.1173957403, 0.01488850518, -0.001394989411, 0.0001283617211 ],
+		[ 0.1788544503, 0.09359161662, 0.006325387654, 0.00006611667319, -0.000002031049101 ],
+		[ 0.9874054407, 118.6723273, 849.2794360, -743.7792444, 427.0262186 ],
+		[ 1.003675074, 167.5702434, 4789.711289, 21217.86767, -22324.94910 ],
+		[ 1.000827619, 664.9143136, 62972.92665, 475554.6998, -5743609.109 ] ]
+landauQ = [ [ 1.0, -0.3388260629, 0.09594393323, -0.01608042283, 0.003778942063 ],
+		[ 1.0, 0.7428795082, 0.3153932961, 0.06694219548, 0.008790609714 ],
+		[ 1.0, 0.6097809921, 0.2560616665, 0.04746722384, 0.006957301675 ],
+		[ 1.0, 106.8615961, 337.6496214, 2016.712389, 1597.063511 ],
+		[ 1.0, 156.9424537, 3745.310488, 9834.698876, 66924.28357 ],
+		[ 1.0, 651.4101098, 56974.73333, 165917.4725, -2815759.939 ] ]
+landauA1 = [ 0.04166666667, -0.01996527778, 0.02709538966 ]
+landauA2 = [ -1.845568670, -4.284640743 ]
+
+def rational( k, t ):
+	"""landauP[k]/landauQ[k] at t and its derivative"""
+	num = np.polyval( landauP[k][::-1], t )
+	den = np.polyval( landauQ[k][::-1], t )
+	dNum = np.polyval( np.polyder( landauP[k][::-1] ), t )
+	dDen = np.polyval( np.polyder( landauQ[k][::-1] ), t )
+	return num/den, ( dNum*den - num*dDen )/den**2
+
+def landauDensity( v ):
+	"""TMath::Landau( v, 0, 1 ) and its derivative in v"""
+
+	v = np.asarray( v, dtype=np.float64 )
+	density = np.zeros( v.shape )
+	derivative = np.zeros( v.shape )
+	regions = np.digitize( v, [ -5.5, -1., 1., 5., 12., 50., 300. ] )
+	for region in np.unique( regions ):
+		inRegion = ( regions == region )
+		t = v[ inRegion ]
+		if region == 0:
+			#### 0 where u underflows ( as TMath::Landau ), only the other points go through exp( -1/u )
+			u = np.exp( t + 1. )
+			value = np.zeros( t.shape )
+			dValue = np.zeros( t.shape )
+			nonZero = ( u >= 1e-10 )
+			u = u[ nonZero ]
+			series = 1 + ( landauA1[0] + ( landauA1[1] + landauA1[2]*u )*u )*u
+			dSeries = landauA1[0] + ( 2*landauA1[1] + 3*landauA1[2]*u )*u
+			value[ nonZero ] = 0.3989422803*np.exp( -1./u )/np.sqrt( u )*series
+			dValue[ nonZero ] = value[ nonZero ]*( 1./u - 0.5 + u*dSeries/series )
+		elif region == 1:
+			u = np.exp( -t - 1. )
+			ratio, dRatio = rational( 0, t )
+			factor = np.exp( -u )*np.sqrt( u )
+			value = factor*ratio
+			dValue = factor*( ratio*( u - 0.5 ) + dRatio )
+		elif region in [ 2, 3 ]:
+			value, dValue = rational( region-1, t )
+		elif region in [ 4, 5, 6 ]:
+			u = 1./t
+			ratio, dRatio = rational( region-1, u )
+			value = u**2*ratio
+			dValue = -u**2*( 2*u*ratio + u**2*dRatio )
+		else:
+			g = t - t*np.log( t )/( t + 1 )
+			u = 1./g
+			value = u**2*( 1 + ( landauA2[0] + landauA2[1]*u )*u )
+			dg = 1 - ( np.log( t ) + t + 1 )/( t + 1 )**2
+			dValue = -u**2*dg*( 2*u + 3*landauA2[0]*u**2 + 4*landauA2[1]*u**3 )
+		density[ inRegion ] = value
+		derivative[ inRegion ] = dValue
+	return density, derivative
+
+def landauFunction( x, p ):
+	"""[0]*TMath::Landau(-x,[1],[2])"""
+	v = ( -x - p[1] )/p[2]
+	shape, dShape = landauDensity( v )
+	return p[0]*shape, np.column_stack( [ shape, -p[0]*dShape/p[2], -p[0]*dShape*v/p[2] ] )
+
+def p4GausFunction( x, p ):
+	"""P4 + gaus(4)"""
+	p4Value, p4Jacobian = p4Function( x, p[:4] )
+	gausValue, gausJacobian = gausFunction( x, p[4:] )
+	return p4Value + gausValue, np.column_stack( [ p4Jacobian, gausJacobian ] )
+
+############### initial parameters from the data
+
+def moments( x, contents ):
+	"""Mean and width of the positive bins"""
+	weights = np.clip( contents, 0, None )
+	if weights.sum() <= 0: return np.mean( x ), np.std( x ) or 1.
+	mean = np.average( x, weights=weights )
+	return mean, np.sqrt( np.average( ( x - mean )**2, weights=weights ) ) or 1.
+
+def expoPoliStart( x, contents ):
+	"""Polynomial fit of the log of the positive bins"""
+	positive = ( contents > 0 )
+	if positive.sum() < 5: return [ 0., -0.01, 0., 0., 0. ]
+	return list( np.polyfit( x[ positive ], np.log( contents[ positive ] ), 4, w=np.sqrt( contents[ positive ] ) )[::-1] )
+
+def landauStart( x, contents ):
+	mean, width = moments( x, contents )
+	sigma = width/3.
+	return [ 1., -x[ np.argmax( contents ) ] + 0.22*sigma, sigma ]
+
+def gausStart( x, contents ):
+	mean, width = moments( x, contents )
+	return [ 1., mean, width ]
+
+def p4GausStart( x, contents ):
+	mean, width = moments( x, contents )
+	return [ 0.1, 100., 2., 0.1, 0., mean, width/2. ]
+
+#### number of parameters, function, normalization ( profiled: 'linear' for [0]*shape, 'log' for exp([0]+...), None ),
+#### lower bounds of the parameters and initial parameters
+fitModels = {
+		'P4' : [ 4, p4Function, 'linear', [ None ]*4, lambda x, contents: [ 0.1, 100., 2., 0.1 ] ],
+		'expoPoli' : [ 5, expoPoliFunction, 'log', [ None ]*5, expoPoliStart ],
+		'landau' : [ 3, landauFunction, 'linear', [ None, None, 1e-6 ], landauStart ],
+		'gaus' : [ 3, gausFunction, 'linear', [ None, None, 1e-6 ], gausStart ],
+		'P4Gaus' : [ 7, p4GausFunction, None, [ None ]*6+[ 1e-6 ], p4GausStart ],
+		}
+
+#### formula of each model, as the TF1 of RUNFitter. It is part of the key of the fit cache, change it with the function
+fitExpressions = {
+		'P4' : '[0]*pow(1-x/13000,[1])/pow(x/13000,[2]+[3]*log(x/13000))',
+		'expoPoli' : 'exp([0]+[1]*x+[2]*x*x+[3]*x*x*x+[4]*x*x*x*x)',
+		'landau' : '[0]*TMath::Landau(-x,[1],[2])',
+		'gaus' : '[0]*exp(-0.5*((x-[1])/[2])**2)',
+		'P4Gaus' : '[0]*pow(1-x/13000,[1])/pow(x/13000,[2]+[3]*log(x/13000))+[4]*exp(-0.5*((x-[5])/[6])**2)',
+		}
+
+def evaluate( function, x, parameters ):
+	"""Values of the fit function at x"""
+	return fitModels[ function ][1]( np.asarray( x, dtype=np.float64 ), np.asarray( parameters, dtype=np.float64 ) )[0]
+
+############### likelihood
+
+#### smallest expected value in the log, a function that vanishes in a bin with entries is a bad but finite fit
+minValue = 1e-300
+
+def profiledNLL( function, x, contents, parameters, free, norm ):
+	"""Poisson NLL ( without the constant log(n!) terms ) and its gradient in the free parameters.
+	With norm the normalization is at its best value for the other parameters, by the envelope theorem
+	the gradient is then the partial derivative"""
+
+	value, jacobian = fitModels[ function ][1]( x, parameters )
+	value = np.maximum( value, minValue )
+	if norm:
+		total = contents.sum()
+		scale = total / value.sum()
+		nll = total - total*np.log( scale ) - np.dot( contents, np.log( value ) )
+		gradient = np.dot( scale - contents/value, jacobian[ :, free ] )
+	else:
+		nll = value.sum() - np.dot( contents, np.log( value ) )
+		gradient = np.dot( 1. - contents/value, jacobian[ :, free ] )
+	return nll, gradient, ( scale if norm else 1. )
+
+def fullParameters( parameters, free, theta, scales ):
+	full = np.array( parameters, dtype=np.float64 )
+	full[ free ] = theta*scales
+	return full
+
+def pullsAndResiduals( contents, errors, values ):
+	"""( data - fit )/error and ( data - fit )/fit with its error for the bins with entries ( 0 elsewhere ), chi2 and number of bins used"""
+	used = ( contents != 0 ) & ( errors > 0 ) & ( values != 0 )
+	safeErrors = np.where( used, errors, 1. )
+	safeValues = np.where( used, values, 1. )
+	pulls = np.where( used, ( contents - values )/safeErrors, 0. )
+	residuals = np.where( used, ( contents - values )/safeValues, 0. )
+	residualErrors = np.where( used, errors/safeValues, 0. )
+	return pulls, residuals, residualErrors, np.sum( pulls**2 ), int( used.sum() )
+
+def fitBins( function, x, contents, errors=None, initial=[], nStarts=8, spread=0.5, seed=12345, fixed=[] ):
+	"""Binned Poisson likelihood fit of function ( a key of fitModels ) to the contents at the bin centers x.
+	The minimization starts from initial ( the default of the function if empty ) and nStarts-1 points around it
+	( each parameter times 1 +- spread, from a fixed seed ) and keeps the lowest minimum. The parameters
+	in fixed ( indices ) stay at their initial values.
+	Returns a dict with parameters, errors, covariance ( inverse of the Fisher information ), nll, status
+	( 0 ok, 1 the minimizer did not converge, 2 covariance not positive definite ), values of the function
+	at x, pulls, residuals, residualErrors, chi2 ( sum of the pulls squared ), ndf and time in seconds"""
+
+	startTime = time.time()
+	numParam, model, norm, lowerBounds, startFunction = fitModels[ function ]
+	x, contents = [ np.asarray( a, dtype=np.float64 ) for a in [ x, contents ] ]
+	errors = ( np.sqrt( np.abs( contents ) ) if errors is None else np.asarray( errors, dtype=np.float64 ) )
+	initial = np.array( list( initial )[:numParam] if len(initial) > 0 else startFunction( x, contents ), dtype=np.float64 )
+
+	#### the normalization is not a parameter of the minimization, its value in the model is 1 ( linear ) or 0 ( log )
+	if 0 in fixed: norm = None
+	varied = [ k for k in range( numParam ) if k not in fixed ]
+	free = np.array( [ k for k in varied if not ( norm and k == 0 ) ], dtype=int )
+	if norm: initial[0] = ( 1. if norm == 'linear' else 0. )
+	scales = np.where( initial[ free ] != 0, np.abs( initial[ free ] ), 1. )
+	bounds = [ ( ( lowerBounds[k]/scales[i] ) if lowerBounds[k] is not None else None, None ) for i, k in enumerate( free ) ]
+
+	def objective( theta ):
+		nll, gradient = profiledNLL( function, x, contents, fullParameters( initial, free, theta, scales ), free, norm )[:2]
+		if not np.isfinite( nll ): return 1e300, np.zeros( len(theta) )
+		return nll, gradient*scales
+
+	randomState = np.random.RandomState( seed )
+	starts = [ initial[ free ]/scales ] + [ initial[ free ]/scales * ( 1 + spread*randomState.uniform( -1, 1, len(free) ) ) for i in range( nStarts-1 ) ]
+	best = None
+	for start in starts:
+		if bounds: start = np.array( [ max( s, b[0] ) if b[0] is not None else s for s, b in zip( start, bounds ) ] )
+		result = minimize( objective, start, jac=True, method='L-BFGS-B', bounds=bounds, options={ 'maxiter': 5000, 'ftol': 1e-12, 'gtol': 1e-8 } )
+		if best is None or ( result.success and not best.success ) or ( result.success == best.success and result.fun < best.fun ): best = result
+
+	parameters = fullParameters( initial, free, best.x, scales )
+	if norm:
+		scale = profiledNLL( function, x, contents, parameters, free, norm )[2]
+		parameters[0] = ( scale if norm == 'linear' else np.log( scale ) )
+	values, jacobian = model( x, parameters )
+	nll = np.sum( values ) - np.dot( contents, np.log( np.maximum( values, minValue ) ) )
+
+	status = ( 0 if best.success else 1 )
+	fisher = np.dot( jacobian[ :, varied ].T, jacobian[ :, varied ]/np.maximum( values, minValue )[ :, np.newaxis ] )
+	try:
+		variedCovariance = np.linalg.inv( fisher )
+		if not np.all( np.isfinite( variedCovariance ) ) or np.any( np.diag( variedCovariance ) <= 0 ): raise np.linalg.LinAlgError
+	except np.linalg.LinAlgError:
+		variedCovariance = np.linalg.pinv( fisher )
+		status = max( status, 2 )
+	covariance = np.zeros( ( numParam, numParam ) )
+	covariance[ np.ix_( varied, varied ) ] = variedCovariance
+
+	pulls, residuals, residualErrors, chi2, numBins = pullsAndResiduals( contents, errors, values )
+	return { 'function': function, 'parameters': parameters, 'errors': np.sqrt( np.abs( np.diag( covariance ) ) ), 'covariance': covariance,
+			'nll': nll, 'status': status, 'values': values, 'pulls': pulls, 'residuals': residuals, 'residualErrors': residualErrors,
+			'chi2': chi2, 'ndf': numBins - len(varied), 'time': time.time() - startTime }
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+
+'''
+File: fitCache.py
+Description: On-disk cache of dijetFitter results. A fit is stored under a hash of its input
+	     bins ( centers, contents, errors ), function, range, rebin, initial parameters and
+	     fit options, so the same fit is never done twice. Fits of the same histogram and
+	     function share a family: a fit that misses the cache starts from the parameters of
+	     the family fit with the closest range, if the range moved only a little. The least
+	     recently used entries are removed when there are more than maxEntries.
+	     The key is the fit that is asked for, not the start of the minimization: an entry
+	     keeps the first result stored for it, warm started or not, with the parameters it
+	     started from, and the same fit gives that result until the entry is evicted.
+'''
+
+import os, glob, json, hashlib
+import numpy as np
+from dijetFitter import fitExpressions, fitBins
+try: from RUNA.RUNAnalysis.commonFunctions import atomicWrite
+except ImportError: from commonFunctions import atomicWrite
+
+#### directory, largest number of entries, read the cache ( a bypassed cache still stores the new fits ),
+#### largest change of each edge of the range ( fraction of the range ) to start from a family fit
+cacheSettings = { 'directory': '.fitCache', 'maxEntries': 1000, 'enabled': True, 'warmStartTolerance': 0.2 }
+
+#### keys of a dijetFitter result stored as lists
+arrayKeys = [ 'parameters', 'errors', 'covariance', 'values', 'pulls', 'residuals', 'residualErrors' ]
+
+def configure( **settings ):
+	"""Change cacheSettings, e.g. configure( enabled=False )"""
+	for k in settings:
+		if k not in cacheSettings: raise KeyError( 'Unknown fit cache setting '+k )
+		if settings[ k ] is not None: cacheSettings[ k ] = settings[ k ]
+
+def fingerprint( *items ):
+	"""md5 of numbers, strings and numeric arrays ( as float64 ), anything else by its repr"""
+	checksum = hashlib.md5()
+	for item in items:
+		data = repr( item )
+		if isinstance( item, ( np.ndarray, list, tuple ) ):
+			try: data = np.ascontiguousarray( item, dtype=np.float64 ).tostring()
+			except ( TypeError, ValueError ): pass
+		checksum.update( data )
+		checksum.update( '|' )
+	return checksum.hexdigest()
+
+def entryName( family, key ): return os.path.join( cacheSettings[ 'directory' ], family+'_'+key+'.json' )
+
+def loadEntry( fileName ):
+	"""Stored result as a dijetFitter result, None if the file is gone or broken ( e.g. removed by another process )"""
+	try:
+		with open( fileName ) as entryFile: entry = json.load( entryFile )
+	except ( IOError, OSError, ValueError ): return None
+	for k in arrayKeys: entry[ 'result' ][ k ] = np.array( entry[ 'result' ][ k ] )
+	entry[ 'result' ][ 'function' ] = str( entry[ 'result' ][ 'function' ] )
+	return entry
+
+def storeEntry( fileName, result, fitRange ):
+	"""Written with atomicWrite, other processes never read half an entry"""
+	if not os.path.isdir( cacheSettings[ 'directory' ] ):
+		try: os.makedirs( cacheSettings[ 'directory' ] )
+		except OSError: pass
+	stored = dict( ( k, ( v.tolist() if isinstance( v, np.ndarray ) else v ) ) for k, v in result.items() if k != 'cached' )
+	stored = dict( ( k, ( float( v ) if isinstance( v, np.floating ) else v ) ) for k, v in stored.items() )
+	def write( tmpName ):
+		with open( tmpName, 'w' ) as entryFile: json.dump( { 'range': list( fitRange ), 'result': stored }, entryFile )
+	atomicWrite( fileName, write )
+
+def evict():
+	"""Remove the least recently used entries above maxEntries ( a hit touches its entry )"""
+	entries = glob.glob( os.path.join( cacheSettings[ 'directory' ], '*.json' ) )
+	if len(entries) <= cacheSettings[ 'maxEntries' ]: return
+	def lastUse( fileName ):
+		try: return os.path.getmtime( fileName )
+		except OSError: return 0
+	for fileName in sorted( entries, key=lastUse )[ :len(entries) - cacheSettings[ 'maxEntries' ] ]:
+		try: os.remove( fileName )
+		except OSError: pass
+
+def closestFit( family, fitRange ):
+	"""Result of the family fit with the closest range, if each edge moved by less than warmStartTolerance of the range"""
+	best = None
+	for fileName in glob.glob( os.path.join( cacheSettings[ 'directory' ], family+'_*.json' ) ):
+		entry = loadEntry( fileName )
+		if entry is None: continue
+		shift = max( abs( entry['range'][0] - fitRange[0] ), abs( entry['range'][1] - fitRange[1] ) )
+		if shift <= cacheSettings[ 'warmStartTolerance' ]*( fitRange[1] - fitRange[0] ) and ( best is None or shift < best[0] ): best = [ shift, entry['result'] ]
+	return ( best[1] if best else None )
+
+def cachedFit( function, x, contents, errors=None, initial=[], family='', fitRange=None, rebin=1, **fitOptions ):
+	"""fitBins through the cache. family identifies the histogram ( e.g. fingerprint of all its bins ), fitRange is ( min, max ).
+	The result has 'cached': True when it comes from the cache and 'start', the parameters the minimization started from
+	( initial, or the closest family fit ), which are not part of the key"""
+
+	x, contents = [ np.asarray( a, dtype=np.float64 ) for a in [ x, contents ] ]
+	fitRange = ( fitRange if fitRange is not None else ( float( x.min() ), float( x.max() ) ) )
+	family = fingerprint( function, fitExpressions[ function ], family, rebin )
+	key = fingerprint( x, contents, ( errors if errors is not None else 'poisson' ), list( initial ), list( fitRange ), repr( sorted( fitOptions.items() ) ) )
+	fileName = entryName( family, key )
+
+	if cacheSettings[ 'enabled' ] and os.path.exists( fileName ):
+		entry = loadEntry( fileName )
+		if entry is not None:
+			try: os.utime( fileName, None )
+			except OSError: pass
+			entry['result']['cached'] = True
+			return entry['result']
+
+	start = initial
+	if cacheSettings[ 'enabled' ]:
+		closest = closestFit( family, fitRange )
+		if closest is not None: start = closest['parameters']
+	result = fitBins( function, x, contents, errors, start, **fitOptions )
+	result['start'] = [ float( p ) for p in start ]
+	storeEntry( fileName, result, fitRange )
+	evict()
+	result['cached'] = False
+	return result
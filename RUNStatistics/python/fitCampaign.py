@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+
+'''
+File: fitCampaign.py
+Description: Fits of many mass points and fit functions run serially or in a pool of worker
+	     processes. A job is [ description, function, arguments ], description is a dict
+	     ( e.g. process, mass, function ) that goes to the row of the job in the summary and
+	     the function returns a dijetFitter result ( or None ). The jobs are sent to the
+	     workers of commonFunctions.runChunks by index, each worker draws the plots of its
+	     own fits.
+'''
+
+import sys, time, json, traceback
+try: from RUNA.RUNAnalysis.commonFunctions import runChunks
+except ImportError: from commonFunctions import runChunks
+
+pendingJobs = []
+
+def resultRow( result ):
+	"""Plain values of a dijetFitter result for the summary"""
+	if result is None: return { 'parameters': [], 'errors': [], 'chi2': None, 'ndf': None, 'status': None, 'fitTime': None }
+	return { 'parameters': [ float( p ) for p in result['parameters'] ], 'errors': [ float( e ) for e in result['errors'] ],
+			'chi2': float( result['chi2'] ), 'ndf': int( result['ndf'] ), 'status': int( result['status'] ), 'fitTime': float( result['time'] ) }
+
+def runJob( index ):
+	"""Run one of pendingJobs, returns [ index, row of the summary ]. An exception is kept in the row as a traceback"""
+
+	description, function, arguments = pendingJobs[ index ]
+	startTime = time.time()
+	try:
+		result = function( *arguments )
+		error = None
+	except Exception:
+		result = None
+		error = traceback.format_exc()
+	sys.stdout.flush()
+	row = dict( description )
+	row.update( resultRow( result ) )
+	row.update( { 'time': time.time() - startTime, 'error': error } )
+	return [ index, row ]
+
+def runFitJobs( listJobs, jobs=1 ):
+	"""Run all the jobs, in order with jobs=1 or in a pool of jobs processes. Returns the rows of the summary in the order of listJobs"""
+
+	del pendingJobs[:]
+	pendingJobs.extend( listJobs )
+	if jobs > 1 and len(listJobs) > 1:
+		print '------> Running '+str( len(listJobs) )+' fits in '+str( jobs )+' processes'
+	return [ row for index, row in runChunks( runJob, range( len(listJobs) ), jobs ) ]
+
+def summaryTable( rows, keys ):
+	"""Text table with one line per fit: the keys of the description, status, chi2/ndf, time and parameters"""
+
+	header = keys + [ 'status', 'chi2/ndf', 'time [s]', 'parameters' ]
+	lines = []
+	for row in rows:
+		status = ( 'failed' if row['error'] else str( row['status'] ) )
+		chi2 = ( '%.2f/%d' % ( row['chi2'], row['ndf'] ) if row['chi2'] is not None else '-' )
+		lines.append( [ str( row[ k ] ) for k in keys ] + [ status, chi2, '%.2f' % row['time'], ' '.join( '%.4g' % p for p in row['parameters'] ) ] )
+	widths = [ max( len( x ) for x in column ) for column in zip( header, *lines ) ]
+	return '\n'.join( '  '.join( x.ljust( w ) for x, w in zip( line, widths ) ).rstrip() for line in [ header ] + lines )
+
+def writeSummary( rows, fileName ):
+	"""All the rows as json, for the datacards or a later comparison"""
+	with open( fileName, 'w' ) as summaryFile: json.dump( rows, summaryFile, indent=1, sort_keys=True )
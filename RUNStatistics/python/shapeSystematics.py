@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+
+'''
+File: shapeSystematics.py
+Description: JES and JER shape variations of a signal histogram. The cumulative distribution
+	     of the histogram is built once at its bin edges, a variation reads it at the scaled
+	     edges ( x*scale for the energy scale, mass + ( x - mass )*scale for the resolution )
+	     with a linear interpolation, and its contents are the differences between consecutive
+	     edges. All the variations of a list of magnitudes are one np.interp call.
+'''
+
+import numpy as np
+
+def cumulative( edges, contents ):
+	"""CDF of the histogram at its bin edges: 0 at the first edge and the sum of the bins up to each upper edge"""
+	return np.asarray( edges, dtype=np.float64 ), np.concatenate( [ [ 0. ], np.cumsum( np.asarray( contents, dtype=np.float64 ) ) ] )
+
+def scaledEdges( edges, scales, mass=None ):
+	"""Array ( len(scales), len(edges) ) of the edges scaled by each scale, around mass if given"""
+	edges = np.asarray( edges, dtype=np.float64 )[ np.newaxis, : ]
+	scales = np.atleast_1d( np.asarray( scales, dtype=np.float64 ) )[ :, np.newaxis ]
+	if mass is None: return edges*scales
+	return mass + ( edges - mass )*scales
+
+def scaledShapes( edges, contents, scales, mass=None ):
+	"""Contents of the histogram read at the scaled edges, one row per scale. Outside the histogram the CDF is flat,
+	so no events come from beyond its range"""
+	cdfEdges, cdf = cumulative( edges, contents )
+	return np.diff( np.interp( scaledEdges( edges, scales, mass ), cdfEdges, cdf ), axis=1 )
+
+def shapeVariations( edges, contents, magnitudes, mass=None ):
+	"""( up, down ) arrays ( len(magnitudes), bins ): JES variations ( mass None ) or JER variations around mass for each
+	magnitude. Up reads the histogram at the edges scaled by 1 - magnitude ( the shape moves up ), down at 1 + magnitude"""
+	magnitudes = np.atleast_1d( np.asarray( magnitudes, dtype=np.float64 ) )
+	shapes = scaledShapes( edges, contents, np.concatenate( [ 1. - magnitudes, 1. + magnitudes ] ), mass )
+	return shapes[ :len(magnitudes) ], shapes[ len(magnitudes): ]
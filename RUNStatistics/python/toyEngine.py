@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+
+'''
+File: toyEngine.py
+Description: Binned pseudo-experiments of the dijet mass spectrum and bias/coverage study of
+	     the P4 + gaussian fit. A batch of toys is one numpy Poisson ( or multinomial ) draw
+	     from the expected background, optionally with a gaussian signal injected at the
+	     mass. The toys are fitted in batches in a pool of processes, each batch has its own
+	     seed from ( seed, mass point, batch ) so the results do not depend on the number of
+	     processes.
+'''
+
+import time
+import numpy as np
+from scipy.special import ndtr
+from dijetFitter import fitBins
+try: from RUNA.RUNAnalysis.commonFunctions import runChunks
+except ImportError: from commonFunctions import runChunks
+
+def generateToys( expected, nToys, seed=0, fixedTotal=False ):
+	"""Array ( nToys, len(expected) ) of pseudo-datasets. Poisson in each bin, or with fixedTotal
+	a multinomial of round( sum( expected ) ) events ( as TH1::FillRandom )"""
+	randomState = np.random.RandomState( seed )
+	expected = np.clip( np.asarray( expected, dtype=np.float64 ), 0, None )
+	if fixedTotal: return randomState.multinomial( int( round( expected.sum() ) ), expected/expected.sum(), size=nToys ).astype( np.float64 )
+	return randomState.poisson( expected, size=( nToys, len(expected) ) ).astype( np.float64 )
+
+def gaussianSignal( edges, mass, width, numEvents ):
+	"""Expected events in each bin ( between consecutive edges ) of a gaussian signal of numEvents events"""
+	cdf = ndtr( ( np.asarray( edges, dtype=np.float64 ) - mass )/width )
+	return numEvents*np.diff( cdf )
+
+def fitBatch( arguments ):
+	"""Fit of one batch of toys with P4 + gaus at the mass ( mean and width fixed ).
+	Returns [ mass index, batch, fitted signal events, their errors, fit status ] for the toys of the batch"""
+
+	massIndex, batch, x, expected, nToys, seed, bkgParameters, mass, width = arguments
+	toys = generateToys( expected, nToys, [ seed, massIndex, batch ] )
+	#### events of the signal shape in the fitted bins per unit of amplitude of the gaussian
+	shapeSum = np.sum( np.exp( -0.5*( ( x - mass )/width )**2 ) )
+	background = np.interp( mass, x, expected )
+	initial = list( bkgParameters ) + [ max( np.sqrt( background ), 1. ), mass, width ]
+	yields, errors, status = [], [], []
+	for toy in toys:
+		result = fitBins( 'P4Gaus', x, toy, initial=initial, nStarts=1, fixed=[ 5, 6 ] )
+		yields.append( result['parameters'][4]*shapeSum )
+		errors.append( result['errors'][4]*shapeSum )
+		status.append( result['status'] )
+	return [ massIndex, batch, yields, errors, status ]
+
+def toySummary( mass, injected, yields, errors, status ):
+	"""Bias and coverage of the fitted signal of the converged toys: pull = ( fitted - injected )/error,
+	coverage is the fraction of toys with |pull| < 1 ( 0.683 expected )"""
+	good = ( status == 0 ) & ( errors > 0 )
+	pulls = ( yields[ good ] - injected )/errors[ good ]
+	summary = { 'mass': mass, 'toys': len(status), 'failed': int( np.sum( ~good ) ), 'injected': injected }
+	if good.sum() == 0: return dict( summary, meanYield=None, bias=None, pullMean=None, pullWidth=None, coverage=None )
+	return dict( summary, meanYield=float( np.mean( yields[ good ] ) ), bias=float( np.mean( yields[ good ] ) - injected ),
+			pullMean=float( np.mean( pulls ) ), pullWidth=float( np.std( pulls ) ), coverage=float( np.mean( np.abs( pulls ) < 1 ) ) )
+
+def toyStudy( x, edges, background, masses, widths, injected=0., nToys=1000, batchSize=100, seed=0, jobs=1 ):
+	"""Bias and coverage study at each mass: toys from background ( expected events in the bins of centers x and edges )
+	plus a gaussian of injected events and width widths[i] at masses[i], fitted with P4 + gaus.
+	Returns one toySummary per mass, with the time of the study"""
+
+	startTime = time.time()
+	x, background = [ np.asarray( a, dtype=np.float64 ) for a in [ x, background ] ]
+	bkgParameters = fitBins( 'P4', x, background )['parameters']
+	listBatches = []
+	injectedEvents = []
+	for i, mass in enumerate( masses ):
+		signal = gaussianSignal( edges, mass, widths[i], injected )
+		injectedEvents.append( signal.sum() )
+		for batch in range( 0, nToys, batchSize ): listBatches.append( [ i, batch//batchSize, x, background+signal, min( batchSize, nToys-batch ), seed, bkgParameters, mass, widths[i] ] )
+
+	#### batches in order, the same numbers for any number of processes
+	results = list( runChunks( fitBatch, listBatches, jobs ) )
+
+	summaries = []
+	for i, mass in enumerate( masses ):
+		massResults = [ r for r in results if r[0] == i ]
+		yields, errors, status = [ np.concatenate( [ np.asarray( r[k], dtype=np.float64 ) for r in massResults ] ) for k in [ 2, 3, 4 ] ]
+		summaries.append( toySummary( mass, injectedEvents[i], yields, errors, status ) )
+	for summary in summaries: summary['time'] = time.time() - startTime
+	return summaries
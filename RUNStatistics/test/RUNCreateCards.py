@@ -10,14 +10,19 @@ from array import array
 import argparse
 import glob,sys, os
 import warnings
-import random
 import numpy as np
 from multiprocessing import Process
 try: 
 	from RUNA.RUNAnalysis.scaleFactors import *
+	from RUNA.RUNStatistics.toyEngine import generateToys
+	from RUNA.RUNStatistics.shapeSystematics import shapeVariations
+	from RUNA.RUNAnalysis.histoArrays import toArrays, fromArrays
 except ImportError: 
 	sys.path.append('../python') 
 	from scaleFactors import *
+	from toyEngine import generateToys
+	from shapeSystematics import shapeVariations
+	from histoArrays import toArrays, fromArrays
 
 
 currentDir = os.getcwdu()
@@ -30,7 +35,15 @@ if os.access('RooPowerFunction.cxx', os.R_OK): ROOT.gROOT.ProcessLine('.L RooPow
 #line.SetLineColor(kRed)
 
 
-def shapeCards( process, isData, datahistosFile, histosFile, signalHistosFile, signalSample, hist, signalMass, minMass, maxMass, jesValue, jerValue, lumiUnc, outputName ):
+def magnitudeTag( value ): return ( '%g' % value ).replace( '.', 'p' )
+
+def systematicHisto( hSignal, key, contents ):
+	"""Clone of the signal histogram with the contents of a shape variation ( without errors, as a reset histogram filled with SetBinContent )"""
+	histo = hSignal.Clone( hSignal.GetName()+'_'+key )
+	histo.Reset()
+	return fromArrays( histo, np.concatenate( [ [ 0. ], contents, [ 0. ] ] ), np.zeros( len(contents)+2 ) )
+
+def shapeCards( process, isData, datahistosFile, histosFile, signalHistosFile, signalSample, hist, signalMass, minMass, maxMass, jesValues, jerValues, lumiUnc, outputName ):
 	"""function to run Roofit and save workspace for RooStats"""
 	warnings.filterwarnings( action='ignore', category=RuntimeWarning, message='.*class stack<RooAbsArg\*,deque<RooAbsArg\*> >' )
 	
@@ -77,9 +90,11 @@ def shapeCards( process, isData, datahistosFile, histosFile, signalHistosFile, s
 		### S+B model
 
 	if not isData:
-		newNumEvents = random.randint( bkgAcc-round(TMath.Sqrt(bkgAcc)), bkgAcc+round(TMath.Sqrt(bkgAcc)) )
-		print 'Events in MC:', bkgAcc, ', in PseudoExperiment:', newNumEvents
-		hPseudo.FillRandom( hBkg, newNumEvents ) 
+		#### Poisson pseudo-data from the background, the same for the same seed and mass
+		pseudoData = generateToys( [ hBkg.GetBinContent( ibin ) for ibin in range( 1, hBkg.GetNbinsX()+1 ) ], 1, [ args.seed, signalMass ] )[0]
+		print 'Events in MC:', bkgAcc, ', in PseudoExperiment:', pseudoData.sum()
+		pseudoData = np.concatenate( [ [ 0. ], pseudoData, [ 0. ] ] )
+		fromArrays( hPseudo, pseudoData, pseudoData )
 		#hPseudo.Scale(1/hPseudo.Integral())
 
 	#hData = histosFile.Get('massAve_prunedMassAsymVsdeltaEtaDijet_ABCDProj')
@@ -94,112 +109,69 @@ def shapeCards( process, isData, datahistosFile, histosFile, signalHistosFile, s
 	#res = model.fitTo(rooDataHist, RooFit.Save(kTRUE), RooFit.Strategy(0))
 	#res.Print()
 
-	############# JES and JER uncertainties
-        hSigSyst = {}
-        hSigSystDataHist = {}
-        signalCDF = TGraph(hSignal.GetNbinsX()+1)
-
-        # JES and JER uncertainties
-	if args.jesUnc or args.jerUnc:
-		signalCDF.SetPoint(0,0.,0.)
-		integral = 0.
-		for i in range(1, hSignal.GetNbinsX()+1):
-			x = hSignal.GetXaxis().GetBinLowEdge(i+1)
-			integral = integral + hSignal.GetBinContent(i)
-			signalCDF.SetPoint(i,x,integral)
-
+	############# JES and JER uncertainties, the shapes of all the magnitudes at once
+	edges = np.array( [ hSignal.GetXaxis().GetBinLowEdge(i) for i in range(1, hSignal.GetNbinsX()+2) ] )
+	signalContents = toArrays( hSignal )[0][1:-1]
+	if args.jesUnc: 
+		print ' |---> Adding JES'
+		jesUp, jesDown = shapeVariations( edges, signalContents, jesValues )
+	if args.jerUnc: 
+		print ' |---> Adding JER'
+		jerUp, jerDown = shapeVariations( edges, signalContents, jerValues, float(signalMass) )
+
+	#### one workspace and datacard per pair of magnitudes, the name has the magnitudes if there are more than one
+	scan = [ ( i, j ) for i in range( len(jesValues) ) for j in range( len(jerValues) ) ]
+	for i, j in scan:
+		scanName = outputName + ( '_JES'+magnitudeTag( jesValues[i] )+'_JER'+magnitudeTag( jerValues[j] ) if len(scan) > 1 else '' )
+		hSigSyst = {}
 		if args.jesUnc:
-			print ' |---> Adding JES'
-			hSigSyst['JESUp'] = hSignal.Clone()
-			hSigSyst['JESDown'] = hSignal.Clone()
-
+			hSigSyst['JESUp'] = systematicHisto( hSignal, 'JESUp', jesUp[i] )
+			hSigSyst['JESDown'] = systematicHisto( hSignal, 'JESDown', jesDown[i] )
 		if args.jerUnc:
-			print ' |---> Adding JER'
-			hSigSyst['JERUp'] = hSignal.Clone()
-			hSigSyst['JERDown'] = hSignal.Clone()
-
-        # reset signal histograms
-        for key in hSigSyst:
-		hSigSyst[key].Reset()
-		hSigSyst[key].SetName(hSigSyst[key].GetName() + '_' + key)
-
-        # produce JES signal shapes
-        if args.jesUnc:
-		for q in range(1, hSignal.GetNbinsX()+1):
-			xLow = hSignal.GetXaxis().GetBinLowEdge(q)
-			xUp = hSignal.GetXaxis().GetBinLowEdge(q+1)
-			jes = 1. - jesValue
-			xLowPrime = jes*xLow
-			xUpPrime = jes*xUp
-			hSigSyst['JESUp'].SetBinContent(q, signalCDF.Eval(xUpPrime) - signalCDF.Eval(xLowPrime))
-			jes = 1. + jesValue
-			xLowPrime = jes*xLow
-			xUpPrime = jes*xUp
-			hSigSyst['JESDown'].SetBinContent(q, signalCDF.Eval(xUpPrime) - signalCDF.Eval(xLowPrime))
-		hSigSystDataHist['JESUp'] = RooDataHist('hSignalJESUp','hSignalJESUp',RooArgList(massAve),hSigSyst['JESUp'])
-		hSigSystDataHist['JESDown'] = RooDataHist('hSignalJESDown','hSignalJESDown',RooArgList(massAve),hSigSyst['JESDown'])
-
-        # produce JER signal shapes
-	if args.jerUnc:
-		for i in range(1, hSignal.GetNbinsX()+1):
-			xLow = hSignal.GetXaxis().GetBinLowEdge(i)
-			xUp = hSignal.GetXaxis().GetBinLowEdge(i+1)
-			jer = 1. - jerValue
-			xLowPrime = jer*(xLow-float(signalMass))+float(signalMass)
-			xUpPrime = jer*(xUp-float(signalMass))+float(signalMass)
-			hSigSyst['JERUp'].SetBinContent(i, signalCDF.Eval(xUpPrime) - signalCDF.Eval(xLowPrime))
-			jer = 1. + jerValue
-			xLowPrime = jer*(xLow-float(signalMass))+float(signalMass)
-			xUpPrime = jer*(xUp-float(signalMass))+float(signalMass)
-			hSigSyst['JERDown'].SetBinContent(i, signalCDF.Eval(xUpPrime) - signalCDF.Eval(xLowPrime))
-		hSigSystDataHist['JERUp'] = RooDataHist('hSignalJERUp','hSignalJERUp',RooArgList(massAve),hSigSyst['JERUp'])
-		hSigSystDataHist['JERDown'] = RooDataHist('hSignalJERDown','hSignalJERDown',RooArgList(massAve),hSigSyst['JERDown'])
-
-	myWS = RooWorkspace("myWS")
-	getattr(myWS,'import')(rooSigHist,RooFit.Rename("signal"))
-        getattr(myWS,'import')(rooBkgHist,RooFit.Rename("background"))
-        #getattr(myWS,'import')(signal_norm)
-        getattr(myWS,'import')(background_norm)
-        if args.jesUnc:
-		getattr(myWS,'import')(hSigSystDataHist['JESUp'],RooFit.Rename("signal__JESUp"))
-		getattr(myWS,'import')(hSigSystDataHist['JESDown'],RooFit.Rename("signal__JESDown"))
-        if args.jerUnc:
-		getattr(myWS,'import')(hSigSystDataHist['JERUp'],RooFit.Rename("signal__JERUp"))
-		getattr(myWS,'import')(hSigSystDataHist['JERDown'],RooFit.Rename("signal__JERDown"))
-        getattr(myWS,'import')(rooDataHist,RooFit.Rename("data_obs"))
-        myWS.Print()
-	outputRootFile = currentDir+'/Rootfiles/workspace_'+outputName+'.root'
-        myWS.writeToFile(outputRootFile, True)
-	print ' |----> Workspace created in root file:\n', outputRootFile
- # -----------------------------------------
-        # write a datacard
-
-	dataCardName = currentDir+'/Datacards/datacard_'+outputName+'.txt'
-        datacard = open( dataCardName ,'w')
-        datacard.write('imax 1\n')
-        datacard.write('jmax 1\n')
-        datacard.write('kmax *\n')
-        datacard.write('---------------\n')
-        if args.jesUnc or args.jerUnc or args.lumiUnc or args.normUnc or args.unc: 
-		datacard.write('shapes * * '+outputRootFile+' myWS:$PROCESS myWS:$PROCESS__$SYSTEMATIC\n')
-	else: datacard.write("shapes * * "+outputRootFile+" myWS:$PROCESS \n")
-        datacard.write('---------------\n')
-        datacard.write('bin 1\n')
-        datacard.write('observation -1\n')
-        datacard.write('------------------------------\n')
-        datacard.write('bin          1          1\n')
-        datacard.write('process      signal     background\n')
-        datacard.write('process      0          1\n')
-        datacard.write('rate         -1         -1\n')
-        datacard.write('------------------------------\n')
-	if args.lumiUnc: datacard.write('lumi  lnN    %f         -\n'%(lumiUnc))
-        if args.jesUnc: datacard.write('JES  shape   1          -\n')
-	if args.jerUnc: datacard.write('JER  shape   1          -\n')
-        #flat parameters --- flat prior
-	if args.normUnc: datacard.write('background_norm  flatParam\n')
-        #datacard.write('p1  flatParam\n')
-        datacard.close()
-	print ' |----> Datacard created:\n', dataCardName
+			hSigSyst['JERUp'] = systematicHisto( hSignal, 'JERUp', jerUp[j] )
+			hSigSyst['JERDown'] = systematicHisto( hSignal, 'JERDown', jerDown[j] )
+		hSigSystDataHist = dict( ( key, RooDataHist( 'hSignal'+key, 'hSignal'+key, RooArgList(massAve), hSigSyst[key] ) ) for key in hSigSyst )
+
+		myWS = RooWorkspace("myWS")
+		getattr(myWS,'import')(rooSigHist,RooFit.Rename("signal"))
+		getattr(myWS,'import')(rooBkgHist,RooFit.Rename("background"))
+		#getattr(myWS,'import')(signal_norm)
+		getattr(myWS,'import')(background_norm)
+		for key in sorted( hSigSystDataHist ): getattr(myWS,'import')(hSigSystDataHist[key],RooFit.Rename("signal__"+key))
+		getattr(myWS,'import')(rooDataHist,RooFit.Rename("data_obs"))
+		myWS.Print()
+		outputRootFile = currentDir+'/Rootfiles/workspace_'+scanName+'.root'
+		myWS.writeToFile(outputRootFile, True)
+		print ' |----> Workspace created in root file:\n', outputRootFile
+		# -----------------------------------------
+		# write a datacard
+
+		dataCardName = currentDir+'/Datacards/datacard_'+scanName+'.txt'
+		datacard = open( dataCardName ,'w')
+		datacard.write('imax 1\n')
+		datacard.write('jmax 1\n')
+		datacard.write('kmax *\n')
+		datacard.write('---------------\n')
+		if args.jesUnc or args.jerUnc or args.lumiUnc or args.normUnc or args.unc: 
+			datacard.write('shapes * * '+outputRootFile+' myWS:$PROCESS myWS:$PROCESS__$SYSTEMATIC\n')
+		else: datacard.write("shapes * * "+outputRootFile+" myWS:$PROCESS \n")
+		datacard.write('---------------\n')
+		datacard.write('bin 1\n')
+		datacard.write('observation -1\n')
+		datacard.write('------------------------------\n')
+		datacard.write('bin          1          1\n')
+		datacard.write('process      signal     background\n')
+		datacard.write('process      0          1\n')
+		datacard.write('rate         -1         -1\n')
+		datacard.write('------------------------------\n')
+		if args.lumiUnc: datacard.write('lumi  lnN    %f         -\n'%(lumiUnc))
+		if args.jesUnc: datacard.write('JES  shape   1          -\n')
+		if args.jerUnc: datacard.write('JER  shape   1          -\n')
+		#flat parameters --- flat prior
+		if args.normUnc: datacard.write('background_norm  flatParam\n')
+		#datacard.write('p1  flatParam\n')
+		datacard.close()
+		print ' |----> Datacard created:\n', dataCardName
 
 
 if __name__ == '__main__':
@@ -215,6 +187,9 @@ if __name__ == '__main__':
 	parser.add_argument('-u', '--unc', dest='unc', type=bool, default=False, help='Luminosity, example: 1.' )
 	parser.add_argument('-g', '--grom', action='store', default='pruned', dest='grooming', help='Grooming Algorithm, example: Pruned, Filtered.' )
 	parser.add_argument('-b', '--decay', action='store', default='UDD312', dest='decay', help='Decay, example: UDD312, UDD323.' )
+	parser.add_argument('--seed', action='store', type=int, default=0, help='Seed of the pseudo-data.' )
+	parser.add_argument('--jesValues', action='store', type=float, nargs='+', default=None, help='Scan of JES magnitudes, one workspace and datacard per value (default 0.02).' )
+	parser.add_argument('--jerValues', action='store', type=float, nargs='+', default=None, help='Scan of JER magnitudes, one workspace and datacard per value (default 0.1).' )
 
 	try:
 		args = parser.parse_args()
@@ -263,6 +238,6 @@ if __name__ == '__main__':
 		print '#'*50 
 		print ' |----> Creating datacard and workspace for RPV St', str(mass)
 		print '#'*50 
-		p = Process( target=shapeCards, args=( args.process, args.isData, TFile(dataFileHistos), TFile(bkgFileHistos), TFile(signalFileHistos), signalSample, masses[ mass ], mass, minMass, maxMass, jesValue, jerValue, lumiUnc, outputName ) )
+		p = Process( target=shapeCards, args=( args.process, args.isData, TFile(dataFileHistos), TFile(bkgFileHistos), TFile(signalFileHistos), signalSample, masses[ mass ], mass, minMass, maxMass, ( args.jesValues or [ jesValue ] ), ( args.jerValues or [ jerValue ] ), lumiUnc, outputName ) )
 		p.start()
 		p.join()
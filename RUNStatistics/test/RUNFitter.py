@@ -8,20 +8,31 @@
 from ROOT import *
 from array import array
 import argparse
-import glob,sys, os
+import glob,sys, os, time
 import warnings
-import random
 import numpy as np
 from multiprocessing import Process
 try: 
 	import RUNA.RUNAnalysis.CMS_lumi as CMS_lumi 
 	from RUNA.RUNAnalysis.histoLabels import labels, labelAxis 
 	import RUNA.RUNAnalysis.tdrstyle as tdrstyle
+	from RUNA.RUNStatistics.dijetFitter import evaluate, pullsAndResiduals
+	from RUNA.RUNStatistics.fitCampaign import runFitJobs, summaryTable, writeSummary
+	from RUNA.RUNStatistics.fitCache import cachedFit, fingerprint, configure as configureFitCache
+	from RUNA.RUNStatistics.toyEngine import generateToys, toyStudy
+	from RUNA.RUNAnalysis.commonFunctions import getArrays, entryRanges
+	from RUNA.RUNAnalysis.histoArrays import fromArrays
 except ImportError:
 	sys.path.append('../python') 
 	import CMS_lumi as CMS_lumi 
 	from histoLabels import labels, labelAxis 
 	import tdrstyle as tdrstyle
+	from dijetFitter import evaluate, pullsAndResiduals
+	from fitCampaign import runFitJobs, summaryTable, writeSummary
+	from fitCache import cachedFit, fingerprint, configure as configureFitCache
+	from toyEngine import generateToys, toyStudy
+	from commonFunctions import getArrays, entryRanges
+	from histoArrays import fromArrays
 
 gSystem.SetIncludePath('-I$ROOFITSYS/include')
 if os.access('RooPowerFunction.cxx', os.R_OK): ROOT.gROOT.ProcessLine('.L RooPowerFunction.cxx+')
@@ -53,21 +64,20 @@ expoPoli = TF1("expoPoli", "exp([0]+[1]*x+[2]*x*x+[3]*x*x*x+[4]*x*x*x*x)", 0, 10
 landau = TF1("landau","[0]*TMath::Landau(-x,[1],[2])",50,300)
 gaus = TF1("gaus", "gaus", 0, 2000);
 P4Gaus = TF1("P4Gaus", "[0]*pow(1-(x/13000.0),[1])/pow(x/13000.0,[2]+([3]*log(x/13000.)))+gaus(4)",0,2000);
+#### background functions of the fit campaign and their initial parameters
+bkgFunctions = { 'P4': P4, 'expoPoli': expoPoli, 'landau': landau }
+bkgInitialParameters = { 'P4': [ 0.1, 100, 2, 0.1 ] }
 massBins = [0, 30, 60, 90, 120, 150, 180, 210, 250, 290, 330, 370, 410, 460, 510, 560, 610, 670, 730, 790, 860, 930, 1000, 1080, 1160, 1240, 1330, 1420, 1520, 1620, 1730, 1840, 2000]
 
-def createPseudoExperiment():
-	"""docstring for createPseudoExperiment"""
-	h1 = inFileBkg.Get(folder+'/' + hist)
-	binSize = h1.GetBinWidth(1)
-	P4PSE = TF1("P4PSE", "[0]*pow(1-x/13000.0,[1])/pow(x/13000.0,[2]+[3]*log(x/13000.))", minX, maxX);
-	P4PSE.SetParameter(0,bkgParameters[0])				
-	P4PSE.SetParameter(1,bkgParameters[1])
-	P4PSE.SetParameter(2,bkgParameters[2])
-	P4PSE.SetParameter(3,bkgParameters[3])
-	randomNumEventsQCD = random.randint( bkgParameters[4]-round(sqrt(bkgParameters[4])), bkgParameters[4]+round(sqrt(bkgParameters[4])) )
-	print "randomNumberOf QCD events", randomNumEventsQCD
-	hMainPSE = TH1D("hbkgPSE", "hbkgPSE", int( (maxX-minX)/binSize ) , minX, maxX)
-	hMainPSE.FillRandom( "P4PSE", int(randomNumEventsQCD) )
+def createPseudoExperiment( bkgParameters, numEvents, minX, maxX, binSize, xTitle, outputName, seed=0 ):
+	"""Binned pseudo-experiment from the P4 with bkgParameters, Poisson in each bin around numEvents events in total.
+	The plot is saved as outputName, xTitle is the title of its x axis"""
+	edges = np.arange( minX, maxX+binSize/2., binSize )
+	expected = evaluate( 'P4', 0.5*( edges[1:] + edges[:-1] ), bkgParameters )
+	toy = generateToys( numEvents*expected/expected.sum(), 1, seed )[0]
+	print "randomNumberOf QCD events", toy.sum()
+	hMainPSE = TH1D("hbkgPSE", "hbkgPSE", len(toy), minX, maxX)
+	for ibin in range( len(toy) ): hMainPSE.SetBinContent( ibin+1, toy[ibin] )
 	c1 = TCanvas('c1', 'c1',  10, 10, 750, 500 )
 	c1.SetLogy()
 	gStyle.SetOptFit()
@@ -75,14 +85,44 @@ def createPseudoExperiment():
 	gStyle.SetStatX(0.9)
 	gStyle.SetStatW(0.15)
 	gStyle.SetStatH(0.15) 
-	hMainPSE.GetXaxis().SetTitle( histYaxis )
+	hMainPSE.GetXaxis().SetTitle( xTitle )
 	hMainPSE.GetYaxis().SetTitle("Events / 10 GeV" ) # dN/dM_{bbjj} [GeV^{-1}]")
 	hMainPSE.GetYaxis().SetTitleOffset(1.2);
 	hMainPSE.SetTitle("QCD PseudoExperiments")
 	hMainPSE.Sumw2()
 	hMainPSE.Draw()
-	c1.SaveAs(outputDir+hist+"_PseudoExperiment_"+PU+"_Fit.pdf")
+	c1.SaveAs( outputName )
 	del c1
+	return hMainPSE
+
+def toyStudyFit( inFileBkg, hist, folder, masses, minX, maxX, rebinX, nToys, injected, widthFraction, seed, jobs ):
+	"""Bias and coverage of the signal fitted with P4 + gaus in toys from the background histogram, with injected
+	signal events of width widthFraction*mass at each mass. Prints and returns the summary per mass"""
+
+	hInitialBkg = inFileBkg.Get(folder+hist).Clone()
+	hInitialBkg.Rebin(rebinX)
+	bins = [ ibin for ibin in range( 1, hInitialBkg.GetNbinsX()+1 ) if minX <= hInitialBkg.GetBinCenter( ibin ) <= maxX ]
+	binCenters = np.array( [ hInitialBkg.GetBinCenter( ibin ) for ibin in bins ] )
+	binEdges = np.array( [ hInitialBkg.GetXaxis().GetBinLowEdge( ibin ) for ibin in bins ] + [ hInitialBkg.GetXaxis().GetBinUpEdge( bins[-1] ) ] )
+	template = np.array( [ hInitialBkg.GetBinContent( ibin ) for ibin in bins ] )
+
+	summaries = toyStudy( binCenters, binEdges, template, masses, [ widthFraction*mass for mass in masses ], injected, nToys, seed=seed, jobs=jobs )
+	print '|----> Toys: %d per mass, injected signal: %.1f events, time: %.1f s' % ( nToys, injected, summaries[0]['time'] )
+	print '|---->   mass   failed   mean fitted   bias   pull mean   pull width   coverage'
+	for s in summaries: 
+		if s['coverage'] is None: print '|----> %6d %8d   all the fits failed' % ( s['mass'], s['failed'] )
+		else: print '|----> %6d %8d %13.2f %6.2f %11.3f %12.3f %10.3f' % ( s['mass'], s['failed'], s['meanYield'], s['bias'], s['pullMean'], s['pullWidth'], s['coverage'] )
+	return summaries
+
+def fitFunctionName( fitFunction ):
+	"""Key of dijetFitter.fitModels of a TF1, the P4 of FitterCombination is called mainP4"""
+	return fitFunction.GetName().replace( 'main', '' )
+
+def setFitParameters( fitFunction, result ):
+	"""Parameters and errors of a dijetFitter result in the TF1, to draw it"""
+	for k in range( len( result['parameters'] ) ):
+		fitFunction.SetParameter( k, result['parameters'][k] )
+		fitFunction.SetParError( k, result['errors'][k] )
 
 def rootFitter( inFileBkg, hist, folder, fitFunction, fitParam, minX, maxX, rebinX, plot, log=True ):
 	"""Simple rootFitter"""
@@ -115,23 +155,15 @@ def rootFitter( inFileBkg, hist, folder, fitFunction, fitParam, minX, maxX, rebi
 		hBkg.SetBinContent( ibin, binContents[ibin] )
 		hBkg.SetBinError( ibin, binError[ibin] )
 
-	if( len(fitParam)>0 ):
-		for k in range( len(fitParam) ): fitFunction.SetParameter(k, fitParam[k])
-
-	fitStatus = 0
-	numParam = 0
-	for loop in range(0,10):
-		#result = hBkg.Fit(fitFunction,"MELLS","",minX,maxX)
-		result = hBkg.Fit( fitFunction,"ELLSR","",minX,maxX)
-		fitStatus = int(result.Status())
-		numParam = result.NFreeParameters()
-		print "|----> Fit status : %d" % fitStatus
-		if(fitStatus==1):
-			stopProgram=0
-			result.Print("V")
-			break
-
-	fitParameters =  [ fitFunction.GetParameter(k) for k in range( numParam ) ]
+	##### binned likelihood fit of the bins inside the range, the fits of the same histogram are one family of the fit cache
+	binCenters = np.array( [ tmpHBkg.GetBinCenter( ibin ) for ibin in range( int( minX/binSize), int(maxX/binSize ) ) ] )
+	inRange = ( binCenters >= minX ) & ( binCenters <= maxX )
+	family = fingerprint( folder+hist, [ tmpHBkg.GetBinContent( ibin ) for ibin in range( tmpHBkg.GetNbinsX()+2 ) ], [ tmpHBkg.GetBinError( ibin ) for ibin in range( tmpHBkg.GetNbinsX()+2 ) ] )
+	result = cachedFit( fitFunctionName( fitFunction ), binCenters[ inRange ], binContents[ inRange ], binError[ inRange ], fitParam, family, ( minX, maxX ), rebinX )
+	print "|----> Fit status : %d, chi2/ndf : %.2f/%d, time : %.3f s%s" % ( result['status'], result['chi2'], result['ndf'], result['time'], ( ' (cached)' if result['cached'] else '' ) )
+	setFitParameters( fitFunction, result )
+
+	fitParameters = list( result['parameters'] )
 	print "|----> Fitter parameters for", fitFunction.GetName(), fitParameters
 
 	numEvents = hBkg.Integral( )
@@ -148,10 +180,12 @@ def rootFitter( inFileBkg, hist, folder, fitFunction, fitParam, minX, maxX, rebi
 		hBkg.GetXaxis().SetRangeUser( minX-50, maxX+50 )
 		hBkg.SetTitle("")
 		hBkg.Draw()
+		fitFunction.SetRange( minX, maxX )
+		fitFunction.Draw("same")
 		c1.SaveAs(outputDir+hist+"_"+process+"_"+fitFunction.GetName()+"Fit.pdf")
 		del c1
 	
-	return [ fitParameters, numEvents, binContents, binError ]
+	return [ fitParameters, numEvents, binContents, binError, result ]
 
 def FitterCombination( inFileData, inFileBkg, inFileSignal, hist, folder, bkgFunction, fitParam, minX, maxX, rebinX ):
 	"""docstring for FitterCombination"""
@@ -199,7 +233,11 @@ def FitterCombination( inFileData, inFileBkg, inFileSignal, hist, folder, bkgFun
 		hMain.SetBinContent( ibin, points[ibin] )
 		hMain.SetBinError( ibin, pointsErr[ibin] )
 			
-	hMain.Fit( mainP4, "ELLSR", "", minX, maxX )
+	binCenters = np.array( [ hMain.GetBinCenter( ibin ) for ibin in range( 0, len(points) ) ] )
+	inRange = ( binCenters >= minX ) & ( binCenters <= maxX )
+	result = cachedFit( 'P4', binCenters[ inRange ], np.array( points )[ inRange ], np.array( pointsErr )[ inRange ], [ mainP4.GetParameter( k ) for k in range( 4 ) ], fingerprint( 'FitterCombination', points, pointsErr ), ( minX, maxX ), rebinX )
+	print "|----> Fit status : %d, time : %.3f s%s" % ( result['status'], result['time'], ( ' (cached)' if result['cached'] else '' ) )
+	setFitParameters( mainP4, result )
 	'''
 	P4Gaus.SetParameter(0,bkgParameters[0])				
 	P4Gaus.SetParameter(1,bkgParameters[1])
@@ -231,28 +269,12 @@ def FitterCombination( inFileData, inFileBkg, inFileSignal, hist, folder, bkgFun
 
 
 	######## Calculating Pull and Residual
-	chi2 = 0 
-	nof = 0
-	for ibin in range(0, len(points) ):
-	
-		binCont = points[ibin]
-		binErr = pointsErr[ibin]
-		valIntegral = mainP4.Eval( hMain.GetBinCenter(ibin) ) 
-		diff = (binCont - valIntegral)/ valIntegral
-		#errDiff = diff * TMath.Sqrt( TMath.Power( P4Gaus.GetParError(0) / P4Gaus.GetParameter(0),2 ) + TMath.Power( P4Gaus.GetParError(1)/ P4Gaus.GetParameter(1), 2 )  + TMath.Power( P4Gaus.GetParError(2)/ P4Gaus.GetParameter(2), 2 )  + TMath.Power( P4Gaus.GetParError(3)/ P4Gaus.GetParameter(3), 2 ) )
-		#errDiff = diff * TMath.Sqrt( TMath.Power( mainP4.GetParError(0) / mainP4.GetParameter(0),2 ) + TMath.Power( mainP4.GetParError(1)/ mainP4.GetParameter(1), 2 )  + TMath.Power( mainP4.GetParError(2)/ mainP4.GetParameter(2), 2 )  + TMath.Power( mainP4.GetParError(3)/ mainP4.GetParameter(3), 2 ) )
-		#print binCont, binErr, valIntegral 
-
-		if (binCont != 0):
-			pull = (binCont - valIntegral)/ binErr
-			chi2 += TMath.Power(pull,2)
-			nof += 1
-			
-			hPull.SetBinContent(ibin, pull)
-			hPull.SetBinError(ibin, 1.0)
-	
-			hResidual.SetBinContent(ibin, diff)
-			hResidual.SetBinError(ibin, binErr/valIntegral )
+	pulls, residuals, residualErrors, chi2, nof = pullsAndResiduals( np.array( points ), np.array( pointsErr ), evaluate( 'P4', binCenters, result['parameters'] ) )
+	for ibin in [ int( k ) for k in np.flatnonzero( np.array( points ) != 0 ) ]:
+		hPull.SetBinContent(ibin, pulls[ibin])
+		hPull.SetBinError(ibin, 1.0)
+		hResidual.SetBinContent(ibin, residuals[ibin])
+		hResidual.SetBinError(ibin, residualErrors[ibin] )
 	print '|----> ############### chi2 and nof: ', chi2, nof
 
 
@@ -337,15 +359,38 @@ def FitterCombination( inFileData, inFileBkg, inFileSignal, hist, folder, bkgFun
 	line.Draw("same")
 	c3.SaveAs("Plots/"+hist+"_"+process+"_"+version+"FitP4.pdf")
 	del c3
+	return result
 
 	#return P4GausParameters
 
+def inputFileName( version, sample ):
+	"""Output of RUNMini*Analysis for a sample"""
+	return 'Rootfiles/RUNMini'+version+'Analysis_'+sample+'_RunIISpring15MiniAODv2-74X_Asympt25ns_v09_v02.root'
+
+def signalSample( mass ): return 'RPVStopStopToJets_UDD312_M-'+str(mass)+'-madgraph'
+
+def campaignFit( fitType, processName, mass, function, fileNames ):
+	"""One fit of the campaign: background ( rootFitter of QCD with function ), signal ( gaus ) or combination ( FitterCombination ).
+	It sets the globals process and MASS used by the fitters and opens its own files, an empty name is no file. Returns the dijetFitter result"""
+	global process, MASS
+	process = processName
+	MASS = mass
+	inFiles = [ ( TFile( fileName ) if fileName else '' ) for fileName in fileNames ]
+	if fitType == 'combination':
+		CMS_lumi.extraText = ( "Preliminary Simulation" if 'MC' in process else "Preliminary" )
+		return FitterCombination( inFiles[0], inFiles[1], inFiles[2], hist, folder, P4, bkgInitialParameters['P4'], minFit, maxFit, rebinX )
+	CMS_lumi.extraText = "Preliminary Simulation"
+	if fitType == 'signal': return rootFitter( inFiles[0], hist, folder, gaus, [ ], mass-50, mass+50, rebinX, True, False )[4]
+	return rootFitter( inFiles[0], hist, folder, bkgFunctions[ function ], bkgInitialParameters.get( function, [] ), minFit, maxFit, rebinX, True )[4]
+
 def rooFitter( inFileBkg, inFileSignal, hist, folder, MASS, outputRootFile, minX, maxX ):
 	"""function to run Roofit and save workspace for RooStats"""
 	warnings.filterwarnings( action='ignore', category=RuntimeWarning, message='.*class stack<RooAbsArg\*,deque<RooAbsArg\*> >' )
 
-	P4GausParameters = FitterCombination( inFileBkg, inFileSignal, hist, folder, P4, minX, maxX )
-	bkgAcc = P4GausParameters[7]
+	#### P4 fit of the background histogram, from the fit cache or started from a cached fit in a close range
+	BkgParameters = rootFitter( inFileBkg, hist, folder, P4, bkgInitialParameters['P4'], minX, maxX, 1, False )
+	P4GausParameters = BkgParameters[0]
+	bkgAcc = BkgParameters[1]
 	#sigAcc = P4GausParameters[8]
 	
 	hSignal = inFileSignal.Get(folder+hist)
@@ -596,17 +641,35 @@ def rooFitter( inFileBkg, inFileSignal, hist, folder, MASS, outputRootFile, minX
 #	outputfile.write("# BkgNorm    lnN     -       2.0000\n")
 #	outputfile.close()
 
+def treeFitModel( observable, minX, maxX ):
+	"""Workspace with the P4 + gaussian model of the tree fits, in the observable ( for an unbinned fit the name of the tree branch )"""
+	myWS = RooWorkspace("myWS")
+	myWS.factory("EXPR:bkg_pdf('pow(1-(%(x)s/13000.0),p1)/pow(%(x)s/13000.0,p2+p3*log(%(x)s/13000.))', {%(x)s[%(min)g,%(max)g],p1[0,1000],p2[0,100],p3[0,10]})" % { 'x': observable, 'min': minX, 'max': maxX } )
+	myWS.factory("Gaussian:sig_pdf(%s, mean[90,110], sigma[0,10])" % observable )
+	myWS.factory("SUM:model(nsig[0,10000]*sig_pdf, nbkg[0,1000000]*bkg_pdf)")
+	myWS.Print()
+	return myWS
+
+def writeTreeWorkspace( myWS, observable, outputName ):
+	"""ModelConfig of the tree fit ( nsig as parameter of interest ) and the workspace for RooStats"""
+	modelConfig = RooStats.ModelConfig( 'modelConfig', myWS )
+	modelConfig.SetPdf( myWS.pdf("model") )
+	poi = RooArgSet( myWS.var("nsig") )
+	modelConfig.SetParametersOfInterest( poi )
+	obs = RooArgSet( myWS.var( observable ) )
+	modelConfig.SetObservables( obs )
+	myWS.defineSet("nuisParams","p1,p2,p3,nbkg")
+	modelConfig.SetNuisanceParameters( myWS.set("nuisParams") )
+
+	getattr( myWS, 'import')(modelConfig)
+	myWS.writeToFile( outputName, True )
+	myWS.Print()
+
 def rooFitterTree( inFileBkg, inFileSignal, inFileData, hist, folder ):
 	"""function to run Roofit and save workspace for RooStats"""
 	warnings.filterwarnings( action='ignore', category=RuntimeWarning, message='.*class stack<RooAbsArg\*,deque<RooAbsArg\*> >' )
 	
-	myWS = RooWorkspace("myWS")
-
-	x = RooRealVar( "x", "x", 50., 180. )
-	myWS.factory("EXPR:bkg_pdf('pow(1-(x/13000.0),p1)/pow(x/13000.0,p2+p3*log(x/13000.))', {x[50,180],p1[0,1000],p2[0,100],p3[0,10]})")
-	myWS.factory("Gaussian:sig_pdf(x, mean[90,110], sigma[0,10])")
-	myWS.factory("SUM:model(nsig[0,10000]*sig_pdf, nbkg[0,1000000]*bkg_pdf)")
-	myWS.Print()
+	myWS = treeFitModel( 'x', 50., 180. )
 
 	#x = myWS.var("x")
 	mass = myWS.var("mass")
@@ -638,18 +701,89 @@ def rooFitterTree( inFileBkg, inFileSignal, inFileData, hist, folder ):
 	c1.SaveAs('Plots/'+hist+"_QCD_RPVSt100tojj_"+PU+"_FitP4Gaus_rooFitTree.pdf")
 	del c1
 
-	modelConfig = RooStats.ModelConfig( 'modelConfig', myWS )
-	modelConfig.SetPdf( myWS.pdf("model") )
-	poi = RooArgSet( myWS.var("nsig") )
-	modelConfig.SetParametersOfInterest( poi )
-	obs = RooArgSet( myWS.var("x") )
-	modelConfig.SetObservables( obs )
-	myWS.defineSet("nuisParams","p1,p2,p3,nbkg")
-	modelConfig.SetNuisanceParameters( myWS.set("nuisParams") )
+	writeTreeWorkspace( myWS, 'x', "Rootfiles/workspace_QCD_RPVSt100tojj_FitP4Gaus_"+PU+"_rooFitTree.root" )
+
+def fitBinning( binning, minX, maxX ):
+	"""Bin edges of the binned tree fit in [ minX, maxX ]: the massBins inside the range or bins of width binning ( GeV ).
+	minX and maxX are always edges, the last bin is narrower if the width does not divide the range"""
+	if binning == 'massBins': edges = [ e for e in massBins if minX < e < maxX ]
+	else: edges = list( np.arange( minX, maxX, float( binning ) )[1:] )
+	return np.array( [ minX ] + [ e for e in edges if minX < e < maxX ] + [ maxX ], dtype=np.float64 )
+
+def treeHistogram( tree, branch, edges, name, chunkSize=1000000 ):
+	"""TH1D of a branch of the tree ( unweighted, as the RooDataSet import ), binned with np.histogram from column arrays
+	read in chunks of chunkSize entries, so the tree is never in memory. Entries outside the edges are not kept"""
+	counts = np.zeros( len(edges)-1 )
+	for start, stop in entryRanges( tree.GetEntries(), chunkSize ): 
+		counts += np.histogram( getArrays( tree, [ branch ], '', start, stop )[ branch ], bins=edges )[0]
+	histo = TH1D( name, name, len(edges)-1, array( 'd', edges ) )
+	histo.SetDirectory( 0 )
+	allBins = np.concatenate( [ [ 0. ], counts, [ 0. ] ] )
+	return fromArrays( histo, allBins, allBins )
+
+def rooFitOptions( numCPU ):
+	"""RooCmdArgs of the tree fits: Minuit2, constant terms of the likelihood cached, likelihood evaluated in numCPU processes
+	and vectorized ( batch ) evaluation when this ROOT has it"""
+	options = [ RooFit.Save(True), RooFit.Minimizer("Minuit2", "Migrad"), RooFit.Optimize(2), RooFit.PrintLevel(-1) ]
+	if numCPU > 1: options.append( RooFit.NumCPU( numCPU ) )
+	if hasattr( RooFit, 'EvalBackend' ): options.append( RooFit.EvalBackend( 'cpu' ) )
+	elif hasattr( RooFit, 'BatchMode' ): options.append( RooFit.BatchMode( True ) )
+	return options
+
+def fitParameters( fitResult ):
+	"""{ name: [ value, error ] } of the floating parameters of a RooFitResult"""
+	floatPars = fitResult.floatParsFinal()
+	return dict( ( floatPars.at(i).GetName(), [ floatPars.at(i).getVal(), floatPars.at(i).getError() ] ) for i in range( floatPars.getSize() ) )
+
+def rooFitterTreeBinned( inFileData, hist, folder, branch, binning, minX, maxX, numCPU=1, compare=False ):
+	"""Fit of rooFitterTree on a RooDataHist: the branch of the data tree is binned on the fly ( fitBinning ) instead of 
+	importing the tree in a RooDataSet. With compare, the unbinned fit of the same tree, model and start values is also done
+	to report the speedup and the difference of the parameters in units of their unbinned errors. Returns the summary"""
+	warnings.filterwarnings( action='ignore', category=RuntimeWarning, message='.*class stack<RooAbsArg\*,deque<RooAbsArg\*> >' )
 
-	getattr( myWS, 'import')(modelConfig)
-	myWS.writeToFile("Rootfiles/workspace_QCD_RPVSt100tojj_FitP4Gaus_"+PU+"_rooFitTree.root", True )
-	myWS.Print()
+	myWS = treeFitModel( branch, minX, maxX )
+	pdf = myWS.pdf("model")
+	observable = myWS.var( branch )
+	myWS.saveSnapshot( 'initial', myWS.allVars() )
+	dataTree = inFileData.Get(folder+'/RUNATree' )
+	edges = fitBinning( binning, minX, maxX )
+
+	startTime = time.time()
+	dataHisto = treeHistogram( dataTree, branch, edges, 'data_'+branch )
+	data = RooDataHist( "data", "data", RooArgList( observable ), dataHisto )
+	binnedParameters = fitParameters( pdf.fitTo( data, *rooFitOptions( numCPU ) ) )
+	binnedTime = time.time() - startTime
+	print '|----> Binned fit ( '+str( len(edges)-1 )+' bins, '+str( int( dataHisto.Integral() ) )+' events ): '+'%.2f' % binnedTime+' s'
+	summary = { 'bins': len(edges)-1, 'binnedTime': binnedTime, 'binned': binnedParameters }
+
+	getattr( myWS, 'import')(data)
+	c1 = TCanvas('c1', 'c1',  10, 10, 750, 500 )
+	xframe = observable.frame()
+	data.plotOn( xframe )
+	pdf.plotOn( xframe )
+	pdf.plotOn( xframe, RooFit.Components("bkg_pdf"), RooFit.LineStyle(kDashed) )
+	pdf.plotOn( xframe, RooFit.Components("sig_pdf"), RooFit.LineColor(kRed), RooFit.LineStyle(kDashed) );
+	pdf.paramOn( xframe, RooFit.Layout(0.6,0.9,0.94))
+	xframe.Draw()
+	xframe.GetXaxis().SetTitle( histYaxis )
+	c1.SaveAs('Plots/'+hist+"_QCD_RPVSt100tojj_"+PU+"_FitP4Gaus_rooFitTreeBinned.pdf")
+	del c1
+	writeTreeWorkspace( myWS, branch, "Rootfiles/workspace_QCD_RPVSt100tojj_FitP4Gaus_"+PU+"_rooFitTreeBinned.root" )
+
+	if compare:
+		myWS.loadSnapshot( 'initial' )
+		startTime = time.time()
+		unbinnedData = RooDataSet( "unbinnedData", "unbinnedData", RooArgSet( observable ), RooFit.Import( dataTree ) )
+		unbinnedParameters = fitParameters( pdf.fitTo( unbinnedData, *rooFitOptions( numCPU ) ) )
+		unbinnedTime = time.time() - startTime
+		summary.update( { 'unbinnedTime': unbinnedTime, 'unbinned': unbinnedParameters, 'speedup': unbinnedTime/max( binnedTime, 1e-9 ) } )
+		summary['pulls'] = dict( ( name, ( ( binnedParameters[ name ][0] - value )/error if error > 0 else 0. ) ) for name, ( value, error ) in unbinnedParameters.items() if name in binnedParameters )
+
+		print '|----> Unbinned fit ( '+str( unbinnedData.numEntries() )+' events ): '+'%.2f' % unbinnedTime+' s, binned fit is '+'%.1f' % summary['speedup']+' times faster'
+		print '%-8s %14s %14s %10s' % ( 'param', 'binned', 'unbinned', '(b-u)/err' )
+		for name in sorted( summary['pulls'] ): 
+			print '%-8s %14.5g %14.5g %10.3f' % ( name, binnedParameters[ name ][0], unbinnedParameters[ name ][0], summary['pulls'][ name ] )
+	return summary
 
 
 if __name__ == '__main__':
@@ -661,6 +795,22 @@ if __name__ == '__main__':
 	parser.add_argument('-m', '--mass', action='store', type=int, default=350, help='Decay, example: jj, bj.' )
 	parser.add_argument('-pu', '--PU', action='store', default='Asympt25ns', help='PU, example: PU40bx25.' )
 	parser.add_argument('-l', '--lumi', action='store', default='1000', help='Luminosity, example: 1.' )
+	parser.add_argument('-c', '--campaign', action='store_true', default=False, help='Fit all the masses and background functions, the process (Data, MC or full) is the one of FitterCombination.' )
+	parser.add_argument('--masses', action='store', type=int, nargs='+', default=None, help='Masses of the campaign, default: --mass.' )
+	parser.add_argument('--functions', action='store', nargs='+', default=[ 'P4', 'expoPoli', 'landau' ], choices=[ 'P4', 'expoPoli', 'landau' ], help='Background functions of the campaign.' )
+	parser.add_argument('-j', '--jobs', action='store', type=int, default=1, help='Number of processes for the fits of the campaign.' )
+	parser.add_argument('--toys', action='store', type=int, default=1000, help='Number of toys per mass of the toys process (bias and coverage study).' )
+	parser.add_argument('--injectSignal', action='store', type=float, default=0., help='Signal events injected in the toys.' )
+	parser.add_argument('--signalWidth', action='store', type=float, default=0.1, help='Width of the signal of the toys, as a fraction of the mass.' )
+	parser.add_argument('--seed', action='store', type=int, default=0, help='Seed of the toys.' )
+	parser.add_argument('--noFitCache', action='store_true', default=False, help='Do not read the fit cache, all the fits are done again (and stored).' )
+	parser.add_argument('--fitCacheDir', action='store', default='.fitCache', help='Directory of the fit cache.' )
+	parser.add_argument('--fitCacheSize', action='store', type=int, default=1000, help='Number of fits kept in the cache, the least recently used are removed.' )
+	parser.add_argument('--binnedTree', action='store_true', default=False, help='Tree fit on the branch binned on the fly (RooDataHist) instead of the unbinned RooDataSet.' )
+	parser.add_argument('--treeBranch', action='store', default='massAveForFit', help='Branch of RUNATree of the binned tree fit.' )
+	parser.add_argument('--fitBinning', action='store', default='1', help='Bins of the binned tree fit: width in GeV or massBins.' )
+	parser.add_argument('--numCPU', action='store', type=int, default=1, help='Processes of the likelihood evaluation of the tree fits.' )
+	parser.add_argument('--compareUnbinned', action='store_true', default=False, help='Also run the unbinned tree fit and print the speedup and the parameter differences.' )
 	try:
 		args = parser.parse_args()
 	except:
@@ -673,15 +823,11 @@ if __name__ == '__main__':
 	PU = args.PU
 	lumi = args.lumi
 	MASS = args.mass
+	configureFitCache( directory=args.fitCacheDir, maxEntries=args.fitCacheSize, enabled=not args.noFitCache )
 
 	CMS_lumi.lumi_13TeV = '2.45 fb^{-1}'
 
 	outputDir = "Plots/"
-	fileSignal = TFile('Rootfiles/RUNMini'+version+'Analysis_RPVStopStopToJets_UDD312_M-'+str(MASS)+'-madgraph_RunIISpring15MiniAODv2-74X_Asympt25ns_v09_v02.root')
-	fileBkg = TFile('Rootfiles/RUNMini'+version+'Analysis_QCDPtAll_TuneCUETP8M1_13TeV_pythia8_RunIISpring15MiniAODv2-74X_Asympt25ns_v09_v02.root')
-	fileData = TFile('Rootfiles/RUNMini'+version+'Analysis_JetHTRun2015D-All_RunIISpring15MiniAODv2-74X_Asympt25ns_v09_v02.root')
-	outputRootFile = '/afs/cern.ch/work/a/algomez/Substructure/CMSSW_7_4_5_patch1/src/RUNA/RUNAnalysis/test/Rootfiles/workspace_QCD_RPVSt'+str(MASS)+'tojj_FitP4Gaus_'+PU+'_rooFit_'+lumi+'fb.root'
-
 	###### Input parameters
 	#hist = 'massAve_cutEtaBand' # str ( sys.argv[1] )
 	if 'Resolved' in version: 
@@ -699,8 +845,37 @@ if __name__ == '__main__':
 		rebinX = 1
 	#folder = "ResolvedAnalysisPlots/"      # str ( sys.argv[2] )
 	folder = ""      # str ( sys.argv[2] )
-	
 
+	qcdSample = 'QCDPtAll_TuneCUETP8M1_13TeV_pythia8'
+	dataSample = 'JetHTRun2015D-All'
+	if args.campaign:
+		combination = ( 'Data' if 'Data' in process else ( 'MC' if 'MC' in process else 'full' ) )
+		listJobs = []
+		for function in args.functions: 
+			listJobs.append( [ { 'process': 'QCD', 'mass': '-', 'function': function }, campaignFit, ( 'background', 'QCD', MASS, function, [ inputFileName( version, qcdSample ) ] ) ] )
+		for mass in ( args.masses or [ MASS ] ):
+			listJobs.append( [ { 'process': 'RPVSt'+str(mass)+'tojj', 'mass': mass, 'function': 'gaus' }, campaignFit, ( 'signal', 'RPVSt'+str(mass)+'tojj', mass, 'gaus', [ inputFileName( version, signalSample( mass ) ) ] ) ] )
+			listJobs.append( [ { 'process': combination, 'mass': mass, 'function': 'P4' }, campaignFit, ( 'combination', combination+'_M'+str(mass), mass, 'P4', 
+				[ ( inputFileName( version, dataSample ) if combination != 'MC' else '' ), inputFileName( version, qcdSample ), ( inputFileName( version, signalSample( mass ) ) if combination != 'Data' else '' ) ] ) ] )
+
+		rows = runFitJobs( listJobs, args.jobs )
+		print summaryTable( rows, [ 'process', 'mass', 'function' ] )
+		writeSummary( rows, outputDir+hist+'_'+version+'_fitCampaign.json' )
+		for row in rows: 
+			if row['error']: print '|----> Failed', row['process'], row['mass'], row['function'], '\n', row['error']
+		sys.exit( 1 if any( row['error'] for row in rows ) else 0 )
+
+	if 'toys' in process:
+		summaries = toyStudyFit( TFile( inputFileName( version, qcdSample ) ), hist, folder, ( args.masses or [ MASS ] ), minFit, maxFit, rebinX, args.toys, args.injectSignal, args.signalWidth, args.seed, args.jobs )
+		writeSummary( summaries, outputDir+hist+'_'+version+'_toys'+str( int( args.injectSignal ) )+'.json' )
+		sys.exit(0)
+
+	fileSignal = TFile( inputFileName( version, signalSample( MASS ) ) )
+	fileBkg = TFile( inputFileName( version, qcdSample ) )
+	fileData = TFile( inputFileName( version, dataSample ) )
+	outputRootFile = '/afs/cern.ch/work/a/algomez/Substructure/CMSSW_7_4_5_patch1/src/RUNA/RUNAnalysis/test/Rootfiles/workspace_QCD_RPVSt'+str(MASS)+'tojj_FitP4Gaus_'+PU+'_rooFit_'+lumi+'fb.root'
+
+	p = None
 	if 'full' in process:
 		CMS_lumi.extraText = "Preliminary"
 		p = Process( target=FitterCombination, args=( fileData, fileBkg, fileSignal, hist, folder, P4, [ 0.1, 100, 2, 0.1 ], minFit, maxFit, rebinX ))
@@ -720,10 +895,14 @@ if __name__ == '__main__':
 	elif 'rooFit' in process:
 		rooFitter( fileData, fileSignal, hist, folder, MASS, outputRootFile, 200.0, 1000.0  )
 		#rooFitter( fileBkg, fileSignal, hist, folder, MASS, outputRootFile, 250.0, 450.0  )
+	elif args.binnedTree:
+		summary = rooFitterTreeBinned( fileData, hist, folder, args.treeBranch, args.fitBinning, 50., 180., args.numCPU, args.compareUnbinned )
+		writeSummary( summary, outputDir+hist+'_'+version+'_rooFitTreeBinned.json' )
 	else:
 		rooFitterTree( fileBkg, fileSignal, fileData, hist, folder )
-	p.start()
-	p.join()
+	if p:
+		p.start()
+		p.join()
 
 	
 
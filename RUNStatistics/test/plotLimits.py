@@ -59,7 +59,7 @@ def plotLimits( listMasses  ):
 		xs_theory.append( XS )
 		masses.append( mass )
 		masses_exp.append( mass )
-		tmpFile, tmpTree, tmpEntries = getTree( "higgsCombineUDD312RPVSt_M-"+str(mass)+".Asymptotic.mH120.root", "limit" )
+		tmpFile, tmpTree, tmpEntries = getTree( "higgsCombineUDD312RPVSt_M-"+str(mass)+".Asymptotic.mH120.root", "limit", [ 'quantileExpected', 'limit' ] )
 		for i in xrange(tmpEntries):
 			tmpTree.GetEntry(i)
 			tmp = round( tmpTree.quantileExpected, 2)
@@ -11,21 +11,29 @@ from ROOT import *
 import time, os, math, sys
 import argparse
 from RUNA.RUNAnalysis.histoLabels import labels, labelAxis 
+from RUNA.RUNAnalysis.histoCache import getHisto
+from RUNA.RUNAnalysis.histoArrays import toArrays, fromArrays, rebinned2D, efficiencyArrays
+from RUNA.RUNAnalysis.plotJobs import runPlotJobs
+from RUNA.RUNAnalysis.plotManifest import savePlot, scriptVersion, sourceFiles
 import RUNA.RUNAnalysis.CMS_lumi as CMS_lumi 
 import RUNA.RUNAnalysis.tdrstyle as tdrstyle
 
 
-gROOT.Reset()
-gROOT.SetBatch()
-#setTDRStyle()
-#gROOT.SetStyle('tdrStyle')
-#set the tdr style
-gROOT.ForceStyle()
-tdrstyle.setTDRStyle()
-#CMS_lumi.writeExtraText = 1
-#CMS_lumi.extraText = ""
+def setupStyle():
+	"""Batch mode and styles, also run in each worker of --jobs"""
+	gROOT.SetBatch()
+	#setTDRStyle()
+	#gROOT.SetStyle('tdrStyle')
+	#set the tdr style
+	gROOT.ForceStyle()
+	tdrstyle.setTDRStyle()
+	#CMS_lumi.writeExtraText = 1
+	#CMS_lumi.extraText = ""
+
+	gStyle.SetOptStat(0)
 
-gStyle.SetOptStat(0)
+gROOT.Reset()
+setupStyle()
 
 
 def plotTriggerEfficiency( inFileSample, sample, triggerDenom, triggerPass, name, cut, xmin, xmax, rebin, labX, labY, log, version, PU ):
@@ -34,11 +42,9 @@ def plotTriggerEfficiency( inFileSample, sample, triggerDenom, triggerPass, name
 	outputFileName = name+'_'+cut+'_'+triggerDenom+"_"+triggerPass+'_'+sample+'_'+version+'_TriggerEfficiency.'+ext
 	print 'Processing.......', outputFileName
 
-	DenomOnly = inFileSample.Get( version+'TriggerEfficiency'+triggerPass.replace(tmpTrig,'')+'/'+name+'Denom_'+cut )
-	DenomOnly.Rebin(rebin)
+	DenomOnly = getHisto( inFileSample, version+'TriggerEfficiency'+triggerPass.replace(tmpTrig,'')+'/'+name+'Denom_'+cut, rebin )
 	Denom = DenomOnly.Clone()
-	PassingOnly = inFileSample.Get( version+'TriggerEfficiency'+triggerPass.replace(tmpTrig,'')+'/'+name+'Passing_'+cut )
-	PassingOnly.Rebin(rebin)
+	PassingOnly = getHisto( inFileSample, version+'TriggerEfficiency'+triggerPass.replace(tmpTrig,'')+'/'+name+'Passing_'+cut, rebin )
 	Passing = PassingOnly.Clone()
 	Efficiency = TGraphAsymmErrors( Passing, Denom, 'cp'  )
 
@@ -99,7 +105,7 @@ def plotTriggerEfficiency( inFileSample, sample, triggerDenom, triggerPass, name
 	if not (labX and labY): labels( '', '', '')
 	else: labels( '', '', '', labX, labY, 'left' ) #, sel1='AK8PFHT700TrimMass50' )
 
-	can.SaveAs( 'Plots/'+outputFileName.replace('.','Extended.') )
+	savePlot( can, 'Plots/'+outputFileName.replace('.','Extended.') )
 	del can
 
 	can1 = TCanvas('c1', 'c1',  10, 10, 750, 500 )
@@ -142,7 +148,7 @@ def plotTriggerEfficiency( inFileSample, sample, triggerDenom, triggerPass, name
 	#if not (labX and labY): labels( name, '', PU, camp,  )
 	#else: labels( name, '', PU, camp, labX, labY-0.05 ) #, sel1= [ 'AK8PFHT700TrimMass50' ] )
 
-	can1.SaveAs( 'Plots/'+outputFileName )
+	savePlot( can1, 'Plots/'+outputFileName )
 	del can1
 
 
@@ -152,53 +158,12 @@ def plot2DTriggerEfficiency( inFileSample, sample, triggerDenom, triggerPass, na
 	outputFileName = name+'_'+cut+'_'+triggerDenom+"_"+triggerPass+'_'+sample+'_'+version+'_TriggerEfficiency.'+ext
 	print 'Processing.......', outputFileName
 
-	Denom = inFileSample.Get( version+'TriggerEfficiency'+triggerPass.replace(tmpTrig,'')+'/'+name+'Denom_'+cut )
-	Passing = inFileSample.Get( version+'TriggerEfficiency'+triggerPass.replace(tmpTrig,'')+'/'+name+'Passing_'+cut )
-	tmpDenom = Denom.Clone()
-	tmpPassing = Passing.Clone()
-	
-	### Rebinning
-	nbinsx = Denom.GetXaxis().GetNbins()
-	nbinsy = Denom.GetYaxis().GetNbins()
-	xmin  = Denom.GetXaxis().GetXmin()
-	xmax  = Denom.GetXaxis().GetXmax()
-	ymin  = Denom.GetYaxis().GetXmin()
-	ymax  = Denom.GetYaxis().GetXmax()
-	nx = nbinsx/rebinx
-	ny = nbinsy/rebiny
-	Denom.SetBins( nx, xmin, xmax, ny, ymin, ymax )
-	Passing.SetBins( nx, xmin, xmax, ny, ymin, ymax )
-
-	for biny in range( 1, nbinsy):
-		for binx in range(1, nbinsx):
-			ibin1 = Denom.GetBin(binx,biny)
-			Denom.SetBinContent( ibin1, 0 )
-			ibin2 = Denom.GetBin(binx,biny)
-			Passing.SetBinContent( ibin2, 0 )
-		
-	for biny in range( 1, nbinsy):
-		by = tmpDenom.GetYaxis().GetBinCenter( biny )
-		iy = Denom.GetYaxis().FindBin(by)
-		by2 = tmpPassing.GetYaxis().GetBinCenter( biny )
-		iy2 = Passing.GetYaxis().FindBin(by2)
-		for binx in range(1, nbinsx):
-			bx = tmpDenom.GetXaxis().GetBinCenter(binx)
-			ix  = Denom.GetXaxis().FindBin(bx)
-			bin = tmpDenom.GetBin(binx,biny)
-			ibin= Denom.GetBin(ix,iy)
-			cu  = tmpDenom.GetBinContent(bin)
-			Denom.AddBinContent(ibin,cu)
-
-			bx2 = tmpPassing.GetXaxis().GetBinCenter(binx)
-			ix2  = Passing.GetXaxis().FindBin(bx2)
-			bin2 = tmpPassing.GetBin(binx,biny)
-			ibin2 = Passing.GetBin(ix2,iy2)
-			cu2  = tmpPassing.GetBinContent(bin2)
-			Passing.AddBinContent(ibin2,cu2)
-
-	Efficiency = Denom.Clone() #TH2D( '', '', nx, xmin, xmax, ny, ymin, ymax )
-	Efficiency.Reset()
-	Efficiency.Divide( Passing, Denom, 1, 1, 'B' )
+	Denom = getHisto( inFileSample, version+'TriggerEfficiency'+triggerPass.replace(tmpTrig,'')+'/'+name+'Denom_'+cut, ( rebinx, rebiny ), 1, rebinned2D )
+	Passing = getHisto( inFileSample, version+'TriggerEfficiency'+triggerPass.replace(tmpTrig,'')+'/'+name+'Passing_'+cut, ( rebinx, rebiny ), 1, rebinned2D )
+
+	#### binomial efficiency, same as Efficiency.Divide( Passing, Denom, 1, 1, 'B' )
+	Efficiency = Denom.Clone()
+	fromArrays( Efficiency, *efficiencyArrays( *( toArrays( Passing ) + toArrays( Denom ) ) ) )
 
 
 	can = TCanvas('c1', 'c1',  10, 10, 1000, 750 )
@@ -217,7 +182,7 @@ def plot2DTriggerEfficiency( inFileSample, sample, triggerDenom, triggerPass, na
 	#if not (labX and labY): labels( name, '', '', ''  )
 	#else: labels( name, '', '', '', labX, labY ) #, sel1= [ 'AK8PFHT700TrimMass50' ] )
 
-	can.SaveAs( 'Plots/'+outputFileName )
+	savePlot( can, 'Plots/'+outputFileName )
 	del can
 
 
@@ -238,6 +203,9 @@ if __name__ == '__main__':
 	parser.add_argument('-l', '--lumi', action='store', default='15.5', help='Luminosity, example: 1.' )
 	parser.add_argument('-t', '--trigger', action='store', default='AK8PFHT700TrimMass50', help='Trigger used, example PFHT800.' )
 	parser.add_argument('-e', '--extension', action='store', default='png', help='Extension of plots.' )
+	parser.add_argument('-j', '--jobs', action='store', type=int, default=1, help='Number of processes drawing plots, example: 4.' )
+	parser.add_argument('--force', action='store_true', default=False, help='Draw all the plots, also the ones that did not change.' )
+	parser.add_argument('--dryRun', action='store_true', default=False, help='Only list the plots that would be drawn.' )
 
 	try:
 		args = parser.parse_args()
@@ -267,11 +235,11 @@ if __name__ == '__main__':
 
 	CMS_lumi.lumi_13TeV = "2.6 fb^{-1}"
 	if 'MET' in process:
-		inputTrigger = TFile.Open('Rootfiles/RUNTriggerEfficiency_MET_Run2015C-PromptReco-v1.root')
+		inputTrigger = 'Rootfiles/RUNTriggerEfficiency_MET_Run2015C-PromptReco-v1.root'
 		SAMPLE = 'MET'
 		BASEDTrigger = 'PFMET170'
 	else:
-		inputTrigger = TFile.Open('Rootfiles/RUNTriggerStudies_JetHT_Run2015D-16Dec2015-v1_v76x_v1p0_v02.root')
+		inputTrigger = 'Rootfiles/RUNTriggerStudies_JetHT_Run2015D-16Dec2015-v1_v76x_v1p0_v02.root'
 		SAMPLE = 'JetHT_Run2015D'
 		BASEDTrigger = 'PFHT475'
 
@@ -327,11 +295,20 @@ if __name__ == '__main__':
 	else: Grommers = [ grom ]
 
 
+	#### one job per plot, the cost is the number of input histograms ( passing and denominator )
+	listJobs = []
 	for i in Plots:
 		if '1D' in process:
-			plotTriggerEfficiency( inputTrigger, SAMPLE, BASEDTrigger, triggerUsed, i[0], cut, i[1], i[2], i[3], i[4], i[5], i[6], version, PU )
+			listJobs.append( [ plotTriggerEfficiency, ( inputTrigger, SAMPLE, BASEDTrigger, triggerUsed, i[0], cut, i[1], i[2], i[3], i[4], i[5], i[6], version, PU ), 2 ] )
 		elif '2D' in process:
-			plot2DTriggerEfficiency( inputTrigger, SAMPLE, BASEDTrigger, triggerUsed, i[0], cut, i[1], i[2], i[3], i[4], i[5], i[6], i[7], i[8], i[9], i[10], version, PU )
+			listJobs.append( [ plot2DTriggerEfficiency, ( inputTrigger, SAMPLE, BASEDTrigger, triggerUsed, i[0], cut, i[1], i[2], i[3], i[4], i[5], i[6], i[7], i[8], i[9], i[10], version, PU ), 2 ] )
+
+	#### plots whose inputs, options and script did not change since the last run are skipped
+	if not os.path.exists( 'Plots' ): os.makedirs( 'Plots' )
+	#### the plots also read options from globals: all the options but the ones that only control the run are part of the version
+	plotOptions = repr( [ ( k, v ) for k, v in sorted( vars( args ).items() ) if k not in [ 'jobs', 'force', 'dryRun' ] ] )
+	failedJobs = runPlotJobs( listJobs, args.jobs, setupStyle, [ CMS_lumi ], 'Plots/.plotManifest.json', scriptVersion( [ __file__ ] + sourceFiles( labels, getHisto, fromArrays, runPlotJobs, savePlot, CMS_lumi, tdrstyle ) )+plotOptions, args.force, args.dryRun )
+	if failedJobs: sys.exit(1)
 
 
 